@@ -0,0 +1,445 @@
+"""
+Geração das análises com IA (Groq) com cache persistente por conteúdo
+
+A chave de cada análise é o hash sha256 da requisição completa enviada ao
+modelo (modelo, parâmetros de geração e mensagens). Como o prompt já traz a
+seção analisada, os filtros aplicados e os dados da entidade (amostra e
+estatísticas) junto do contexto RAG, requisições idênticas devolvem a
+análise gravada sem nova chamada à API. As respostas ficam no cache em disco
+(namespace 'analises_groq'), com validade CACHE_TTL_ANALISES_SEGUNDOS e o
+mesmo limite de tamanho (LRU) das respostas da API SPAECE.
+
+gerar_analise_em_fluxo devolve a resposta em pedaços à medida que o modelo
+os gera (stream), para que o painel exiba o texto desde o primeiro token;
+a análise só é gravada no cache quando o fluxo termina por completo.
+
+O prompt é montado por componentes (ajustar_prompt_ao_orcamento): cada um
+tem versões da completa à mais reduzida e uma prioridade, e os de menor
+valor são reduzidos ou descartados até o total estimado de tokens caber em
+ORCAMENTO_TOKENS_PROMPT.
+
+gerar_analises_em_paralelo envia várias análises de uma vez (o relatório
+completo), em threads, respeitando o limite de tokens por minuto da Groq
+por meio de um balde de tokens compartilhado pelo processo.
+
+Não depende do Streamlit; as exceções da Groq são propagadas ao chamador.
+
+Uso pela linha de comando:
+    python cache_disco.py invalidar --namespace analises_groq [--rotulo AGREGADO]
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cache_disco
+from config_api import CACHE_TTL_ANALISES_SEGUNDOS
+
+# Namespace das análises no cache em disco
+NAMESPACE_CACHE_ANALISES = "analises_groq"
+
+# Modelo e parâmetros das análises dos gráficos
+MODELO_ANALISE = "llama-3.3-70b-versatile"
+MAX_TOKENS_ANALISE = 3000
+TEMPERATURA_ANALISE = 0.2
+
+# Tokens estimados do prompt (sem a mensagem de sistema) que uma análise pode usar
+ORCAMENTO_TOKENS_PROMPT = int(os.environ.get("SPAECE_ORCAMENTO_PROMPT_TOKENS", "8000"))
+# Estimativa de caracteres por token em português (o tokenizador do modelo não é carregado)
+CARACTERES_POR_TOKEN = 3.5
+
+# Limite de tokens por minuto da conta Groq (prompt + resposta de cada chamada)
+# e quantidade de análises enviadas ao mesmo tempo no relatório completo
+LIMITE_TOKENS_POR_MINUTO = int(os.environ.get("SPAECE_GROQ_TOKENS_POR_MINUTO", "12000"))
+MAX_ANALISES_PARALELAS = 4
+# Tamanho típico de uma resposta, reservado antes da chamada; o consumo real
+# (usage.total_tokens) acerta o balde ao fim, em vez de reservar max_tokens inteiro
+TOKENS_RESPOSTA_ESTIMADOS = 1200
+
+_lock = threading.Lock()
+_contadores = {'acertos': 0, 'faltas': 0}
+_limitador = None
+
+
+def _contar(nome):
+    with _lock:
+        _contadores[nome] += 1
+
+
+def chave_analise(mensagens, modelo=MODELO_ANALISE, max_tokens=MAX_TOKENS_ANALISE,
+                  temperatura=TEMPERATURA_ANALISE):
+    """
+    Calcula a chave de cache de uma requisição de análise
+
+    Args:
+        mensagens (list): Mensagens do chat (dicts com role e content)
+        modelo (str): Modelo da Groq
+        max_tokens (int): Limite de tokens da resposta
+        temperatura (float): Temperatura de amostragem
+
+    Returns:
+        str: Hash sha256 (hexadecimal) da requisição
+    """
+    requisicao = {
+        'modelo': modelo,
+        'max_tokens': max_tokens,
+        'temperatura': temperatura,
+        'mensagens': mensagens
+    }
+    serializada = json.dumps(requisicao, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serializada.encode('utf-8')).hexdigest()
+
+
+def estimar_tokens(texto):
+    """Estimativa do número de tokens de um texto pelo número de caracteres"""
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def comprimir_texto(texto):
+    """Remove a indentação e os espaços finais das linhas e as linhas em branco repetidas"""
+    linhas = (linha.strip() for linha in texto.strip().splitlines())
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(linhas))
+
+
+def json_compacto(valor):
+    """JSON sem indentação e com acentos legíveis (menos tokens que json.dumps(indent=2))"""
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def resumir_estatisticas(estatisticas, medidas=None, casas=2):
+    """
+    Arredonda as estatísticas de DataFrame.describe().to_dict() e mantém só as medidas pedidas
+
+    Args:
+        estatisticas (dict): {coluna: {medida: valor}}
+        medidas (tuple): Medidas mantidas (ex.: ('count', 'mean')); None mantém todas
+        casas (int): Casas decimais
+    """
+    resumo = {}
+    for coluna, valores in estatisticas.items():
+        resumo[coluna] = {
+            medida: round(valor, casas) if isinstance(valor, float) and math.isfinite(valor) else valor
+            for medida, valor in valores.items()
+            if medidas is None or medida in medidas
+        }
+    return resumo
+
+
+def ajustar_prompt_ao_orcamento(componentes, orcamento=ORCAMENTO_TOKENS_PROMPT):
+    """
+    Monta o prompt a partir de componentes, reduzindo os de menor valor até caber no orçamento
+
+    Args:
+        componentes (list): Tuplas (nome, versoes, prioridade), na ordem do prompt.
+            versoes vai da forma completa à mais reduzida ("" permite descartar
+            o componente); prioridade 0 nunca é reduzida e, entre as demais,
+            as maiores são reduzidas primeiro
+        orcamento (int): Máximo de tokens estimados do prompt
+
+    Returns:
+        tuple: (prompt, relatorio), com relatorio como lista de
+               (nome, tokens da versão completa, tokens da versão usada)
+    """
+    versoes = [[comprimir_texto(versao) for versao in versoes_componente]
+               for _, versoes_componente, _ in componentes]
+    tokens = [[estimar_tokens(versao) for versao in versoes_componente] for versoes_componente in versoes]
+    nivel = [0] * len(componentes)
+    total = sum(tokens_componente[0] for tokens_componente in tokens)
+
+    # Reduzir um passo por vez, do componente de maior prioridade para o de menor
+    redutiveis = sorted(
+        (i for i, (_, _, prioridade) in enumerate(componentes) if prioridade > 0),
+        key=lambda i: -componentes[i][2]
+    )
+    for i in redutiveis:
+        while total > orcamento and nivel[i] < len(versoes[i]) - 1:
+            total += tokens[i][nivel[i] + 1] - tokens[i][nivel[i]]
+            nivel[i] += 1
+        if total <= orcamento:
+            break
+
+    prompt = '\n\n'.join(versoes[i][nivel[i]] for i in range(len(componentes)) if versoes[i][nivel[i]])
+    relatorio = [(nome, tokens[i][0], tokens[i][nivel[i]]) for i, (nome, _, _) in enumerate(componentes)]
+    return prompt, relatorio
+
+
+def resumo_orcamento(relatorio, orcamento=ORCAMENTO_TOKENS_PROMPT):
+    """Linha de log com os tokens estimados por componente (completo->usado quando reduzido)"""
+    total = sum(usados for _, _, usados in relatorio)
+    partes = [
+        f"{nome}={completo}" if usados == completo else f"{nome}={completo}->{usados}"
+        for nome, completo, usados in relatorio if completo
+    ]
+    return f"{total} tokens estimados (orçamento {orcamento}): " + ", ".join(partes)
+
+
+def obter_analise_em_cache(chave):
+    """Retorna o texto da análise gravada para a chave, ou None se ausente/expirada"""
+    valor = cache_disco.obter(NAMESPACE_CACHE_ANALISES, chave, ttl=CACHE_TTL_ANALISES_SEGUNDOS)
+    if valor is None:
+        _contar('faltas')
+        return None
+    _contar('acertos')
+    return valor.decode('utf-8')
+
+
+def gravar_analise_em_cache(chave, texto, rotulo=None):
+    """Grava o texto de uma análise; rotulo (ex.: código da entidade) permite invalidá-la depois"""
+    cache_disco.gravar(NAMESPACE_CACHE_ANALISES, chave, texto.encode('utf-8'), rotulo=rotulo)
+
+
+class LimitadorTokens:
+    """
+    Balde de tokens por minuto: cada chamada reserva uma estimativa do consumo
+
+    O balde começa cheio e é reposto continuamente à taxa do limite; quem não
+    encontra tokens suficientes aguarda a reposição. Uma reserva maior que a
+    capacidade é reduzida à capacidade, para não bloquear para sempre. Ao fim
+    da chamada, acertar() troca a estimativa pelo consumo informado pela API.
+    Reservas prioritárias (análises pedidas em um gráfico) passam à frente das
+    do relatório completo que estejam aguardando.
+    """
+
+    def __init__(self, tokens_por_minuto=LIMITE_TOKENS_POR_MINUTO):
+        self.capacidade = tokens_por_minuto
+        self._disponivel = float(tokens_por_minuto)
+        self._atualizado_em = time.monotonic()
+        self._prioritarias_aguardando = 0
+        self._condicao = threading.Condition()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._disponivel = min(
+            self.capacidade, self._disponivel + (agora - self._atualizado_em) * self.capacidade / 60
+        )
+        self._atualizado_em = agora
+
+    def reservar(self, tokens, prioritaria=False):
+        """
+        Aguarda até haver tokens disponíveis e os reserva
+
+        Args:
+            tokens (int): Estimativa de consumo da chamada
+            prioritaria (bool): Passa à frente das reservas não prioritárias em espera
+
+        Returns:
+            int: Tokens reservados, a informar depois em acertar()
+        """
+        tokens = min(tokens, self.capacidade)
+        with self._condicao:
+            if prioritaria:
+                self._prioritarias_aguardando += 1
+            try:
+                while True:
+                    self._repor()
+                    livre = prioritaria or self._prioritarias_aguardando == 0
+                    if livre and self._disponivel >= tokens:
+                        self._disponivel -= tokens
+                        return tokens
+                    falta = max(tokens - self._disponivel, 0) * 60 / self.capacidade
+                    self._condicao.wait(max(falta, 0.1))
+            finally:
+                if prioritaria:
+                    self._prioritarias_aguardando -= 1
+                    self._condicao.notify_all()
+
+    def acertar(self, reservados, consumidos):
+        """
+        Substitui a reserva de uma chamada pelo consumo real
+
+        O balde pode ficar negativo se a chamada gastou mais que o reservado;
+        as próximas reservas aguardam a reposição correspondente.
+        """
+        with self._condicao:
+            self._repor()
+            self._disponivel = min(self.capacidade, self._disponivel + reservados - consumidos)
+            self._condicao.notify_all()
+
+
+def obter_limitador():
+    """Retorna o limitador de tokens compartilhado por todas as sessões do processo"""
+    global _limitador
+    with _lock:
+        if _limitador is None:
+            _limitador = LimitadorTokens()
+        return _limitador
+
+
+def tokens_da_requisicao(mensagens, max_tokens=MAX_TOKENS_ANALISE):
+    """Estimativa do consumo de uma chamada: mensagens mais uma resposta de tamanho típico"""
+    return (sum(estimar_tokens(mensagem['content']) for mensagem in mensagens)
+            + min(max_tokens, TOKENS_RESPOSTA_ESTIMADOS))
+
+
+def tokens_consumidos(resposta, mensagens, texto):
+    """
+    Tokens consumidos por uma chamada, segundo a API
+
+    Usa usage.total_tokens da resposta (ou x_groq.usage, no último evento de
+    um fluxo); sem essa informação, estima a partir das mensagens e do texto.
+    """
+    for origem in (resposta, getattr(resposta, 'x_groq', None)):
+        total = getattr(getattr(origem, 'usage', None), 'total_tokens', None)
+        if isinstance(total, int):
+            return total
+    return sum(estimar_tokens(mensagem['content']) for mensagem in mensagens) + estimar_tokens(texto or "")
+
+
+def gerar_analise(cliente, mensagens, rotulo=None, modelo=MODELO_ANALISE,
+                  max_tokens=MAX_TOKENS_ANALISE, temperatura=TEMPERATURA_ANALISE, usar_cache=True,
+                  limitador=None, prioritaria=False):
+    """
+    Retorna a análise do modelo para as mensagens, consultando antes o cache em disco
+
+    Args:
+        cliente: Cliente Groq (ver sessao_http.obter_cliente_groq)
+        mensagens (list): Mensagens do chat (dicts com role e content)
+        rotulo (str): Identificação usada na invalidação manual do cache
+        usar_cache (bool): False ignora e não grava o cache
+        limitador (LimitadorTokens): Se informado, a chamada ao modelo aguarda
+            tokens disponíveis (análises em cache não consomem)
+        prioritaria (bool): Reserva à frente do relatório completo (análise pedida pelo usuário)
+
+    Returns:
+        str: Texto da análise
+    """
+    chave = chave_analise(mensagens, modelo, max_tokens, temperatura)
+    if usar_cache:
+        texto = obter_analise_em_cache(chave)
+        if texto is not None:
+            return texto
+
+    if limitador is not None:
+        reservados = limitador.reservar(tokens_da_requisicao(mensagens, max_tokens), prioritaria)
+
+    response = cliente.chat.completions.create(
+        model=modelo,
+        messages=mensagens,
+        max_tokens=max_tokens,
+        temperature=temperatura
+    )
+    texto = response.choices[0].message.content
+    if limitador is not None:
+        limitador.acertar(reservados, tokens_consumidos(response, mensagens, texto))
+
+    # Respostas vazias não são gravadas, para que a próxima tentativa chame o modelo
+    if usar_cache and texto:
+        gravar_analise_em_cache(chave, texto, rotulo=rotulo)
+    return texto
+
+
+def gerar_analise_em_fluxo(cliente, mensagens, rotulo=None, modelo=MODELO_ANALISE,
+                           max_tokens=MAX_TOKENS_ANALISE, temperatura=TEMPERATURA_ANALISE, usar_cache=True,
+                           limitador=None, prioritaria=False):
+    """
+    Retorna a análise do modelo em pedaços de texto, à medida que são gerados
+
+    A consulta ao cache e a abertura do fluxo acontecem já na chamada (quem
+    chama pode aguardar o primeiro token sob um indicador de progresso); o
+    iterador devolvido apenas consome o fluxo. Uma análise em cache vem em
+    um único pedaço.
+
+    Args:
+        cliente: Cliente Groq (ver sessao_http.obter_cliente_groq)
+        mensagens (list): Mensagens do chat (dicts com role e content)
+        rotulo (str): Identificação usada na invalidação manual do cache
+        usar_cache (bool): False ignora e não grava o cache
+        limitador (LimitadorTokens): Se informado, a abertura do fluxo aguarda tokens
+            disponíveis; o consumo real é acertado ao fim do fluxo
+        prioritaria (bool): Reserva à frente do relatório completo (análise pedida pelo usuário)
+
+    Returns:
+        Iterator[str]: Pedaços do texto da análise
+    """
+    chave = chave_analise(mensagens, modelo, max_tokens, temperatura)
+    if usar_cache:
+        texto = obter_analise_em_cache(chave)
+        if texto is not None:
+            return iter([texto])
+
+    reservados = 0
+    if limitador is not None:
+        reservados = limitador.reservar(tokens_da_requisicao(mensagens, max_tokens), prioritaria)
+
+    fluxo = cliente.chat.completions.create(
+        model=modelo,
+        messages=mensagens,
+        max_tokens=max_tokens,
+        temperature=temperatura,
+        stream=True
+    )
+
+    def pedacos():
+        partes = []
+        completo = False
+        evento = None
+        try:
+            for evento in fluxo:
+                if not evento.choices:
+                    continue
+                parte = evento.choices[0].delta.content
+                if parte:
+                    partes.append(parte)
+                    yield parte
+            completo = True
+        finally:
+            # Fluxo interrompido (erro ou leitura abandonada) não vai para o cache
+            fluxo.close()
+            if limitador is not None:
+                # O uso real vem no último evento do fluxo, quando disponível
+                limitador.acertar(reservados, tokens_consumidos(evento, mensagens, ''.join(partes)))
+            if completo and usar_cache and partes:
+                gravar_analise_em_cache(chave, ''.join(partes), rotulo=rotulo)
+
+    return pedacos()
+
+
+def gerar_analises_em_paralelo(requisicoes, max_paralelas=MAX_ANALISES_PARALELAS, limitador=None):
+    """
+    Gera várias análises ao mesmo tempo, devolvendo cada uma assim que fica pronta
+
+    As chamadas passam pelo limitador de tokens do processo, de modo que
+    o lote (e as análises de outras sessões) respeita o limite por minuto.
+
+    Args:
+        requisicoes (dict): {nome: dict com cliente, mensagens e rotulo}
+        max_paralelas (int): Máximo de chamadas simultâneas ao modelo
+        limitador (LimitadorTokens): None usa o limitador compartilhado
+
+    Yields:
+        tuple: (nome, texto, erro) na ordem de conclusão; erro é a exceção
+               da chamada (e texto None) quando ela falha
+    """
+    if not requisicoes:
+        return
+    limitador = limitador or obter_limitador()
+
+    with ThreadPoolExecutor(max_workers=min(max_paralelas, len(requisicoes))) as executor:
+        futuros = {
+            executor.submit(
+                gerar_analise, requisicao['cliente'], requisicao['mensagens'],
+                rotulo=requisicao.get('rotulo'), limitador=limitador
+            ): nome
+            for nome, requisicao in requisicoes.items()
+        }
+        for futuro in as_completed(futuros):
+            try:
+                yield futuros[futuro], futuro.result(), None
+            except Exception as e:
+                yield futuros[futuro], None, e
+
+
+def estatisticas_cache_analises():
+    """
+    Retorna os contadores do cache de análises neste processo
+
+    Returns:
+        dict: acertos (análises devolvidas do cache) e faltas (chamadas ao modelo)
+    """
+    with _lock:
+        return dict(_contadores)
@@ -0,0 +1,121 @@
+"""
+Pré-carregamento do cache de respostas da API SPAECE
+
+Lê a lista de entidades com acesso ao painel (seções xregionais, xmunicipios
+e xescolas do secrets.toml e os mapas de entidades.py), consulta cada entidade
+e os agregados da sua hierarquia com concorrência limitada e grava as respostas
+no cache em disco. Assim, o primeiro login de cada escola no dia da divulgação
+é atendido sem nova consulta ao portal CAEd.
+
+Uso:
+    python aquecer_cache.py [--secrets .streamlit/secrets.toml] [--paralelo 4] [--forcar]
+"""
+
+import argparse
+import os
+import time
+import tomllib
+
+import cache_disco
+from cliente_spaece import (
+    NAMESPACE_CACHE_API,
+    consultar_agregados_em_paralelo,
+    extrair_hierarquia_dados,
+    requisitar_dados_agregado
+)
+from config_api import GRUPOS_CARGA_INICIAL, MAX_CONSULTAS_PARALELAS, SECOES_INDICADORES
+from entidades import ESCOLAS_MAP, MUNICIPIOS_MAP
+
+# Conjuntos de grupos consultados pelo painel para cada agregado
+GRUPOS_PAINEL = [GRUPOS_CARGA_INICIAL, SECOES_INDICADORES['habilidades']]
+
+
+def carregar_lista_entidades(caminho_secrets):
+    """
+    Monta a lista de códigos de entidades com acesso ao painel
+
+    Args:
+        caminho_secrets (str): Caminho do secrets.toml
+
+    Returns:
+        list: Códigos sem repetição, na ordem regionais, municípios, escolas
+    """
+    secrets = {}
+    if os.path.exists(caminho_secrets):
+        with open(caminho_secrets, "rb") as arquivo:
+            secrets = tomllib.load(arquivo)
+    else:
+        print(f"Aviso: {caminho_secrets} não encontrado; usando apenas os mapas de entidades.py")
+
+    codigos = []
+    for secao, mapa in (("xregionais", {}), ("xmunicipios", MUNICIPIOS_MAP), ("xescolas", ESCOLAS_MAP)):
+        codigos.extend(secrets.get(secao, {}).keys())
+        codigos.extend(mapa.keys())
+
+    return list(dict.fromkeys(str(codigo).strip() for codigo in codigos if str(codigo).strip()))
+
+
+def aquecer_agregados(agregados, max_paralelo, forcar=False):
+    """
+    Consulta todos os grupos do painel para cada agregado, gravando no cache
+
+    Returns:
+        tuple: (respostas da carga inicial por agregado, quantidade de falhas)
+    """
+    if forcar:
+        for agregado in agregados:
+            cache_disco.invalidar(namespace=NAMESPACE_CACHE_API, rotulo=agregado)
+
+    respostas, falhas = {}, 0
+    for grupos in GRUPOS_PAINEL:
+        resultados = consultar_agregados_em_paralelo(
+            agregados,
+            funcao_consulta=lambda agregado: requisitar_dados_agregado(agregado, grupos=grupos),
+            max_paralelo=max_paralelo
+        )
+        for resultado in resultados:
+            if resultado['erro'] is not None:
+                falhas += 1
+            elif grupos == GRUPOS_CARGA_INICIAL:
+                respostas[resultado['agregado']] = resultado['dados']
+
+    return respostas, falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-carrega o cache da API SPAECE para todas as entidades")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Caminho do secrets.toml com xregionais/xmunicipios/xescolas")
+    parser.add_argument("--paralelo", type=int, default=MAX_CONSULTAS_PARALELAS,
+                        help="Número máximo de consultas simultâneas à API")
+    parser.add_argument("--forcar", action="store_true",
+                        help="Descarta as respostas já existentes no cache antes de consultar")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    entidades = carregar_lista_entidades(args.secrets)
+    print(f"{len(entidades)} entidade(s) na lista de acesso")
+
+    respostas, falhas = aquecer_agregados(entidades, args.paralelo, args.forcar)
+
+    # Agregados da hierarquia (CREDE, município, estado) que o painel consulta após o login
+    hierarquia = set()
+    for agregado, data in respostas.items():
+        if len(agregado) > 2:
+            hierarquia.update(ag for ag in extrair_hierarquia_dados(data) if ag != agregado)
+    hierarquia = sorted(hierarquia - set(entidades))
+    print(f"{len(hierarquia)} agregado(s) adicionais da hierarquia")
+
+    _, falhas_hierarquia = aquecer_agregados(hierarquia, args.paralelo, args.forcar)
+    falhas += falhas_hierarquia
+
+    duracao = time.perf_counter() - inicio
+    print(f"Cache aquecido em {duracao:.1f}s ({falhas} falha(s))")
+    for namespace, info in cache_disco.estatisticas().items():
+        print(f"{namespace}: {info['itens']} item(ns), {info['bytes'] / 1024 / 1024:.1f} MB")
+
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,543 @@
+"""
+Benchmarks de desempenho do painel SPAECE
+
+Cada benchmark compara a implementação anterior com a atual usando dados
+sintéticos com as mesmas colunas das respostas da API.
+
+Uso:
+    python benchmark_desempenho.py leitura_json [--registros 200000]
+    python benchmark_desempenho.py conversao_numerica [--linhas 200000]
+    python benchmark_desempenho.py secoes_rag
+    python benchmark_desempenho.py chunks_rag
+    python benchmark_desempenho.py busca_rag [--repeticoes 20]
+    python benchmark_desempenho.py codigos_rag [--codigos 200]
+    python benchmark_desempenho.py vetorizacao_rag [--consultas 300]
+"""
+
+import argparse
+import json
+import pickle
+import random
+import re
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from processamento_dados import converter_colunas_numericas, dataframe_de_resposta
+from rag import (
+    PADROES_SECOES,
+    PALAVRAS_HABILIDADE,
+    SOBREPOSICAO_CHUNK,
+    TAMANHO_CHUNK,
+    TERMOS_HASHING,
+    TFIDF_MAX_TERMOS,
+    buscar_informacoes_relevantes,
+    carregar_ou_construir_dados_rag,
+    criar_indice_similaridade,
+    dividir_em_chunks,
+    dividir_em_chunks_estruturados,
+    executar_busca,
+    expandir_consulta,
+    extrair_secoes_importantes,
+    ler_documentos_referencia,
+    limites_documentos,
+    montar_texto_combinado,
+    selecionar_chunks,
+    trechos_codigo_habilidade
+)
+
+ETAPAS = [
+    'ENSINO FUNDAMENTAL DE 9 ANOS - 2º ANO',
+    'ENSINO FUNDAMENTAL DE 9 ANOS - 5º ANO',
+    'ENSINO FUNDAMENTAL DE 9 ANOS - 9º ANO'
+]
+DISCIPLINAS = ['LP', 'MT']
+REDES = ['ESTADUAL', 'MUNICIPAL', 'PUBLICA']
+TIPOS_ENTIDADE = [('01', 'ESTADO'), ('02', 'REGIONAL'), ('11', 'MUNICIPIO'), ('03', 'ESCOLA')]
+
+
+def gerar_registros(quantidade, semente=42):
+    """Gera registros no formato do array 'result' de getDadosResultado"""
+    aleatorio = random.Random(semente)
+    for i in range(quantidade):
+        tp_entidade, dc_tipo = TIPOS_ENTIDADE[i % len(TIPOS_ENTIDADE)]
+        previstos = aleatorio.randint(20, 5000)
+        registro = {
+            'CD_ENTIDADE': str(23000000 + i % 5000),
+            'NM_ENTIDADE': f'ESCOLA DE ENSINO FUNDAMENTAL {i % 5000}',
+            'TP_ENTIDADE': tp_entidade,
+            'DC_TIPO_ENTIDADE': dc_tipo,
+            'DC_HIERARQUIA': f'23/{2300 + i % 20}/{2301000 + i % 184}',
+            'VL_FILTRO_ETAPA': ETAPAS[i % len(ETAPAS)],
+            'VL_FILTRO_DISCIPLINA': DISCIPLINAS[i % len(DISCIPLINAS)],
+            'VL_FILTRO_REDE': REDES[i % len(REDES)],
+            'QT_ALUNO_PREVISTO': previstos,
+            'QT_ALUNO_EFETIVO': aleatorio.randint(0, previstos),
+            'TX_PARTICIPACAO': round(aleatorio.uniform(50, 100), 2),
+            'AVG_PROFICIENCIA_E1': round(aleatorio.uniform(100, 350), 1),
+        }
+        if i % 3 == 0:
+            registro['TX_ACERTO'] = f'{aleatorio.uniform(0, 100):.1f}'
+            registro['CD_HABILIDADE_MODELO_02'] = f'D{i % 40:02d}'
+            registro['DC_HABILIDADE'] = 'Identificar o tema ou assunto de um texto.'
+        yield registro
+
+
+def gerar_corpo_resposta(quantidade):
+    """Serializa os registros sintéticos como o corpo JSON da API"""
+    return json.dumps({'result': list(gerar_registros(quantidade))}, ensure_ascii=False).encode('utf-8')
+
+
+def medir(funcao):
+    """
+    Executa funcao duas vezes: uma para o tempo e outra para o pico de memória (tracemalloc)
+
+    O tracemalloc encarece cada alocação, o que penalizaria no tempo os
+    caminhos que alocam muitos objetos pequenos; por isso o tempo é medido
+    em uma execução sem ele.
+    """
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+def imprimir_comparacao(titulo, medicoes):
+    print(f"\n{titulo}")
+    print(f"{'caminho':<28}{'tempo (s)':>12}{'pico (MB)':>12}")
+    for nome, duracao, pico in medicoes:
+        print(f"{nome:<28}{duracao:>12.3f}{pico / 1024 / 1024:>12.1f}")
+
+
+def benchmark_leitura_json(registros, tamanho_pedaco=64 * 1024):
+    """Compara response.json() + pd.DataFrame(lista) com a leitura em pedaços"""
+    corpo = gerar_corpo_resposta(registros)
+    print(f"Corpo sintético: {registros} registros, {len(corpo) / 1024 / 1024:.1f} MB")
+
+    def caminho_anterior():
+        # Equivale a response.json() seguido de pd.DataFrame(data['result'])
+        data = json.loads(corpo.decode('utf-8'))
+        return pd.DataFrame(data['result'])
+
+    def caminho_streaming():
+        pedacos = (corpo[i:i + tamanho_pedaco] for i in range(0, len(corpo), tamanho_pedaco))
+        return dataframe_de_resposta(pedacos)
+
+    df_anterior, tempo_anterior, pico_anterior = medir(caminho_anterior)
+    df_streaming, tempo_streaming, pico_streaming = medir(caminho_streaming)
+
+    pd.testing.assert_frame_equal(df_anterior, df_streaming)
+    imprimir_comparacao("Leitura da resposta getDadosResultado", [
+        ("json + lista de dicts", tempo_anterior, pico_anterior),
+        ("streaming em colunas", tempo_streaming, pico_streaming),
+    ])
+
+
+# Colunas de medida convertidas pelas seções do painel
+COLUNAS_MEDIDA = [
+    'QT_ALUNO_PREVISTO', 'QT_ALUNO_EFETIVO', 'TX_PARTICIPACAO', 'AVG_PROFICIENCIA_E1',
+    'TX_N01_TRI_E1', 'TX_N02_TRI_E1', 'TX_N03_TRI_E1', 'TX_N04_TRI_E1',
+    'NU_N01_TRI_E1', 'NU_N02_TRI_E1', 'NU_N03_TRI_E1', 'NU_N04_TRI_E1',
+    'TX_PRETA', 'TX_BRANCA', 'TX_PARDA', 'NU_PRETA', 'NU_BRANCA', 'NU_PARDA',
+    'TX_FEMININO', 'TX_MASCULINO'
+]
+MARCADORES_AUSENCIA = ['-', 'N/A', '', 'NULL', None, ' ']
+
+
+def converter_para_numerico_anterior(df, colunas):
+    """Implementação anterior de converter_para_numerico (quatro passadas por coluna)"""
+    for col in colunas:
+        if col in df.columns:
+            df[col] = df[col].replace(['-', 'N/A', 'n/a', '', 'NULL', 'null', 'None'], pd.NA)
+            if df[col].dtype == 'object':
+                df[col] = df[col].astype(str).str.strip()
+                df[col] = df[col].replace('', pd.NA)
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def gerar_frame_textual(linhas, decimal_brasileiro=False, semente=42):
+    """Gera um DataFrame de medidas em texto, como chegam da API, com marcadores de ausência"""
+    aleatorio = random.Random(semente)
+    dados = {}
+    for coluna in COLUNAS_MEDIDA:
+        valores = []
+        for _ in range(linhas):
+            sorteio = aleatorio.random()
+            if sorteio < 0.05:
+                valores.append(aleatorio.choice(MARCADORES_AUSENCIA))
+            elif coluna.startswith(('QT_', 'NU_')):
+                valores.append(str(aleatorio.randint(0, 5000)))
+            elif decimal_brasileiro and sorteio < 0.30:
+                valores.append(f' {aleatorio.uniform(0, 1000):.1f} '.replace('.', ','))
+            else:
+                valores.append(f'{aleatorio.uniform(0, 1000):.1f}')
+        dados[coluna] = valores
+    return pd.DataFrame(dados)
+
+
+def benchmark_conversao_numerica(linhas):
+    """Compara a conversão anterior (quatro passadas por coluna) com a de caminho rápido em um frame do tamanho do estado"""
+    celulas = linhas * len(COLUNAS_MEDIDA)
+    print(f"Frame sintético: {linhas} linhas x {len(COLUNAS_MEDIDA)} colunas ({celulas} células)")
+
+    base = gerar_frame_textual(linhas)
+    df_anterior, tempo_anterior, pico_anterior = medir(
+        lambda: converter_para_numerico_anterior(base.copy(), COLUNAS_MEDIDA)
+    )
+    df_rapido, tempo_rapido, pico_rapido = medir(
+        lambda: converter_colunas_numericas(base.copy(), COLUNAS_MEDIDA)
+    )
+
+    # Sem vírgulas decimais os dois caminhos devem produzir os mesmos valores
+    pd.testing.assert_frame_equal(df_anterior, df_rapido, check_dtype=False)
+    imprimir_comparacao("Conversão numérica das colunas de medida", [
+        ("quatro passadas", tempo_anterior, pico_anterior),
+        ("caminho rápido", tempo_rapido, pico_rapido),
+    ])
+    for nome, duracao in (("quatro passadas", tempo_anterior), ("caminho rápido", tempo_rapido)):
+        print(f"{nome:<28}{celulas / duracao / 1e6:>12.2f} M células/s")
+
+    # Decimais no formato brasileiro: o caminho anterior os descartava como NaN
+    brasileiro = gerar_frame_textual(linhas, decimal_brasileiro=True)
+    ausentes_anterior = int(converter_para_numerico_anterior(brasileiro.copy(), COLUNAS_MEDIDA).isna().sum().sum())
+    ausentes_rapido = int(converter_colunas_numericas(brasileiro.copy(), COLUNAS_MEDIDA).isna().sum().sum())
+    print(f"\nCom decimais '1.234,5': {ausentes_anterior} ausentes (anterior) x {ausentes_rapido} (caminho rápido)")
+
+
+def extrair_secoes_importantes_anterior(texto_md):
+    """Implementação anterior: um re.finditer por seção e cópia de cada contexto"""
+    secoes = {}
+    for nome_secao, padrao in PADROES_SECOES.items():
+        for match in re.finditer(padrao, texto_md, re.IGNORECASE):
+            inicio = max(0, match.start() - 500)
+            fim = min(len(texto_md), match.end() + 500)
+            secoes.setdefault(nome_secao, []).append(texto_md[inicio:fim])
+    return secoes
+
+
+def benchmark_secoes_rag():
+    """Compara as 24 buscas separadas com a varredura única sobre dcrc.md + bncc.md"""
+    textos, _ = ler_documentos_referencia()
+    if textos is None:
+        return
+    texto = montar_texto_combinado(textos)
+    print(f"Texto combinado: {len(texto) / 1024 / 1024:.1f} M caracteres")
+
+    secoes_anterior, tempo_anterior, pico_anterior = medir(lambda: extrair_secoes_importantes_anterior(texto))
+    secoes_unica, tempo_unica, pico_unica = medir(lambda: extrair_secoes_importantes(texto, limite_por_secao=None))
+    secoes_limitada, tempo_limitada, pico_limitada = medir(lambda: extrair_secoes_importantes(texto))
+
+    # Sem limite, a varredura única encontra exatamente os mesmos contextos
+    assert secoes_anterior.keys() == secoes_unica.keys()
+    for nome, contextos in secoes_anterior.items():
+        assert contextos == list(secoes_unica[nome]), nome
+        assert contextos[:len(secoes_limitada[nome])] == list(secoes_limitada[nome]), nome
+
+    imprimir_comparacao("Extração de seções importantes", [
+        ("24 x re.finditer", tempo_anterior, pico_anterior),
+        ("varredura única", tempo_unica, pico_unica),
+        ("varredura única com limite", tempo_limitada, pico_limitada),
+    ])
+    print(f"Ocorrências: {sum(map(len, secoes_anterior.values()))} (anterior) x "
+          f"{sum(map(len, secoes_limitada.values()))} (com limite por seção)")
+
+
+def dividir_em_chunks_anterior(texto, tamanho_chunk=TAMANHO_CHUNK, sobreposicao=SOBREPOSICAO_CHUNK):
+    """Implementação anterior: lista de palavras e cópia do texto de cada chunk"""
+    palavras = texto.split()
+    chunks = []
+    for i in range(0, len(palavras), tamanho_chunk - sobreposicao):
+        chunk = ' '.join(palavras[i:i + tamanho_chunk])
+        if chunk.strip():
+            chunks.append({'texto': chunk, 'indice': len(chunks), 'posicao_inicial': i})
+    return chunks
+
+
+def benchmark_chunks_rag():
+    """Compara os chunks em lista de dicionários com o armazém de posições sobre dcrc.md + bncc.md"""
+    textos, _ = ler_documentos_referencia()
+    if textos is None:
+        return
+    texto = montar_texto_combinado(textos)
+    print(f"Texto combinado: {len(texto) / 1024 / 1024:.1f} M caracteres")
+
+    chunks_anterior, tempo_anterior, pico_anterior = medir(lambda: dividir_em_chunks_anterior(texto))
+    chunks_posicoes, tempo_posicoes, pico_posicoes = medir(lambda: dividir_em_chunks(texto, TAMANHO_CHUNK, SOBREPOSICAO_CHUNK))
+    chunks_estruturados, tempo_estruturados, pico_estruturados = medir(
+        lambda: dividir_em_chunks_estruturados(texto, limites_documentos(textos), TAMANHO_CHUNK, SOBREPOSICAO_CHUNK)
+    )
+
+    # O armazém monta, sob demanda, exatamente os mesmos chunks
+    campos = ('texto', 'indice')
+    assert [{campo: c[campo] for campo in campos} for c in chunks_anterior] == \
+        [{campo: c[campo] for campo in campos} for c in chunks_posicoes]
+
+    imprimir_comparacao("Divisão do texto em chunks", [
+        ("lista de dicts com texto", tempo_anterior, pico_anterior),
+        ("posições no texto", tempo_posicoes, pico_posicoes),
+        ("estrutural com metadados", tempo_estruturados, pico_estruturados),
+    ])
+    print(f"Chunks: {len(chunks_posicoes)} (janelas de palavras) x {len(chunks_estruturados)} (estruturais)")
+
+
+def fonte_por_texto_anterior(texto, indice, incluir_minusculas=True):
+    """Identificação anterior da fonte do chunk, refeita a cada busca"""
+    if "BNCC" in texto or "Base Nacional Comum Curricular" in texto:
+        return "BNCC"
+    if "DCRC" in texto or "Documento Curricular Referencial" in texto or (incluir_minusculas and "dcrc" in texto.lower()):
+        return "DCRC"
+    return "BNCC" if indice % 2 == 0 else "DCRC"
+
+
+def buscar_informacoes_relevantes_anterior(consulta, dados_rag, top_k=5):
+    """Implementação anterior: cosseno contra todos os chunks, argsort completo e varredura dos textos"""
+    indice = dados_rag['indice_similaridade']
+    chunks = indice['chunks']
+    consulta_vector = indice['vectorizer'].transform([expandir_consulta(consulta)])
+    similaridades = cosine_similarity(consulta_vector, indice['tfidf_matrix']).flatten()
+
+    resultados = []
+    for idx in np.argsort(similaridades)[::-1][:top_k]:
+        if similaridades[idx] > 0.05:
+            texto = chunks[idx]['texto']
+            resultados.append({'chunk': chunks[idx], 'similaridade': similaridades[idx], 'texto': texto,
+                               'fonte': fonte_por_texto_anterior(texto, idx)})
+
+    if 'habilidade' in consulta.lower() or 'competência' in consulta.lower():
+        for i, chunk in enumerate(chunks):
+            if any(palavra in chunk['texto'].lower() for palavra in PALAVRAS_HABILIDADE):
+                if not any(r['chunk']['indice'] == chunk['indice'] for r in resultados):
+                    resultados.append({'chunk': chunk, 'similaridade': 0.4, 'texto': chunk['texto'],
+                                       'fonte': fonte_por_texto_anterior(chunk['texto'], i, incluir_minusculas=False)})
+                    if len(resultados) >= top_k * 2:
+                        break
+
+    if not resultados:
+        palavras_chave = consulta.lower().split()
+        for chunk in chunks:
+            if any(palavra in chunk['texto'].lower() for palavra in palavras_chave):
+                resultados.append({'chunk': chunk, 'similaridade': 0.3, 'texto': chunk['texto']})
+                if len(resultados) >= top_k:
+                    break
+    return resultados
+
+
+# Consultas no formato das feitas pelas análises do painel
+CONSULTAS_BUSCA = [
+    "percurso aprendizado progressão sequência Identificar o tema ou assunto de um texto",
+    "dependência pré-requisito hierarquia habilidade Resolver problema com números naturais",
+    "relação conexão vinculação habilidade componente Inferir informação implícita",
+    "competência específica objetivo aprendizagem Reconhecer frações",
+    "proficiência desempenho dos estudantes em língua portuguesa",
+    "participação dos alunos na avaliação externa",
+    "padrões de desempenho e níveis de proficiência em matemática",
+]
+
+# Filtro da busca filtrada: Matemática do 5º ano
+FILTROS_BUSCA = {'componente': 'MA', 'ano': 5}
+
+
+def benchmark_busca_rag(repeticoes):
+    """Compara a latência da busca anterior com a busca pelo índice invertido no DCRC/BNCC"""
+    dados_rag = carregar_ou_construir_dados_rag()
+    if dados_rag is None:
+        return
+    print(f"Índice: {len(dados_rag['chunks'])} chunks, {dados_rag['indice_similaridade']['tfidf_matrix'].shape[1]} colunas TF-IDF")
+
+    def latencias(buscar):
+        tempos = []
+        for _ in range(repeticoes):
+            for consulta in CONSULTAS_BUSCA:
+                inicio = time.perf_counter()
+                buscar(consulta, dados_rag, top_k=3)
+                tempos.append(time.perf_counter() - inicio)
+        return np.array(tempos) * 1000
+
+    # As duas buscas devem devolver os mesmos chunks, na mesma ordem (a fonte
+    # agora vem do documento de origem, não do texto do chunk)
+    for consulta in CONSULTAS_BUSCA:
+        anterior = buscar_informacoes_relevantes_anterior(consulta, dados_rag, top_k=3)
+        atual = executar_busca(consulta, dados_rag, top_k=3)
+        assert [r['chunk']['indice'] for r in anterior] == [r['chunk']['indice'] for r in atual], consulta
+        assert np.allclose([r['similaridade'] for r in anterior], [r['similaridade'] for r in atual]), consulta
+
+    print(f"\nBusca RAG ({len(CONSULTAS_BUSCA)} consultas x {repeticoes} repetições, top_k=3)")
+    print(f"{'caminho':<28}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    def executar_busca_filtrada(consulta, dados, top_k):
+        return executar_busca(consulta, dados, top_k, filtros=FILTROS_BUSCA)
+
+    for nome, buscar in (("cosseno + argsort", buscar_informacoes_relevantes_anterior),
+                         ("índice invertido", executar_busca),
+                         ("índice invertido filtrado", executar_busca_filtrada),
+                         ("memória de consultas", buscar_informacoes_relevantes)):
+        tempos = latencias(buscar)
+        print(f"{nome:<28}{np.percentile(tempos, 50):>12.2f}{np.percentile(tempos, 95):>12.2f}")
+
+    candidatos = int(selecionar_chunks(dados_rag['chunks'], FILTROS_BUSCA).sum())
+    print(f"\nCandidatos com filtros {FILTROS_BUSCA}: {candidatos} de {len(dados_rag['chunks'])} chunks")
+
+
+def benchmark_codigos_rag(quantidade_codigos):
+    """Compara a busca TF-IDF pelo código de habilidade com a consulta ao índice de códigos"""
+    dados_rag = carregar_ou_construir_dados_rag()
+    if dados_rag is None:
+        return
+    codigos = sorted(dados_rag['codigos_habilidade'])[:quantidade_codigos]
+    print(f"Índice de códigos: {len(dados_rag['codigos_habilidade'])} códigos; medindo {len(codigos)}")
+
+    def latencias(consultar):
+        tempos = []
+        for codigo in codigos:
+            inicio = time.perf_counter()
+            consultar(codigo)
+            tempos.append(time.perf_counter() - inicio)
+        return np.array(tempos) * 1000
+
+    # Trechos por código: ler o texto de cada um, como faz a análise de habilidades
+    def consultar_indice(codigo):
+        return [' '.join(trecho.split()) for trecho in trechos_codigo_habilidade(dados_rag, codigo)[:2]]
+
+    def consultar_busca(codigo):
+        return executar_busca(codigo, dados_rag, top_k=2)
+
+    # Todo trecho do índice contém o código
+    for codigo in codigos:
+        assert all(codigo in trecho.replace('EFO', 'EF0') for trecho in trechos_codigo_habilidade(dados_rag, codigo)), codigo
+
+    print(f"\nTrechos por código de habilidade ({len(codigos)} códigos)")
+    print(f"{'caminho':<28}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for nome, consultar in (("busca TF-IDF pelo código", consultar_busca), ("índice de códigos", consultar_indice)):
+        tempos = latencias(consultar)
+        print(f"{nome:<28}{np.percentile(tempos, 50):>12.3f}{np.percentile(tempos, 95):>12.3f}")
+
+
+def criar_indice_similaridade_anterior(chunks):
+    """Configuração anterior: 1000 termos mais frequentes (com bigramas), float64, sem stopwords"""
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words=None, ngram_range=(1, 2))
+    tfidf_matrix = vectorizer.fit_transform(chunks.texto_do_chunk(i) for i in range(len(chunks)))
+    return {
+        'vectorizer': vectorizer,
+        'tfidf_matrix': tfidf_matrix.tocsc(),
+        'marcas': np.zeros(len(chunks), dtype=np.uint8),
+        'chunks': chunks
+    }
+
+
+def consultas_por_habilidade(dados_rag, quantidade, semente=42):
+    """
+    Consultas com resposta conhecida: o texto de uma habilidade (sem o código)
+    deve recuperar o chunk em que ela está
+    """
+    chunks = dados_rag['chunks']
+    inicios = np.frombuffer(chunks.inicios, dtype=np.int64)
+    fins = np.frombuffer(chunks.fins, dtype=np.int64)
+    codigos = sorted(dados_rag['codigos_habilidade'])
+    random.Random(semente).shuffle(codigos)
+
+    consultas = []
+    for codigo in codigos:
+        trechos = trechos_codigo_habilidade(dados_rag, codigo)
+        posicao = trechos.posicoes[0]
+        texto = re.sub(r'\(?EF[0-9O]\d[A-Z]{2}\d{2,3}\)?', ' ', trechos[0])
+        texto = ' '.join(re.sub(r'[|#*]', ' ', texto).split())[:300]
+        relevantes = set(np.flatnonzero((inicios <= posicao) & (fins > posicao)).tolist())
+        if len(texto) >= 40 and relevantes:
+            consultas.append((texto, relevantes))
+        if len(consultas) >= quantidade:
+            break
+    return consultas
+
+
+def tamanho_indice_mb(indice):
+    """Bytes da matriz TF-IDF e do vetorizador serializado"""
+    matriz = indice['tfidf_matrix']
+    bytes_matriz = matriz.data.nbytes + matriz.indices.nbytes + matriz.indptr.nbytes
+    bytes_vetorizador = len(pickle.dumps(indice['vectorizer'], protocol=pickle.HIGHEST_PROTOCOL))
+    return bytes_matriz / 1024 / 1024, bytes_vetorizador / 1024 / 1024
+
+
+def benchmark_vetorizacao_rag(quantidade_consultas, top_k=5):
+    """Compara recall, latência e memória da vetorização anterior com a podada em float32 e a por hashing"""
+    dados_rag = carregar_ou_construir_dados_rag()
+    if dados_rag is None:
+        return
+    chunks = dados_rag['chunks']
+    consultas = consultas_por_habilidade(dados_rag, quantidade_consultas)
+    print(f"{len(chunks)} chunks; {len(consultas)} consultas com chunk relevante conhecido")
+
+    configuracoes = (
+        ("anterior (1000 termos, f64)", lambda: criar_indice_similaridade_anterior(chunks)),
+        (f"vocabulário ({TFIDF_MAX_TERMOS} termos, f32)", lambda: criar_indice_similaridade(chunks, 'vocabulario')),
+        (f"hashing ({TERMOS_HASHING} colunas, f32)", lambda: criar_indice_similaridade(chunks, 'hashing'))
+    )
+
+    print(f"\n{'vetorização':<30}{'ajuste (s)':>11}{'colunas':>9}{'matriz MB':>11}{'vetor. MB':>11}"
+          f"{f'recall@{top_k}':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for nome, construir in configuracoes:
+        inicio = time.perf_counter()
+        indice = construir()
+        tempo_ajuste = time.perf_counter() - inicio
+        dados = dict(dados_rag, indice_similaridade=indice)
+
+        acertos = 0
+        tempos = []
+        for consulta, relevantes in consultas:
+            inicio = time.perf_counter()
+            resultados = executar_busca(consulta, dados, top_k=top_k)
+            tempos.append(time.perf_counter() - inicio)
+            acertos += any(r['chunk']['indice'] in relevantes for r in resultados[:top_k])
+        tempos = np.array(tempos) * 1000
+
+        mb_matriz, mb_vetorizador = tamanho_indice_mb(indice)
+        print(f"{nome:<30}{tempo_ajuste:>11.2f}{indice['tfidf_matrix'].shape[1]:>9}{mb_matriz:>11.2f}"
+              f"{mb_vetorizador:>11.2f}{acertos / len(consultas):>11.3f}"
+              f"{np.percentile(tempos, 50):>10.2f}{np.percentile(tempos, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de desempenho do painel SPAECE")
+    subcomandos = parser.add_subparsers(dest="benchmark", required=True)
+
+    parser_json = subcomandos.add_parser("leitura_json", help="Memória da leitura da resposta da API")
+    parser_json.add_argument("--registros", type=int, default=200000)
+
+    parser_conversao = subcomandos.add_parser("conversao_numerica", help="Vazão da conversão numérica")
+    parser_conversao.add_argument("--linhas", type=int, default=200000)
+
+    subcomandos.add_parser("secoes_rag", help="Tempo e memória da extração de seções do DCRC/BNCC")
+    subcomandos.add_parser("chunks_rag", help="Tempo e memória da divisão do DCRC/BNCC em chunks")
+
+    parser_busca = subcomandos.add_parser("busca_rag", help="Latência da busca no índice RAG")
+    parser_busca.add_argument("--repeticoes", type=int, default=20)
+
+    parser_codigos = subcomandos.add_parser("codigos_rag", help="Latência dos trechos por código de habilidade")
+    parser_codigos.add_argument("--codigos", type=int, default=200)
+
+    parser_vetorizacao = subcomandos.add_parser("vetorizacao_rag", help="Recall e latência das vetorizações TF-IDF")
+    parser_vetorizacao.add_argument("--consultas", type=int, default=300)
+
+    args = parser.parse_args()
+    if args.benchmark == "leitura_json":
+        benchmark_leitura_json(args.registros)
+    elif args.benchmark == "conversao_numerica":
+        benchmark_conversao_numerica(args.linhas)
+    elif args.benchmark == "secoes_rag":
+        benchmark_secoes_rag()
+    elif args.benchmark == "chunks_rag":
+        benchmark_chunks_rag()
+    elif args.benchmark == "busca_rag":
+        benchmark_busca_rag(args.repeticoes)
+    elif args.benchmark == "codigos_rag":
+        benchmark_codigos_rag(args.codigos)
+    elif args.benchmark == "vetorizacao_rag":
+        benchmark_vetorizacao_rag(args.consultas)
@@ -0,0 +1,254 @@
+"""
+Cache persistente em disco (SQLite) para respostas da API SPAECE
+
+Os valores são gravados comprimidos (zlib) e organizados por namespace,
+com expiração por tempo (TTL) e limite de tamanho total com remoção dos
+itens usados há mais tempo (LRU). O cache é compartilhado por todas as
+sessões e sobrevive a reinicializações do servidor.
+
+Uso pela linha de comando:
+    python cache_disco.py estatisticas
+    python cache_disco.py invalidar [--namespace NOME] [--rotulo AGREGADO]
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from config_api import CACHE_DIR, CACHE_TAMANHO_MAXIMO_BYTES
+
+ARQUIVO_CACHE = os.path.join(CACHE_DIR, "cache.sqlite3")
+NIVEL_COMPRESSAO = 6
+TAMANHO_PEDACO = 64 * 1024
+
+_lock_escrita = threading.Lock()
+_tabela_criada = False
+
+
+def _conectar():
+    """Abre uma conexão com o banco do cache, criando a estrutura se necessário"""
+    global _tabela_criada
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conexao = sqlite3.connect(ARQUIVO_CACHE, timeout=30)
+    if not _tabela_criada:
+        # Várias threads abrindo o cache ao mesmo tempo não podem trocar o modo do diário juntas
+        with _lock_escrita:
+            if not _tabela_criada:
+                conexao.execute("PRAGMA journal_mode=WAL")
+                conexao.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        namespace TEXT NOT NULL,
+                        chave TEXT NOT NULL,
+                        rotulo TEXT,
+                        valor BLOB NOT NULL,
+                        tamanho INTEGER NOT NULL,
+                        criado_em REAL NOT NULL,
+                        acessado_em REAL NOT NULL,
+                        PRIMARY KEY (namespace, chave)
+                    )
+                """)
+                conexao.execute("CREATE INDEX IF NOT EXISTS idx_cache_acesso ON cache (acessado_em)")
+                conexao.commit()
+                _tabela_criada = True
+    return conexao
+
+
+def _obter_comprimido(namespace, chave, ttl):
+    """Retorna o valor comprimido armazenado, atualizando o último acesso"""
+    conexao = _conectar()
+    try:
+        linha = conexao.execute(
+            "SELECT valor, criado_em FROM cache WHERE namespace = ? AND chave = ?",
+            (namespace, chave)
+        ).fetchone()
+        if linha is None:
+            return None
+
+        valor, criado_em = linha
+        agora = time.time()
+        if ttl is not None and agora - criado_em > ttl:
+            with _lock_escrita:
+                conexao.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND chave = ?",
+                    (namespace, chave)
+                )
+                conexao.commit()
+            return None
+
+        with _lock_escrita:
+            conexao.execute(
+                "UPDATE cache SET acessado_em = ? WHERE namespace = ? AND chave = ?",
+                (agora, namespace, chave)
+            )
+            conexao.commit()
+        return valor
+    finally:
+        conexao.close()
+
+
+def obter(namespace, chave, ttl=None):
+    """
+    Retorna o valor (bytes) armazenado ou None se ausente/expirado
+
+    Args:
+        namespace (str): Agrupamento do item (ex.: 'api_spaece')
+        chave (str): Chave do item dentro do namespace
+        ttl (float): Validade em segundos; None para não expirar
+    """
+    try:
+        valor = _obter_comprimido(namespace, chave, ttl)
+        return None if valor is None else zlib.decompress(valor)
+    except (sqlite3.Error, zlib.error) as e:
+        print(f"Erro ao ler cache em disco: {e}")
+        return None
+
+
+def obter_em_pedacos(namespace, chave, ttl=None, tamanho_pedaco=TAMANHO_PEDACO):
+    """
+    Retorna um iterador de pedaços (bytes) descomprimidos, ou None se ausente/expirado
+
+    Evita manter o valor descomprimido inteiro em memória de uma só vez.
+    """
+    try:
+        valor = _obter_comprimido(namespace, chave, ttl)
+    except sqlite3.Error as e:
+        print(f"Erro ao ler cache em disco: {e}")
+        return None
+    if valor is None:
+        return None
+
+    def pedacos():
+        descompressor = zlib.decompressobj()
+        for inicio in range(0, len(valor), tamanho_pedaco):
+            parte = descompressor.decompress(valor[inicio:inicio + tamanho_pedaco])
+            if parte:
+                yield parte
+        resto = descompressor.flush()
+        if resto:
+            yield resto
+
+    return pedacos()
+
+
+def gravar(namespace, chave, valor, rotulo=None):
+    """
+    Armazena um valor (bytes) no cache e aplica o limite de tamanho
+
+    Args:
+        namespace (str): Agrupamento do item
+        chave (str): Chave do item dentro do namespace
+        valor (bytes): Conteúdo a armazenar
+        rotulo (str): Identificação legível usada na invalidação manual
+    """
+    gravar_comprimido(namespace, chave, zlib.compress(valor, NIVEL_COMPRESSAO), rotulo=rotulo)
+
+
+def gravar_comprimido(namespace, chave, comprimido, rotulo=None):
+    """Armazena um valor já comprimido com zlib (ver criar_compressor)"""
+    try:
+        agora = time.time()
+        conexao = _conectar()
+        try:
+            with _lock_escrita:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO cache "
+                    "(namespace, chave, rotulo, valor, tamanho, criado_em, acessado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, chave, rotulo, comprimido, len(comprimido), agora, agora)
+                )
+                _remover_excedente(conexao, CACHE_TAMANHO_MAXIMO_BYTES)
+                conexao.commit()
+        finally:
+            conexao.close()
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar cache em disco: {e}")
+
+
+def criar_compressor():
+    """Retorna um compressor zlib compatível com gravar_comprimido"""
+    return zlib.compressobj(NIVEL_COMPRESSAO)
+
+
+def _remover_excedente(conexao, tamanho_maximo):
+    """Remove os itens acessados há mais tempo até o cache caber no limite"""
+    total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM cache").fetchone()[0]
+    if total <= tamanho_maximo:
+        return
+
+    cursor = conexao.execute(
+        "SELECT namespace, chave, tamanho FROM cache ORDER BY acessado_em ASC"
+    )
+    remover = []
+    for namespace, chave, tamanho in cursor:
+        if total <= tamanho_maximo:
+            break
+        remover.append((namespace, chave))
+        total -= tamanho
+    conexao.executemany("DELETE FROM cache WHERE namespace = ? AND chave = ?", remover)
+
+
+def invalidar(namespace=None, rotulo=None):
+    """
+    Remove itens do cache
+
+    Args:
+        namespace (str): Limita a remoção a um namespace; None remove de todos
+        rotulo (str): Limita a remoção aos itens com este rótulo
+
+    Returns:
+        int: Quantidade de itens removidos
+    """
+    condicoes, parametros = [], []
+    if namespace is not None:
+        condicoes.append("namespace = ?")
+        parametros.append(namespace)
+    if rotulo is not None:
+        condicoes.append("rotulo = ?")
+        parametros.append(rotulo)
+    where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    conexao = _conectar()
+    try:
+        with _lock_escrita:
+            removidos = conexao.execute(f"DELETE FROM cache{where}", parametros).rowcount
+            conexao.commit()
+        return removidos
+    finally:
+        conexao.close()
+
+
+def estatisticas():
+    """Retorna quantidade de itens e bytes ocupados por namespace"""
+    conexao = _conectar()
+    try:
+        linhas = conexao.execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(tamanho), 0) FROM cache GROUP BY namespace"
+        ).fetchall()
+        return {namespace: {'itens': itens, 'bytes': tamanho} for namespace, itens, tamanho in linhas}
+    finally:
+        conexao.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerencia o cache em disco do painel SPAECE")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    parser_invalidar = subcomandos.add_parser("invalidar", help="Remove itens do cache")
+    parser_invalidar.add_argument("--namespace", help="Namespace a invalidar (ex.: api_spaece)")
+    parser_invalidar.add_argument("--rotulo", help="Rótulo a invalidar (ex.: código do agregado)")
+
+    subcomandos.add_parser("estatisticas", help="Mostra o uso do cache")
+
+    args = parser.parse_args()
+    if args.comando == "invalidar":
+        total = invalidar(namespace=args.namespace, rotulo=args.rotulo)
+        print(f"{total} item(ns) removido(s) do cache")
+    else:
+        uso = estatisticas()
+        if not uso:
+            print("Cache vazio")
+        for namespace, info in uso.items():
+            print(f"{namespace}: {info['itens']} item(ns), {info['bytes'] / 1024 / 1024:.1f} MB")
@@ -0,0 +1,267 @@
+"""
+Cliente de consulta à API SPAECE (getDadosResultado)
+
+Concentra as requisições ao portal CAEd sem depender do Streamlit, para que
+possa ser usado tanto pelo painel quanto por scripts de linha de comando.
+As exceções de rede são propagadas; cabe ao chamador decidir como exibi-las.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cache_disco
+from config_api import (
+    API_URL,
+    CACHE_TTL_API_SEGUNDOS,
+    HEADERS,
+    INDICADORES,
+    MAX_CONSULTAS_PARALELAS,
+    TIMEOUT_API,
+    criar_payload,
+    gerar_chave_payload,
+    indicadores_dos_grupos
+)
+from processamento_dados import dataframe_de_resposta
+from sessao_http import obter_sessao
+
+# Namespace das respostas da API no cache em disco
+NAMESPACE_CACHE_API = "api_spaece"
+
+# Consultas em andamento por chave de payload (single-flight)
+_lock_em_andamento = threading.Lock()
+_em_andamento = {}
+_contadores_voo = {'consultas_lideres': 0, 'consultas_compartilhadas': 0}
+
+
+def _executar_voo_unico(chave, funcao):
+    """
+    Executa funcao uma única vez por chave entre chamadas simultâneas
+
+    A primeira thread a pedir uma chave executa a consulta; as demais que
+    chegarem enquanto ela estiver em andamento aguardam e recebem o mesmo
+    resultado (ou a mesma exceção). O resultado compartilhado deve ser
+    tratado como somente leitura.
+    """
+    with _lock_em_andamento:
+        futuro = _em_andamento.get(chave)
+        lider = futuro is None
+        if lider:
+            futuro = Future()
+            _em_andamento[chave] = futuro
+            _contadores_voo['consultas_lideres'] += 1
+        else:
+            _contadores_voo['consultas_compartilhadas'] += 1
+
+    if not lider:
+        return futuro.result()
+
+    try:
+        resultado = funcao()
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    else:
+        futuro.set_result(resultado)
+        return resultado
+    finally:
+        with _lock_em_andamento:
+            _em_andamento.pop(chave, None)
+
+
+def estatisticas_voo_unico():
+    """Retorna quantas consultas foram executadas e quantas aproveitaram uma em andamento"""
+    with _lock_em_andamento:
+        return dict(_contadores_voo)
+
+
+def _montar_payload(agregado, grupos):
+    """Cria o payload da consulta de um agregado e sua chave de cache"""
+    indicadores = INDICADORES if grupos is None else indicadores_dos_grupos(grupos)
+    payload = criar_payload(
+        indicadores=indicadores,
+        agregado=agregado,
+        filtros=[],
+        nivel_abaixo="0"
+    )
+    return payload, gerar_chave_payload(payload)
+
+
+def requisitar_dados_agregado(agregado, grupos=None, usar_cache=True):
+    """
+    Consulta a API SPAECE para um agregado e retorna o JSON decodificado
+
+    A resposta bruta fica guardada no cache em disco, indexada pelo hash do
+    payload, e é reaproveitada por todas as sessões até expirar. Chamadas
+    simultâneas para o mesmo payload compartilham a mesma consulta.
+
+    Args:
+        agregado (str): Código do agregado (estado, CREDE, município ou escola)
+        grupos (iterable): Grupos de config_api.GRUPOS_INDICADORES a consultar;
+                           None consulta todos os indicadores
+        usar_cache (bool): Consultar/alimentar o cache em disco
+
+    Returns:
+        dict: Resposta da API decodificada
+    """
+    agregado = str(agregado).strip()
+    payload, chave = _montar_payload(agregado, grupos)
+
+    # Consultas simultâneas ao mesmo payload aguardam uma única ida ao portal
+    return _executar_voo_unico(
+        (chave, usar_cache, 'json'),
+        lambda: _buscar_payload(payload, chave, agregado, usar_cache, _ler_json)
+    )
+
+
+def requisitar_df_agregado(agregado, grupos=None, usar_cache=True):
+    """
+    Consulta a API SPAECE para um agregado e retorna o DataFrame dos resultados
+
+    O corpo da resposta (da rede ou do cache em disco) é lido em pedaços e
+    convertido diretamente em colunas, sem a lista de dicionários
+    intermediária. O DataFrame pode ser compartilhado com outras chamadas
+    simultâneas e deve ser tratado como somente leitura.
+
+    Returns:
+        pd.DataFrame: Resultados do agregado, ou None se a resposta estiver vazia
+    """
+    agregado = str(agregado).strip()
+    payload, chave = _montar_payload(agregado, grupos)
+
+    return _executar_voo_unico(
+        (chave, usar_cache, 'dataframe'),
+        lambda: _buscar_payload(payload, chave, agregado, usar_cache, dataframe_de_resposta)
+    )
+
+
+def _ler_json(pedacos):
+    return json.loads(b''.join(pedacos))
+
+
+def _resultado_vazio(resultado):
+    if resultado is None:
+        return True
+    if hasattr(resultado, 'empty'):
+        return resultado.empty
+    return not resultado
+
+
+def _buscar_payload(payload, chave, agregado, usar_cache, leitor):
+    """
+    Busca o payload no cache em disco ou, se ausente, na API
+
+    Args:
+        leitor (callable): Converte os pedaços de bytes do corpo no resultado
+    """
+    if usar_cache:
+        pedacos = cache_disco.obter_em_pedacos(NAMESPACE_CACHE_API, chave, ttl=CACHE_TTL_API_SEGUNDOS)
+        if pedacos is not None:
+            return leitor(pedacos)
+
+    response = obter_sessao().post(
+        API_URL,
+        json=payload,
+        headers=HEADERS,
+        timeout=TIMEOUT_API,
+        stream=True
+    )
+    try:
+        response.raise_for_status()
+
+        # O corpo é comprimido para o cache à medida que é lido pelo leitor
+        compressor = cache_disco.criar_compressor() if usar_cache else None
+        partes_comprimidas = []
+
+        def ler_corpo():
+            for pedaco in response.iter_content(chunk_size=cache_disco.TAMANHO_PEDACO):
+                if compressor is not None:
+                    partes_comprimidas.append(compressor.compress(pedaco))
+                yield pedaco
+
+        corpo = ler_corpo()
+        resultado = leitor(corpo)
+        for _ in corpo:
+            pass  # o leitor pode parar no fim do array; o cache guarda o corpo inteiro
+    finally:
+        response.close()
+
+    # Respostas vazias não são guardadas para permitir nova tentativa
+    if compressor is not None and not _resultado_vazio(resultado):
+        partes_comprimidas.append(compressor.flush())
+        cache_disco.gravar_comprimido(
+            NAMESPACE_CACHE_API, chave, b''.join(partes_comprimidas), rotulo=agregado
+        )
+
+    return resultado
+
+
+def consultar_agregados_em_paralelo(
+    agregados,
+    funcao_consulta=requisitar_dados_agregado,
+    max_paralelo=MAX_CONSULTAS_PARALELAS,
+    inicializador=None
+):
+    """
+    Executa a consulta de vários agregados com concorrência limitada
+
+    Args:
+        agregados (list): Códigos dos agregados a consultar
+        funcao_consulta (callable): Função que recebe um agregado e retorna seus dados
+        max_paralelo (int): Número máximo de consultas simultâneas
+        inicializador (callable): Executado em cada thread antes das consultas
+
+    Returns:
+        list: Um dict por agregado, na mesma ordem de entrada, com as chaves
+              'agregado', 'dados', 'erro' e 'latencia' (segundos)
+    """
+    agregados = list(agregados)
+    if not agregados:
+        return []
+
+    def consultar(agregado):
+        inicio = time.perf_counter()
+        try:
+            dados, erro = funcao_consulta(agregado), None
+        except Exception as e:
+            dados, erro = None, e
+        latencia = time.perf_counter() - inicio
+        status = "ok" if erro is None else f"erro: {erro}"
+        print(f"Consulta SPAECE agregado {agregado}: {latencia:.2f}s ({status})")
+        return {'agregado': agregado, 'dados': dados, 'erro': erro, 'latencia': latencia}
+
+    max_workers = max(1, min(int(max_paralelo), len(agregados)))
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=inicializador) as executor:
+        # executor.map preserva a ordem de entrada dos agregados
+        return list(executor.map(consultar, agregados))
+
+
+def extrair_hierarquia_dados(data):
+    """
+    Extrai os códigos de agregados da coluna DC_HIERARQUIA de uma resposta bruta
+
+    Equivale a extrair_agregados_hierarquia do painel, sem montar DataFrame.
+
+    Args:
+        data (dict): Resposta da API decodificada
+
+    Returns:
+        list: Códigos de agregados ordenados
+    """
+    registros = []
+    if isinstance(data, dict):
+        for chave in ('result', 'data', 'results'):
+            if data.get(chave):
+                registros = data[chave]
+                break
+    elif isinstance(data, list):
+        registros = data
+
+    agregados = set()
+    for registro in registros:
+        valor = registro.get('DC_HIERARQUIA') if isinstance(registro, dict) else None
+        if isinstance(valor, str):
+            agregados.update(cod.strip() for cod in valor.split('/') if cod.strip())
+
+    return sorted(agregados)
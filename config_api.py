@@ -2,6 +2,10 @@
 Configurações e indicadores para consulta da API SPAECE
 """
 
+import hashlib
+import json
+import os
+
 # URL da API
 API_URL = "https://avaliacaoemonitoramentoceara.caeddigital.net/portal/functions/getDadosResultado"
 
@@ -242,6 +246,34 @@ INDICADORES = [
                 "188720200413000000000000000110","188720200413000000000000000111"
                 ]
 
+# Grupos de indicadores, identificados pela família (prefixo) do código
+PREFIXOS_GRUPOS_INDICADORES = {
+    "participacao_proficiencia": ("1887207101", "1886207101"),
+    "padroes_desempenho": ("1887204",),
+    "contextuais": ("1887170415",),
+    "habilidades": ("1887202",)
+}
+
+GRUPOS_INDICADORES = {
+    grupo: [codigo for codigo in INDICADORES if codigo.startswith(prefixos)]
+    for grupo, prefixos in PREFIXOS_GRUPOS_INDICADORES.items()
+}
+
+# Grupos de indicadores necessários para cada seção do painel
+SECOES_INDICADORES = {
+    "participacao": ("participacao_proficiencia",),
+    "proficiencia": ("participacao_proficiencia",),
+    "desempenho": ("padroes_desempenho",),
+    "habilidades": ("habilidades",),
+    "etnia": ("contextuais",),
+    "nse": ("contextuais",),
+    "sexo": ("contextuais",)
+}
+
+# Grupos consultados logo após o login (cabeçalho, medidores e seções gerais).
+# As habilidades concentram mais de 90% dos códigos e são consultadas sob demanda.
+GRUPOS_CARGA_INICIAL = ("participacao_proficiencia", "padroes_desempenho", "contextuais")
+
 # Configurações removidas - sem filtros pré-definidos
 
 # Parâmetros da aplicação
@@ -256,9 +288,33 @@ APP_CONFIG = {
 HEADERS = {
     "Content-Type": "application/json",
     "Accept": "application/json, text/plain, */*",
+    "Accept-Encoding": "gzip, deflate",
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
 }
 
+# Tempo limite (segundos) de cada requisição à API
+TIMEOUT_API = 30
+
+# Número máximo de consultas simultâneas à API (agregados da hierarquia)
+MAX_CONSULTAS_PARALELAS = 4
+
+# Pool de conexões HTTP compartilhado (API SPAECE e Groq)
+HTTP_TAMANHO_POOL = 10
+HTTP_TENTATIVAS = 3
+HTTP_FATOR_BACKOFF = 0.5  # espera 0,5s, 1s, 2s... entre tentativas
+HTTP_STATUS_RETENTATIVA = (429, 500, 502, 503, 504)
+
+# Cache persistente das respostas da API (resultados publicados não mudam)
+CACHE_DIR = os.environ.get("SPAECE_CACHE_DIR", ".cache_spaece")
+CACHE_TTL_API_SEGUNDOS = 30 * 24 * 3600
+CACHE_TAMANHO_MAXIMO_BYTES = 512 * 1024 * 1024
+
+# Cache persistente das análises geradas pela Groq (mesma requisição, mesma resposta)
+CACHE_TTL_ANALISES_SEGUNDOS = 7 * 24 * 3600
+
+# Quantidade de agregados mantidos em memória, compartilhados entre as sessões
+CACHE_MAX_AGREGADOS_MEMORIA = 256
+
 
 def criar_payload(
     indicadores=None,
@@ -304,3 +360,38 @@ def criar_payload(
     
     return payload
 
+
+def indicadores_dos_grupos(grupos):
+    """
+    Retorna os códigos de indicadores dos grupos informados, sem repetição
+    
+    Args:
+        grupos (iterable): Nomes de grupos de GRUPOS_INDICADORES
+    
+    Returns:
+        list: Códigos de indicadores na ordem de INDICADORES
+    """
+    selecionados = set()
+    for grupo in grupos:
+        if grupo not in GRUPOS_INDICADORES:
+            raise ValueError(f"Grupo de indicadores desconhecido: {grupo}")
+        selecionados.update(GRUPOS_INDICADORES[grupo])
+    return [codigo for codigo in INDICADORES if codigo in selecionados]
+
+
+def gerar_chave_payload(payload):
+    """
+    Gera uma chave estável (SHA-256) para um payload da API
+
+    Os campos de sessão do APP_CONFIG não alteram o resultado da consulta
+    e por isso ficam fora da chave.
+    
+    Args:
+        payload (dict): Payload criado por criar_payload
+    
+    Returns:
+        str: Hash hexadecimal do payload
+    """
+    conteudo = {k: v for k, v in payload.items() if k not in APP_CONFIG}
+    serializado = json.dumps(conteudo, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
@@ -0,0 +1,62 @@
+"""
+Construção do índice RAG dos documentos de referência (DCRC e BNCC)
+
+Executa fora do painel todo o processamento de dcrc.md e bncc.md (chunks,
+seções importantes, tabelas e TF-IDF) e grava o artefato versionado em
+indice_rag/. O painel carrega esse artefato ao ativar a análise com IA;
+se os documentos mudarem, o hash no manifesto deixa de coincidir e o índice
+é reconstruído.
+
+Uso:
+    python construir_indice_rag.py [--diretorio indice_rag] [--forcar]
+"""
+
+import argparse
+import os
+import time
+
+from rag import (
+    ARQUIVO_DADOS,
+    DIRETORIO_INDICE,
+    carregar_indice,
+    construir_indice,
+    ler_documentos_referencia
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói o índice RAG dos documentos DCRC e BNCC")
+    parser.add_argument("--diretorio", default=DIRETORIO_INDICE,
+                        help="Diretório onde o índice é gravado")
+    parser.add_argument("--forcar", action="store_true",
+                        help="Reconstrói o índice mesmo que o atual esteja válido")
+    args = parser.parse_args()
+
+    _, hashes = ler_documentos_referencia()
+    if hashes is None:
+        return 1
+
+    if not args.forcar:
+        inicio = time.perf_counter()
+        if carregar_indice(hashes, args.diretorio) is not None:
+            print(f"Índice RAG já atualizado em {args.diretorio} "
+                  f"(carregado em {time.perf_counter() - inicio:.2f}s)")
+            return 0
+
+    inicio = time.perf_counter()
+    dados_rag = construir_indice(args.diretorio)
+    if dados_rag is None:
+        print("Falha ao construir o índice RAG")
+        return 1
+
+    tamanho = os.path.getsize(os.path.join(args.diretorio, ARQUIVO_DADOS))
+    print(f"Índice RAG construído em {time.perf_counter() - inicio:.1f}s: "
+          f"{len(dados_rag['chunks'])} chunks, {len(dados_rag['secoes_importantes'])} seções, "
+          f"{tamanho / 1024 / 1024:.1f} MB")
+    for nome, valor in hashes.items():
+        print(f"{nome}: sha256 {valor[:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+"""
+Entidades com acesso ao painel SPAECE
+
+Nomes dos municípios e escolas cujos códigos aparecem no secrets.toml.
+Compartilhado entre o painel e os scripts de linha de comando.
+"""
+
+# Mapear códigos municipais para nomes
+MUNICIPIOS_MAP = {
+    "2301000": "AQUIRAZ",
+    "2303709": "CAUCAIA", 
+    "2304285": "EUSEBIO",
+    "2304954": "GUAIUBA",
+    "2306256": "ITAITINGA",
+    "2307650": "MARACANAU",
+    "2307700": "MARANGUAPE",
+    "2309706": "PACATUBA"
+}
+
+# Mapear códigos de escolas para nomes (usando comentários do secrets.toml)
+ESCOLAS_MAP = {
+    # AQUIRAZ
+    "23061197": "ALOISIO BERNARDO DE CASTRO EMEF",
+    "23061723": "ANTONIO DE BRITO LIMA EMEF",
+    "23060956": "BATOQUE EMEF",
+    "23564385": "CENTRO DE EDUCACAO E CIDADANIA MANUEL ASSUNCAO PIRES",
+    "23061251": "CENTRO DE EDUCACAO E CIDADANIA MARIA DE CASTRO BERNARDO",
+    "23061634": "CLARENCIO CRISOSTOMO DE FREITAS EMEF",
+    "23061014": "CORREGO DA MINHOCA EMEF",
+    "23061758": "DIONISIA GUERRA EMEF",
+    "23061022": "ERNESTO GURGEL VALENTE EMEF",
+    "23061618": "ESCOLA MUNICIPAL DE ENSINO FUNDAMENTAL TIA ALZIRA",
+    "23262672": "FERDINANDO TANSI CENTRO EDUCACIONAL MUNICIPAL",
+    "23061049": "FRANCISCA MONTEIRO DA SILVA EMEF",
+    "23061057": "FRANCISCO DA SILVA SAMPAIO EMEF",
+    "23061650": "FRANCISCO GOMES FARIAS EMEF CEL",
+    "23061073": "GUILHERME JANJA EMEF",
+    "23061081": "HENRIQUE GONCALVES DA JUSTA FILHO EMEF",
+    "23061774": "ISIDORO DE SOUSA ASSUNCAO EMEF",
+    "23061090": "JARBAS PASSARINHO MIN EMEF",
+    "23061790": "JOAO JAIME GADELHA EMEF",
+    "23061804": "JOAO PIRES CARDOSO EMEF",
+    "23061111": "JOAQUIM DE SOUSA TAVARES EMEF",
+    "23204150": "JOSE ALMIR DA SILVA EMEF",
+    "23061413": "JOSE CAMARA DE ALMEIDA EMEF",
+    "23061146": "JOSE FERREIRA DA COSTA EMEF",
+    "23204141": "JOSE ISAAC SARAIVA DA CUNHA EMEF",
+    "23061820": "JOSE RAIMUNDO DA COSTA EMEF",
+    "23060999": "JOSE RODRIGUES MONTEIRO EMEF",
+    "23061162": "JUSCELINO KUBITSCHEK EMEF",
+    "23061847": "JUVENAL PEREIRA FACANHA EMEF",
+    "23061189": "LAGOA DE CIMA EMEF",
+    "23061855": "LAGOA DO MATO DE SERPA EMEF",
+    "23248750": "LAIS SIDRIM TARGINO EMEF",
+    "23176423": "LEOLINA BATISTA RAMOS EMEF",
+    "23204125": "LUIZ EDUARDO STUDART GOMES EMEF",
+    "23061278": "MARIA FACANHA DE SA EMEF",
+    "23061294": "MARIA MARGARIDA RAMOS COELHO EMEF",
+    "23061685": "MARIA SOARES DE FREITAS EMEF",
+    "23061430": "PLACIDO CASTELO EMEF",
+    "23060905": "RAIMUNDA DE FREITAS FACANHA CEI",
+    "23061626": "RAIMUNDA FERREIRA DA SILVA EMEF",
+    "23061480": "RAIMUNDO RAMOS DA COSTA EMEF",
+    "23061448": "RITA PAULA DE BRITO EMEF",
+    "23061596": "VILA PAGA EMEF",
+    "23061910": "VINDINA ASSUNCAO DE AQUINO EMEF",
+    # PACATUBA - Exemplo de algumas escolas
+    "23264292": "JOAO PAULO SAMPAIO DE MENEZES EEIEF",
+    "23083417": "ANA ALBUQUERQUE CAMPOS EEIEF",
+    "23083433": "ANGELA COSTA CAMPOS EEF",
+    "23083735": "CLOVIS DE CASTRO PEREIRA EEF",
+    "23083492": "CRISPIANA DE ALBUQUERQUE EEF",
+    "23083450": "DR CARLOS ALBERTO DE ALMEIDA PONTE EEF",
+    "23083751": "FIRMINO DE ABREU LIMA EEIEF",
+    "23182342": "GELIA DA SILVA CORREIA EEIEF",
+    "23083778": "JARDIM BOM RETIRO EREIEF",
+    "23326662": "JOANA VASCONCELOS DE OLIVEIRA EMTI",
+    "23264020": "JOSE BATISTA DE OLIVEIRA EEIEF",
+    "23083697": "MAJOR MANOEL ASSIS NEPOMUCENO EEIEF",
+    "23267259": "MANOEL ROSENDO FREIRE EEF",
+    "23083611": "MANUEL PONTES DE MEDEIROS EEIEF",
+    "23083700": "MARIA DE SA RORIZ EEIEF",
+    "23083808": "MARIA GUIOMAR BASTOS CAVALCANTE PROFESSORA EEIEF",
+    "23083638": "MARIA MIRTES HOLANDA DO VALE PROF EEF",
+    "23083719": "MARIA MOCINHA ROCHA SA EEIEF",
+    "23083824": "NELLY DE LIMA E MELO EEIEF",
+    "23083760": "OS HEROIS DO TIMBO EEIEF",
+    "23083832": "PEDRO DE SA RORIZ EEIEF",
+    "23083506": "RAIMUNDA DA CRUZ ALEXANDRE EREIEF",
+    "23083689": "VICENTE FERRER DE LIMA EEIEF",
+    "23190906": "WALNEY DO CARMO LOPES EEIEF"
+}
@@ -0,0 +1,278 @@
+"""
+Pré-geração das análises com IA para todas as entidades e filtros
+
+Os resultados do ciclo 2024 são estáticos, então as análises de cada gráfico
+podem ser geradas antes da divulgação. Para cada entidade com acesso ao painel
+e cada combinação de etapa × disciplina dos seus dados, o script executa o
+próprio streamlit_app.py sem navegador (streamlit.testing) e aciona
+"🧾 Gerar Todas as Análises": os prompts saem idênticos aos de uma sessão real
+(mesma chave no cache de análises) e as chamadas passam pelo mesmo lote
+paralelo limitado por tokens por minuto. No dia da divulgação, o painel
+devolve as análises do cache em disco, sem esperar pelo modelo.
+
+Convém rodar antes o aquecer_cache.py (dados da API) e o construir_indice_rag.py
+(índice RAG). Entidades e combinações já geradas vêm do cache, então o script
+pode ser interrompido e executado de novo.
+
+Uso:
+    python pregerar_analises.py [--secrets .streamlit/secrets.toml] [--entidades 230010 ...]
+                                [--tempo-limite 1800] [--forcar]
+"""
+
+import argparse
+import os
+import time
+import tomllib
+
+import cache_disco
+from analise_ia import NAMESPACE_CACHE_ANALISES, estatisticas_cache_analises
+from aquecer_cache import carregar_lista_entidades
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# Rótulos dos controles do painel acionados pelo script
+ROTULO_CODIGO = "🏢 Código da Entidade"
+ROTULO_SENHA = "🔑 Senha"
+ROTULO_LOGIN = "🚀 Fazer Login e Consultar"
+ROTULO_ATIVAR_IA = "🤖 Ativar Análise IA"
+ROTULO_GERAR_TODAS = "🧾 Gerar Todas as Análises"
+PREFIXO_ERRO_ANALISE = "❌ Erro na análise"
+# Avisos de preparar_analise_dataframe que valem para todas as análises: interrompem o script
+AVISOS_CONFIGURACAO = (
+    "⚠️ API key da Groq não configurada",
+    "⚠️ Configure sua API key da Groq",
+    "⚠️ Biblioteca groq não instalada"
+)
+
+# Tempo máximo de espera pelo carregamento do índice RAG no painel
+TEMPO_CARGA_RAG_SEGUNDOS = 300
+
+
+def carregar_secrets(caminho_secrets):
+    """Lê o secrets.toml (vazio se o arquivo não existir)"""
+    if not os.path.exists(caminho_secrets):
+        return {}
+    with open(caminho_secrets, "rb") as arquivo:
+        return tomllib.load(arquivo)
+
+
+def senha_da_entidade(secrets, codigo, senha_mestra):
+    """Senha de login da entidade; sem senha própria, usa a senha mestra"""
+    for secao in ("xregionais", "xmunicipios", "xescolas"):
+        senha = secrets.get(secao, {}).get(codigo)
+        if senha:
+            return senha
+    return senha_mestra
+
+
+def _elemento(elementos, rotulo):
+    """Retorna o elemento do painel com o rótulo informado, ou None"""
+    for elemento in elementos:
+        if elemento.label == rotulo:
+            return elemento
+    return None
+
+
+def _executar(app, descricao):
+    """
+    Executa o painel e imprime as exceções da execução
+
+    Returns:
+        bool: True se a execução terminou sem exceções nem estouro de tempo
+    """
+    try:
+        app.run()
+    except RuntimeError as e:  # AppTest sinaliza o tempo limite com RuntimeError
+        print(f"Erro no painel ({descricao}): {e}")
+        return False
+    if not app.exception:
+        return True
+    for excecao in app.exception:
+        print(f"Erro no painel ({descricao}): {excecao.value}")
+    return False
+
+
+def _acionar(app, elementos, rotulo, descricao):
+    """Aciona o controle com o rótulo informado; False (com aviso) se ele não estiver no painel"""
+    elemento = _elemento(elementos, rotulo)
+    if elemento is None:
+        print(f"Controle \"{rotulo}\" não encontrado no painel ({descricao})")
+        return False
+    elemento.click()
+    return True
+
+
+def abrir_painel(codigo, senha, secrets, tempo_limite):
+    """
+    Abre uma sessão do painel, faz login e ativa a IA
+
+    Args:
+        codigo (str): Código da entidade
+        senha (str): Senha de login
+        secrets (dict): Conteúdo do secrets.toml (credenciais e API key da Groq)
+        tempo_limite (float): Segundos por execução do script
+
+    Returns:
+        AppTest: Sessão com a IA ativa e as bases carregadas, ou None em caso de falha
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(CAMINHO_APP, default_timeout=tempo_limite)
+    for chave, valor in secrets.items():
+        app.secrets[chave] = valor
+    if not _executar(app, "abertura"):
+        return None
+
+    campo_codigo = _elemento(app.text_input, ROTULO_CODIGO)
+    campo_senha = _elemento(app.text_input, ROTULO_SENHA)
+    if campo_codigo is None or campo_senha is None:
+        print(f"Campos de login não encontrados no painel (entidade {codigo})")
+        return None
+    campo_codigo.input(codigo)
+    campo_senha.input(senha)
+    if not _acionar(app, app.button, ROTULO_LOGIN, f"entidade {codigo}"):
+        return None
+    if not _executar(app, "login"):
+        return None
+    if not app.session_state["authenticated"]:
+        print(f"Login da entidade {codigo} recusado")
+        return None
+
+    if _elemento(app.button, ROTULO_ATIVAR_IA) is None:
+        print(f"Entidade {codigo} sem dados para analisar")
+        return None
+    _acionar(app, app.button, ROTULO_ATIVAR_IA, f"entidade {codigo}")
+
+    # O índice RAG carrega em segundo plano; novas execuções acompanham a situação
+    inicio = time.perf_counter()
+    while True:
+        if not _executar(app, "carregamento do índice RAG") or not app.session_state["ia_ativa"]:
+            return None
+        if app.session_state["documentos_carregados"]:
+            return app
+        if time.perf_counter() - inicio > TEMPO_CARGA_RAG_SEGUNDOS:
+            print("Tempo esgotado aguardando o índice RAG")
+            return None
+        time.sleep(1)
+
+
+def combinacoes_filtros(app):
+    """
+    Percorre as combinações etapa × disciplina oferecidas pelo painel
+
+    As disciplinas dependem da etapa selecionada, então a lista é lida de novo
+    após cada seleção de etapa. A rede fica na opção padrão do painel.
+
+    Yields:
+        tuple: (etapa, disciplina) já selecionadas na sessão
+    """
+    try:
+        etapas = list(app.selectbox(key="etapa_selecionada").options)
+    except KeyError:
+        return
+    for etapa in etapas:
+        app.selectbox(key="etapa_selecionada").set_value(etapa)
+        if not _executar(app, etapa):
+            continue
+        try:
+            disciplinas = list(app.selectbox(key="disciplina_selecionada").options)
+        except KeyError:
+            continue
+        for disciplina in disciplinas:
+            app.selectbox(key="disciplina_selecionada").set_value(disciplina)
+            if _executar(app, f"{etapa} / {disciplina}"):
+                yield etapa, disciplina
+
+
+def pregerar_entidade(codigo, senha, secrets, tempo_limite):
+    """
+    Gera as análises de todos os gráficos da entidade em cada etapa × disciplina
+
+    Returns:
+        tuple: (análises prontas no cache, análises com erro), ou None se o
+               painel avisou de configuração incompleta (API key ou biblioteca
+               groq), que impede qualquer análise
+    """
+    app = abrir_painel(codigo, senha, secrets, tempo_limite)
+    if app is None:
+        return 0, 1
+
+    geradas, erros = 0, 0
+    for etapa, disciplina in combinacoes_filtros(app):
+        descricao = f"entidade {codigo}, {etapa} / {disciplina}"
+        antes = len(app.session_state["analises_relatorio"]) if "analises_relatorio" in app.session_state else 0
+        inicio = time.perf_counter()
+        if not _acionar(app, app.button, ROTULO_GERAR_TODAS, descricao):
+            erros += 1
+            continue
+        if not _executar(app, descricao):
+            erros += 1
+            continue
+
+        textos = [texto.value for texto in app.markdown]
+        avisos = [texto for texto in textos if texto.startswith(AVISOS_CONFIGURACAO)]
+        if avisos:
+            print(f"Configuração incompleta ({descricao}): {avisos[0]}")
+            return None
+        novas = len(app.session_state["analises_relatorio"]) - antes if "analises_relatorio" in app.session_state else 0
+        falhas = sum(1 for texto in textos if texto.startswith(PREFIXO_ERRO_ANALISE))
+        geradas += novas
+        erros += falhas
+        print(f"  {etapa} / {disciplina}: {novas} análise(s), {falhas} erro(s) "
+              f"em {time.perf_counter() - inicio:.1f}s")
+
+    return geradas, erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-gera as análises com IA de todas as entidades e filtros")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Caminho do secrets.toml com as credenciais e a API key da Groq")
+    parser.add_argument("--entidades", nargs="+",
+                        help="Limita a pré-geração a estes códigos de entidade")
+    parser.add_argument("--tempo-limite", type=float, default=1800,
+                        help="Segundos máximos por relatório completo (etapa × disciplina)")
+    parser.add_argument("--forcar", action="store_true",
+                        help="Descarta as análises já existentes no cache antes de gerar")
+    args = parser.parse_args()
+
+    secrets = carregar_secrets(args.secrets)
+    if not secrets.get("groq", {}).get("api_key"):
+        print(f"API key da Groq não encontrada em {args.secrets}")
+        return 1
+    senha_mestra = secrets.get("master", {}).get("password")
+    if not senha_mestra:
+        print(f"Senha mestra ([master] password) não encontrada em {args.secrets}")
+        return 1
+
+    entidades = args.entidades or carregar_lista_entidades(args.secrets)
+    print(f"{len(entidades)} entidade(s) para pré-gerar")
+
+    inicio = time.perf_counter()
+    geradas, erros = 0, 0
+    for numero, codigo in enumerate(entidades, 1):
+        print(f"[{numero}/{len(entidades)}] Entidade {codigo}")
+        if args.forcar:
+            cache_disco.invalidar(namespace=NAMESPACE_CACHE_ANALISES, rotulo=codigo)
+        resultado = pregerar_entidade(
+            codigo, senha_da_entidade(secrets, codigo, senha_mestra), secrets, args.tempo_limite
+        )
+        if resultado is None:
+            print("Pré-geração interrompida: corrija a configuração e execute de novo")
+            return 1
+        geradas_entidade, erros_entidade = resultado
+        geradas += geradas_entidade
+        erros += erros_entidade
+
+    duracao = time.perf_counter() - inicio
+    contadores = estatisticas_cache_analises()
+    print(f"{geradas} análise(s) prontas no cache em {duracao / 60:.1f} min ({erros} erro(s)); "
+          f"{contadores['acertos']} já estavam no cache, {contadores['faltas']} chamadas ao modelo")
+    for namespace, info in cache_disco.estatisticas().items():
+        print(f"{namespace}: {info['itens']} item(ns), {info['bytes'] / 1024 / 1024:.1f} MB")
+
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,420 @@
+"""
+Processamento das respostas da API SPAECE em DataFrames
+
+A resposta de getDadosResultado tem o formato {"result": [{...}, {...}]}.
+Em vez de decodificar o corpo inteiro para uma lista de dicionários e só
+depois montar o DataFrame, os registros do array "result" são decodificados
+um a um, à medida que os bytes chegam, e acumulados diretamente em colunas.
+
+Depois da leitura, aplicar_esquema converte uma única vez as colunas
+conhecidas para tipos compactos (category, float32, Int32), de modo que as
+seções do painel não precisem converter os valores novamente.
+"""
+
+import codecs
+import json
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Valor usado para colunas ausentes em um registro (igual ao pd.DataFrame)
+_AUSENTE = float('nan')
+
+_decodificador_json = json.JSONDecoder()
+_ESPACOS = ' \t\n\r'
+
+# Posições de '}' testadas como fim de um lote de registros antes de
+# decodificar um registro por vez (ver _LeitorIncremental.decodificar_lote)
+TENTATIVAS_LOTE = 3
+
+# ==================== ESQUEMA DAS COLUNAS ====================
+
+# Textos com poucos valores distintos, repetidos em todas as linhas
+COLUNAS_CATEGORICAS = [
+    'VL_FILTRO_ETAPA',
+    'VL_FILTRO_DISCIPLINA',
+    'VL_FILTRO_REDE',
+    'DC_TIPO_ENTIDADE',
+    'NM_ESTADO',
+    'NM_REGIONAL',
+    'NM_MUNICIPIO',
+    'DC_HIERARQUIA',
+    'AGREGADO_ORIGEM'
+]
+
+# Textos mantidos como object (códigos com zeros à esquerda e descrições)
+COLUNAS_TEXTO = [
+    'TP_ENTIDADE',
+    'CD_ENTIDADE',
+    'NM_ENTIDADE',
+    'CD_HABILIDADE_MODELO_02',
+    'DC_HABILIDADE'
+]
+
+# Contagens de alunos: Int32 quando todos os valores são inteiros
+PREFIXOS_INTEIROS = ('QT_ALUNO_',)
+
+# Medidas em float32 (taxas, proficiências, valores e números por grupo).
+# NU_* fica em float32 porque as seções formatam médias dessas colunas
+# diretamente em f-strings, o que falharia com pd.NA.
+PREFIXOS_DECIMAIS = ('TX_', 'AVG_PROFICIENCIA_', 'VL_', 'NU_')
+
+
+class FormatoRespostaInesperado(ValueError):
+    """A resposta não segue o formato {"result": [...]} esperado"""
+
+
+class _LeitorIncremental:
+    """Buffer de texto alimentado por pedaços de bytes UTF-8"""
+
+    def __init__(self, pedacos):
+        self.pedacos = iter(pedacos)
+        self.decodificador = codecs.getincrementaldecoder('utf-8')()
+        self.texto = ''
+        self.pos = 0
+        self.fim = False
+        # Enquanto o cabeçalho é verificado, o texto descartado é guardado
+        # para permitir decodificar o corpo inteiro em outro formato
+        self.guardando = True
+        self.descartado = []
+
+    def ler_mais(self):
+        """Acrescenta o próximo pedaço ao buffer; retorna False no fim dos dados"""
+        if self.fim:
+            return False
+        pedaco = next(self.pedacos, None)
+        if pedaco is None:
+            self.fim = True
+            novo = self.decodificador.decode(b'', final=True)
+        else:
+            novo = self.decodificador.decode(pedaco)
+        if self.guardando:
+            self.descartado.append(self.texto[:self.pos])
+        self.texto = self.texto[self.pos:] + novo
+        self.pos = 0
+        return True
+
+    def proximo_caractere(self):
+        """Pula espaços e retorna o próximo caractere sem consumi-lo ('' no fim)"""
+        while True:
+            while self.pos < len(self.texto) and self.texto[self.pos] in _ESPACOS:
+                self.pos += 1
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self.ler_mais():
+                return ''
+
+    def consumir(self, esperado):
+        if self.proximo_caractere() != esperado:
+            raise FormatoRespostaInesperado(f"esperado '{esperado}' na posição {self.pos}")
+        self.pos += 1
+
+    def decodificar_valor(self):
+        """Decodifica o próximo valor JSON completo, lendo mais dados se necessário"""
+        self.proximo_caractere()
+        while True:
+            try:
+                valor, fim = _decodificador_json.raw_decode(self.texto, self.pos)
+            except json.JSONDecodeError:
+                if not self.ler_mais():
+                    raise
+                continue
+            self.pos = fim
+            return valor
+
+    def decodificar_lote(self):
+        """
+        Decodifica de uma vez os registros completos já presentes no buffer
+
+        O trecho do buffer até um '}' é decodificado como um array JSON em uma
+        única chamada ao decodificador em C. Se o '}' não fecha um registro
+        (fica dentro de um texto, de um objeto aninhado ou é o fim do corpo), o
+        array é inválido e tenta-se o '}' anterior; sem sucesso, decodifica
+        um único registro, lendo mais dados se necessário.
+
+        Returns:
+            list: Um ou mais valores consecutivos do array
+        """
+        self.proximo_caractere()
+        fim = len(self.texto)
+        for _ in range(TENTATIVAS_LOTE):
+            fim = self.texto.rfind('}', self.pos, fim)
+            if fim < 0:
+                break
+            try:
+                valores = json.loads('[' + self.texto[self.pos:fim + 1] + ']')
+            except json.JSONDecodeError:
+                continue
+            self.pos = fim + 1
+            return valores
+        return [self.decodificar_valor()]
+
+    def parar_de_guardar(self):
+        self.guardando = False
+        self.descartado = []
+
+    def texto_completo(self):
+        """Retorna o corpo inteiro (enquanto o texto lido ainda estiver guardado)"""
+        partes = self.descartado + [self.texto]
+        self.pos = len(self.texto)
+        while self.ler_mais():
+            partes.append(self.texto)
+            self.pos = len(self.texto)
+        return ''.join(partes)
+
+
+def _ler_colunas(leitor):
+    """Lê o array "result" do leitor, registro a registro, em buffers por coluna"""
+    leitor.consumir('{')
+    if leitor.proximo_caractere() != '"' or leitor.decodificar_valor() != 'result':
+        raise FormatoRespostaInesperado("a primeira chave da resposta não é 'result'")
+    leitor.consumir(':')
+    leitor.consumir('[')
+    leitor.parar_de_guardar()
+
+    colunas = {}
+    total = 0
+    while leitor.proximo_caractere() not in (']', ''):
+        registros = leitor.decodificar_lote()
+        if not all(isinstance(registro, dict) for registro in registros):
+            raise ValueError("Registro do array 'result' não é um objeto JSON")
+
+        # Colunas novas entram na ordem em que aparecem, preenchidas com ausentes
+        conhecidas = colunas.keys()
+        for registro in registros:
+            if not registro.keys() <= conhecidas:
+                for chave in registro:
+                    if chave not in colunas:
+                        colunas[chave] = [_AUSENTE] * total
+
+        # Uma passada por coluna para o lote inteiro (itemgetter quando a
+        # coluna veio em todos os registros do lote, o caso comum)
+        for chave, coluna in colunas.items():
+            try:
+                valores = list(map(itemgetter(chave), registros))
+            except KeyError:
+                valores = [registro.get(chave, _AUSENTE) for registro in registros]
+            coluna.extend(valores)
+        total += len(registros)
+
+        if leitor.proximo_caractere() == ',':
+            leitor.pos += 1
+
+    leitor.consumir(']')
+    return colunas, total
+
+
+def ler_resultado_em_colunas(pedacos):
+    """
+    Decodifica o array "result" registro a registro em buffers por coluna
+
+    Args:
+        pedacos (iterable): Pedaços de bytes do corpo da resposta
+
+    Returns:
+        tuple: (dict coluna -> lista de valores, quantidade de registros)
+
+    Raises:
+        FormatoRespostaInesperado: Se o corpo não começar com {"result": [
+    """
+    return _ler_colunas(_LeitorIncremental(pedacos))
+
+
+def dataframe_de_dados(data):
+    """
+    Monta o DataFrame a partir de uma resposta já decodificada
+
+    Aceita os formatos {"result": [...]}, {"data": [...]}, {"results": [...]},
+    uma lista de registros ou um objeto aninhado (normalizado).
+
+    Returns:
+        pd.DataFrame: Dados da resposta, ou None se vazios/não suportados
+    """
+    if isinstance(data, dict):
+        if 'result' in data and data['result']:
+            df = pd.DataFrame(data['result'])
+        elif 'data' in data and data['data']:
+            df = pd.DataFrame(data['data'])
+        elif 'results' in data and data['results']:
+            df = pd.DataFrame(data['results'])
+        else:
+            # Tentar normalizar dados aninhados
+            df = pd.json_normalize(data)
+    elif isinstance(data, list) and data:
+        df = pd.DataFrame(data)
+    else:
+        return None
+
+    return None if df.empty else df
+
+
+def dataframe_de_resposta(pedacos):
+    """
+    Monta o DataFrame diretamente dos bytes da resposta, sem lista de dicionários
+
+    Respostas em outro formato são decodificadas por completo e tratadas
+    por dataframe_de_dados.
+
+    Args:
+        pedacos (iterable): Pedaços de bytes do corpo da resposta
+
+    Returns:
+        pd.DataFrame: Dados da resposta, ou None se vazios/não suportados
+    """
+    leitor = _LeitorIncremental(pedacos)
+    try:
+        colunas, total = _ler_colunas(leitor)
+    except FormatoRespostaInesperado:
+        if not leitor.guardando:
+            raise
+        return dataframe_de_dados(json.loads(leitor.texto_completo()))
+
+    if total == 0:
+        return None
+    return pd.DataFrame(colunas)
+
+
+# ==================== CONVERSÃO NUMÉRICA ====================
+
+# Textos tratados como valor ausente nas colunas numéricas
+VALORES_AUSENTES = ['-', 'N/A', 'n/a', '', 'NULL', 'null', 'None', 'nan', 'NaN']
+
+
+def converter_colunas_numericas(df, colunas):
+    """
+    Converte várias colunas para numérico, coluna a coluna, com um caminho rápido
+
+    Cada coluna passa primeiro por um único pd.to_numeric. Apenas os valores
+    que falham nessa conversão direta e não eram ausentes (espaços nas bordas,
+    marcadores de ausência e decimais no formato brasileiro, ex.: '1.234,5')
+    recebem tratamento de texto. As colunas não são empilhadas: a memória
+    extra fica limitada a uma coluna por vez. Colunas que já são numéricas
+    não são tocadas.
+
+    Args:
+        df (pd.DataFrame): DataFrame a converter (alterado no próprio objeto)
+        colunas (list): Colunas a converter; as ausentes no DataFrame são ignoradas
+
+    Returns:
+        pd.DataFrame: O mesmo DataFrame com as colunas convertidas
+    """
+    if df is None or df.empty:
+        return df
+
+    for col in dict.fromkeys(colunas):
+        if col not in df.columns or pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        original = df[col]
+
+        # Caminho rápido: números e textos numéricos "limpos"
+        valores = pd.to_numeric(original, errors='coerce')
+
+        # Caminho de texto só para o que falhou e não era ausente
+        if valores.hasnans:
+            falhas = valores.isna() & original.notna()
+            if falhas.any():
+                texto = original[falhas].astype(str).str.strip()
+                texto = texto.mask(texto.isin(VALORES_AUSENTES))
+                com_virgula = texto.str.contains(',', regex=False, na=False)
+                if com_virgula.any():
+                    texto[com_virgula] = (
+                        texto[com_virgula]
+                        .str.replace('.', '', regex=False)
+                        .str.replace(',', '.', regex=False)
+                    )
+                valores = valores.astype('float64')
+                valores[falhas] = pd.to_numeric(texto, errors='coerce')
+
+        df[col] = valores
+
+    return df
+
+
+# ==================== APLICAÇÃO DO ESQUEMA ====================
+
+def _tipo_da_coluna(coluna):
+    """Retorna o tipo declarado para a coluna ou None se ela não faz parte do esquema"""
+    if coluna in COLUNAS_CATEGORICAS:
+        return 'category'
+    if coluna in COLUNAS_TEXTO:
+        return None
+    if coluna.startswith(PREFIXOS_INTEIROS):
+        return 'Int32'
+    if coluna.startswith(PREFIXOS_DECIMAIS) and not coluna.startswith('VL_FILTRO_'):
+        return 'float32'
+    return None
+
+
+def _ajustar_medida(valores, tipo):
+    """Converte uma coluna já numérica para o tipo declarado (Int32 só se todos os valores forem inteiros)"""
+    if tipo == 'Int32':
+        presentes = valores.dropna()
+        if presentes.empty or ((presentes % 1 == 0).all() and presentes.abs().max() < 2 ** 31):
+            return valores.astype('Int32')
+    return valores.astype('float32')
+
+
+def aplicar_esquema(df):
+    """
+    Converte as colunas conhecidas da resposta para os tipos declarados
+
+    Colunas categóricas viram 'category'; contagens viram Int32 e medidas
+    viram float32. Colunas fora do esquema são mantidas como vieram.
+
+    Args:
+        df (pd.DataFrame): DataFrame montado a partir da resposta da API
+
+    Returns:
+        pd.DataFrame: O mesmo DataFrame com as colunas convertidas
+    """
+    if df is None or df.empty:
+        return df
+
+    medidas = {}
+    for coluna in df.columns:
+        tipo = _tipo_da_coluna(coluna)
+        if tipo is None or df[coluna].dtype == tipo:
+            continue
+        if tipo == 'category':
+            df[coluna] = df[coluna].astype('category')
+        else:
+            medidas[coluna] = tipo
+
+    # Todas as medidas são convertidas de uma vez e depois reduzidas ao tipo declarado
+    converter_colunas_numericas(df, list(medidas))
+    for coluna, tipo in medidas.items():
+        try:
+            df[coluna] = _ajustar_medida(df[coluna], tipo)
+        except (TypeError, ValueError) as e:
+            print(f"Erro ao aplicar o esquema na coluna '{coluna}': {e}")
+
+    return df
+
+
+def concatenar_dataframes(partes):
+    """
+    Concatena DataFrames de agregados preservando as colunas categóricas
+
+    pd.concat converte para object as colunas 'category' com categorias
+    diferentes entre as partes; aqui elas são unidas com union_categoricals.
+
+    Args:
+        partes (list): DataFrames já tratados por aplicar_esquema
+
+    Returns:
+        pd.DataFrame: Partes concatenadas com índice reiniciado
+    """
+    df = pd.concat(partes, ignore_index=True)
+
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna not in df.columns or isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            continue
+        series = [parte[coluna] for parte in partes if coluna in parte.columns]
+        if len(series) == len(partes) and all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            df[coluna] = pd.Categorical(union_categoricals(series, ignore_order=True))
+        else:
+            df[coluna] = df[coluna].astype('category')
+
+    return df
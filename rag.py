@@ -0,0 +1,1568 @@
+"""
+Índice RAG dos documentos de referência (DCRC e BNCC)
+
+Reúne a divisão em chunks, a extração de tabelas e seções e o índice TF-IDF
+usados pelas análises com IA, sem depender do Streamlit. Como os documentos
+não mudam entre deploys, o índice é construído uma única vez (ver
+construir_indice_rag.py) e gravado em disco junto de um manifesto com o hash
+de cada arquivo; o painel apenas carrega o artefato já pronto.
+
+Uso:
+    from rag import carregar_ou_construir_dados_rag
+    dados_rag = carregar_ou_construir_dados_rag()
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+
+# Documentos de referência, na ordem em que são combinados no texto indexado
+ARQUIVOS_REFERENCIA = {
+    'DCRC': 'dcrc.md',
+    'BNCC': 'bncc.md'
+}
+
+DIRETORIO_INDICE = os.environ.get("SPAECE_INDICE_RAG_DIR", "indice_rag")
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_DADOS = "dados_rag.pkl"
+
+# Incrementar sempre que o formato ou o processamento do índice mudar
+VERSAO_FORMATO_INDICE = 10
+
+TAMANHO_CHUNK = 1000
+SOBREPOSICAO_CHUNK = 200
+
+# Componentes curriculares pela sigla dos códigos de habilidade da BNCC (ex.: EF05MA08)
+COMPONENTES_CURRICULARES = {
+    'LP': 'Língua Portuguesa',
+    'MA': 'Matemática',
+    'CI': 'Ciências',
+    'GE': 'Geografia',
+    'HI': 'História',
+    'AR': 'Arte',
+    'EF': 'Educação Física',
+    'ER': 'Ensino Religioso',
+    'LI': 'Língua Inglesa'
+}
+
+# Código de habilidade do Ensino Fundamental: EF + anos + componente + número.
+# Os anos são um ano só (EF05) ou um intervalo (EF15 = 1º ao 5º); o OCR do
+# DCRC às vezes troca o zero por "O" (EFO1MA21). Sem \b no início o regex
+# localiza o literal "EF" direto; o limite à esquerda é conferido em codigos_habilidade
+PADRAO_CODIGO_HABILIDADE = re.compile(r'EF([0-9O])([0-9])([A-Z]{2})(\d{2,3})\b')
+
+# Vetorização TF-IDF dos chunks: 'vocabulario' guarda os TFIDF_MAX_TERMOS
+# termos mais frequentes entre os que aparecem em ao menos TFIDF_MIN_DF chunks
+# e em no máximo TFIDF_MAX_DF da coleção; 'hashing' dispensa o vocabulário e
+# usa TERMOS_HASHING colunas fixas. Os limites deixam o índice (matriz +
+# vetorizador) menor que o da configuração anterior de 1000 termos em float64,
+# com recall@5 maior (ver benchmark_desempenho.py vetorizacao_rag)
+VETORIZACAO_RAG = os.environ.get("SPAECE_VETORIZACAO_RAG", "vocabulario")
+TFIDF_MIN_DF = 2
+TFIDF_MAX_DF = 0.5
+TFIDF_MAX_TERMOS = 3000
+TERMOS_HASHING = 2 ** 11
+
+# Palavras sem conteúdo descartadas na vetorização (minúsculas, como o TF-IDF as vê)
+STOPWORDS_PORTUGUES = frozenset("""
+    a à ao aos aquela aquelas aquele aqueles aquilo as às até com como da das de
+    dela delas dele deles depois do dos e é ela elas ele eles em entre era eram
+    essa essas esse esses esta está estão estas este estes eu foi foram há isso
+    isto já lhe lhes mais mas me mesmo meu minha muito na nas nem no nos nós
+    num numa o os ou para pela pelas pelo pelos por quais qual quando que quem
+    se seja sem ser seu seus só sua suas também te tem têm ter um uma umas uns
+    vai você vocês são sob sobre cada pois onde assim ainda bem podem pode
+""".split())
+
+# Entradas avulsas mantidas na memória de consultas compartilhada entre as sessões
+# (as consultas pré-calculadas do painel ficam fixas, fora deste limite)
+LIMITE_MEMO_CONSULTAS = 512
+
+# Caracteres de contexto guardados antes e depois de cada ocorrência de seção
+JANELA_CONTEXTO = 500
+# Os consumidores usam só os primeiros trechos de cada seção
+LIMITE_CONTEXTOS_POR_SECAO = 500
+# Trechos distintos guardados por código de habilidade no índice de códigos
+LIMITE_TRECHOS_POR_CODIGO = 20
+
+# Padrões para encontrar seções importantes
+PADROES_SECOES = {
+    'metodologia': r'(metodologia|método|procedimento)',
+    'indicadores': r'(indicador|métrica|medida)',
+    'resultados': r'(resultado|conclusão|achado)',
+    'recomendacoes': r'(recomenda|sugestão|orientação)',
+    'tabelas': r'(tabela|quadro|dados)',
+    'graficos': r'(gráfico|figura|chart)',
+    'habilidades': r'(habilidade|competência|capacidade)',
+    'componentes': r'(componente|disciplina|área)',
+    'relacoes': r'(relação|relacionamento|conexão|vinculação)',
+    'proficiencia': r'(proficiência|desempenho|rendimento)',
+    'avaliacao': r'(avaliação|teste|exame)',
+    'curriculo': r'(currículo|conteúdo|programa)',
+    'bncc_competencias': r'(competência geral|competência específica|habilidade essencial)',
+    'bncc_campos': r'(campo de experiência|área de conhecimento)',
+    'bncc_objetivos': r'(objetivo de aprendizagem|expectativa de aprendizagem)',
+    'bncc_etapas': r'(educação infantil|ensino fundamental|ensino médio)',
+    'bncc_areas': r'(linguagens|matemática|ciências|humanas)',
+    'bncc_objetivos_gerais': r'(objetivo geral|finalidade|propósito)',
+    'bncc_principios': r'(princípio|fundamento|base)',
+    'bncc_organizacao': r'(organização|estrutura|distribuição)',
+    'bncc_avaliacao': r'(avaliação formativa|avaliação diagnóstica|avaliação somativa)',
+    'dcrc_competencias_especificas': r'(competência específica|habilidade específica|descrição da habilidade)',
+    'dcrc_descricoes_habilidades': r'(descrição|caracterização|definição.*habilidade)',
+    'dcrc_relacoes_habilidades': r'(relação.*habilidade|vinculação.*competência|conexão.*componente)'
+}
+
+# Palavras que levam um chunk à busca complementar de habilidades
+PALAVRAS_HABILIDADE = [
+    'habilidade', 'competência', 'capacidade', 'componente', 'relação', 'vinculação', 'conexão',
+    'descrição', 'caracterização', 'específica', 'geral', 'essencial', 'dcrc', 'documento curricular',
+    'bncc', 'base nacional comum curricular'
+]
+
+# Marcas pré-calculadas por chunk na construção do índice (bits de um uint8)
+MARCA_HABILIDADE = 1       # contém alguma das PALAVRAS_HABILIDADE
+
+# ==================== PROCESSAMENTO DOS DOCUMENTOS ====================
+
+def extrair_texto_md(caminho_arquivo):
+    """
+    Extrai texto de um arquivo Markdown (.md)
+    """
+    try:
+        with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
+            texto_completo = arquivo.read()
+        return texto_completo
+    except Exception as e:
+        print(f"Erro ao processar arquivo Markdown {caminho_arquivo}: {e}")
+        return None
+
+def montar_texto_combinado(textos):
+    """
+    Combina os textos dos documentos no formato indexado pelo RAG
+
+    Args:
+        textos (dict): Texto de cada documento, nas chaves de ARQUIVOS_REFERENCIA
+    """
+    return "\n\n".join(f"{nome}:\n{texto}" for nome, texto in textos.items())
+
+def limites_documentos(textos):
+    """
+    Posições de cada documento no texto de montar_texto_combinado
+
+    Args:
+        textos (dict): Texto de cada documento, nas chaves de ARQUIVOS_REFERENCIA
+
+    Returns:
+        list: Tuplas (nome, início, fim) de cada documento, incluindo o cabeçalho "NOME:"
+    """
+    limites = []
+    posicao = 0
+    for nome, texto in textos.items():
+        fim = posicao + len(nome) + 2 + len(texto)
+        limites.append((nome, posicao, fim))
+        posicao = fim + 2
+    return limites
+
+def processar_md_com_rag(texto_md, documentos=None):
+    """
+    Processa o arquivo Markdown usando técnicas de RAG para extrair informações relevantes
+
+    Args:
+        texto_md (str): Texto combinado dos documentos
+        documentos (list): Tuplas (nome, início, fim) de limites_documentos; sem
+            elas o texto é tratado como um único documento sem nome
+    """
+    try:
+        if documentos is None:
+            documentos = [(None, 0, len(texto_md))]
+
+        # Dividir o texto em chunks pela estrutura (títulos e tabelas) de cada documento
+        chunks = dividir_em_chunks_estruturados(
+            texto_md, documentos, tamanho_chunk=TAMANHO_CHUNK, sobreposicao=SOBREPOSICAO_CHUNK
+        )
+
+        # Extrair tabelas do final do arquivo
+        tabelas = extrair_tabelas_do_md(texto_md)
+
+        # Extrair seções importantes
+        secoes_importantes = extrair_secoes_importantes(texto_md)
+
+        # Indexar os trechos onde cada código de habilidade aparece
+        codigos_habilidade = indexar_codigos_habilidade(texto_md)
+
+        # Criar índice de similaridade
+        indice_similaridade = criar_indice_similaridade(chunks)
+
+        return {
+            'chunks': chunks,
+            'tabelas': tabelas,
+            'secoes_importantes': secoes_importantes,
+            'codigos_habilidade': codigos_habilidade,
+            'documentos': documentos,
+            'indice_similaridade': indice_similaridade,
+            'texto_completo': texto_md
+        }
+    except Exception as e:
+        print(f"Erro ao processar arquivo Markdown: {e}")
+        return None
+
+# ==================== CHUNKS ====================
+
+# Documento de cada chunk: 0 sem documento, 1.. na ordem de ARQUIVOS_REFERENCIA
+DOCUMENTOS_CHUNK = [None] + list(ARQUIVOS_REFERENCIA)
+_BITS_COMPONENTES = {sigla: 1 << i for i, sigla in enumerate(COMPONENTES_CURRICULARES)}
+
+class ArmazemChunks(Sequence):
+    """
+    Chunks representados por posições de caracteres no texto de origem
+
+    O texto é mantido uma única vez; cada chunk guarda o início do seu
+    primeiro token, o fim do último e os metadados em arrays compactos:
+    documento de origem, componentes e anos (bits) dos códigos de habilidade
+    citados. O dicionário do chunk só é montado quando acessado.
+    """
+
+    __slots__ = ('texto', 'inicios', 'fins', 'documentos', 'componentes', 'anos')
+
+    def __init__(self, texto, inicios, fins, documentos, componentes, anos):
+        self.texto = texto
+        self.inicios = inicios          # array('q') com a posição do primeiro caractere de cada chunk
+        self.fins = fins                # array('q') com a posição após o último caractere de cada chunk
+        self.documentos = documentos    # array('B') com o índice em DOCUMENTOS_CHUNK
+        self.componentes = componentes  # array('H') com um bit por sigla de COMPONENTES_CURRICULARES
+        self.anos = anos                # array('H') com o bit 1 << ano (1º ao 9º ano)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def texto_do_chunk(self, i):
+        """Texto do chunk i com espaços normalizados (palavras unidas por um espaço)"""
+        return ' '.join(self.texto[self.inicios[i]:self.fins[i]].split())
+
+    def documento(self, i):
+        """Nome do documento de origem do chunk i (ex.: 'BNCC'), ou None"""
+        return DOCUMENTOS_CHUNK[self.documentos[i]]
+
+    def estado(self):
+        """Arrays de posições e metadados, sem o texto (para gravação do índice)"""
+        return tuple(getattr(self, atributo) for atributo in self.__slots__[1:])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("índice de chunk fora do intervalo")
+        return {
+            'texto': self.texto_do_chunk(item),
+            'indice': item,
+            'posicao_inicial': self.inicios[item],
+            'documento': self.documento(item),
+            'componentes': [sigla for sigla, bit in _BITS_COMPONENTES.items() if self.componentes[item] & bit],
+            'anos': [ano for ano in range(1, 10) if self.anos[item] & (1 << ano)]
+        }
+
+    def __repr__(self):
+        return f"ArmazemChunks({len(self)} chunks)"
+
+def codigos_habilidade(texto, inicio=0, fim=None):
+    """
+    Códigos de habilidade (PADRAO_CODIGO_HABILIDADE) citados em texto[inicio:fim]
+
+    Yields:
+        re.Match: Ocorrência de cada código, com grupos (ano inicial, ano final, sigla, número)
+    """
+    for codigo in PADRAO_CODIGO_HABILIDADE.finditer(texto, inicio, len(texto) if fim is None else fim):
+        posicao = codigo.start()
+        if posicao == 0 or not texto[posicao - 1].isalnum():
+            yield codigo
+
+def metadados_habilidades(texto, inicio, fim):
+    """
+    Componentes e anos dos códigos de habilidade citados em texto[inicio:fim]
+
+    Returns:
+        tuple: (bits de componentes, bits de anos)
+    """
+    componentes = anos = 0
+    for codigo in codigos_habilidade(texto, inicio, fim):
+        primeiro, ultimo, sigla, _ = codigo.groups()
+        componentes |= _BITS_COMPONENTES.get(sigla, 0)
+        primeiro = 0 if primeiro == 'O' else int(primeiro)
+        ultimo = int(ultimo)
+        # EF05: só o 5º ano; EF15: do 1º ao 5º ano
+        for ano in range(primeiro or ultimo, ultimo + 1):
+            anos |= 1 << ano
+    return componentes, anos
+
+def montar_armazem_chunks(texto, intervalos):
+    """
+    Cria o ArmazemChunks a partir dos intervalos dos chunks
+
+    Args:
+        texto (str): Texto de origem
+        intervalos (iterable): Tuplas (início, fim, índice do documento em DOCUMENTOS_CHUNK)
+    """
+    inicios, fins = array('q'), array('q')
+    documentos, componentes, anos = array('B'), array('H'), array('H')
+    for inicio, fim, documento in intervalos:
+        inicios.append(inicio)
+        fins.append(fim)
+        documentos.append(documento)
+        bits_componentes, bits_anos = metadados_habilidades(texto, inicio, fim)
+        componentes.append(bits_componentes)
+        anos.append(bits_anos)
+    return ArmazemChunks(texto, inicios, fins, documentos, componentes, anos)
+
+def janelas_de_palavras(texto, inicio, fim, tamanho_chunk=1000, sobreposicao=200):
+    """
+    Intervalos de até tamanho_chunk palavras em texto[inicio:fim], com sobreposição
+
+    Cada janela começa sobreposicao palavras antes do fim da anterior. Sem
+    lista de palavras nem cópia do texto: a contagem de palavras é feita pelo
+    próprio regex, que salta de um início de janela ao seguinte.
+
+    Yields:
+        tuple: (início, fim) de cada janela
+    """
+    passo = tamanho_chunk - sobreposicao
+    padrao_chunk = re.compile(r'\S+(?:\s+\S+){0,%d}' % (tamanho_chunk - 1))
+    padrao_passo = re.compile(r'(?:\S+\s+){%d}(?=\S)' % passo)
+
+    primeira_palavra = _PADRAO_NAO_ESPACO.search(texto, inicio, fim)
+    posicao = primeira_palavra.start() if primeira_palavra else None
+    while posicao is not None:
+        yield posicao, padrao_chunk.match(texto, posicao, fim).end()
+        proximo = padrao_passo.match(texto, posicao, fim)
+        posicao = proximo.end() if proximo else None
+
+def dividir_em_chunks(texto, tamanho_chunk=1000, sobreposicao=200):
+    """
+    Divide o texto em chunks menores para processamento RAG
+
+    Cada chunk tem até tamanho_chunk palavras e começa sobreposicao palavras
+    antes do fim do anterior, sem considerar a estrutura do Markdown (ver
+    dividir_em_chunks_estruturados).
+
+    Returns:
+        ArmazemChunks: Sequência de chunks no formato {'texto', 'indice', 'posicao_inicial', ...}
+    """
+    janelas = janelas_de_palavras(texto, 0, len(texto), tamanho_chunk, sobreposicao)
+    return montar_armazem_chunks(texto, ((inicio, fim, 0) for inicio, fim in janelas))
+
+_PADRAO_NAO_ESPACO = re.compile(r'\S')
+# Títulos Markdown; os de nível 2 (## ) separam as partes do documento
+_PADRAO_TITULO = re.compile(r'^#{1,6} ', re.MULTILINE)
+
+def _blocos_estruturais(texto, inicio, fim):
+    """
+    Divide texto[inicio:fim] nos blocos iniciados por cada título Markdown
+
+    Nos documentos convertidos cada tabela tem o seu título ("### Tabela N
+    (Página P)"), então cada tabela é um bloco.
+
+    Yields:
+        tuple: (início, fim, se o bloco abre uma parte de nível 2)
+    """
+    marcos = [titulo.start() for titulo in _PADRAO_TITULO.finditer(texto, inicio, fim)]
+    if not marcos or marcos[0] != inicio:
+        marcos.insert(0, inicio)
+    marcos.append(fim)
+    for bloco_inicio, bloco_fim in zip(marcos, marcos[1:]):
+        yield bloco_inicio, bloco_fim, texto.startswith('## ', bloco_inicio)
+
+def _aparar(texto, inicio, fim):
+    """Remove os espaços das pontas do intervalo; None se só houver espaços"""
+    primeiro = _PADRAO_NAO_ESPACO.search(texto, inicio, fim)
+    if primeiro is None:
+        return None
+    while texto[fim - 1].isspace():
+        fim -= 1
+    return primeiro.start(), fim
+
+def dividir_em_chunks_estruturados(texto, documentos, tamanho_chunk=1000, sobreposicao=200):
+    """
+    Divide os documentos em chunks que respeitam títulos e tabelas do Markdown
+
+    Blocos consecutivos (seções e tabelas) são agrupados até tamanho_chunk
+    palavras, sem atravessar partes de nível 2 nem documentos; só blocos
+    maiores que isso são cortados em janelas de palavras com sobreposição.
+    Cada chunk leva o documento de origem e os componentes e anos dos
+    códigos de habilidade que cita.
+
+    Args:
+        texto (str): Texto combinado dos documentos
+        documentos (list): Tuplas (nome, início, fim) de limites_documentos
+
+    Returns:
+        ArmazemChunks: Sequência de chunks no formato {'texto', 'indice', 'documento', ...}
+    """
+    intervalos = []
+
+    for nome, inicio_documento, fim_documento in documentos:
+        documento = DOCUMENTOS_CHUNK.index(nome) if nome in DOCUMENTOS_CHUNK else 0
+        grupo_inicio = grupo_fim = None
+        palavras_grupo = 0
+
+        def fechar_grupo():
+            if grupo_inicio is not None:
+                aparado = _aparar(texto, grupo_inicio, grupo_fim)
+                if aparado:
+                    intervalos.append((*aparado, documento))
+
+        for bloco_inicio, bloco_fim, abre_parte in _blocos_estruturais(texto, inicio_documento, fim_documento):
+            palavras = len(texto[bloco_inicio:bloco_fim].split())
+            if palavras == 0:
+                continue
+            if grupo_inicio is not None and (abre_parte or palavras_grupo + palavras > tamanho_chunk):
+                fechar_grupo()
+                grupo_inicio = None
+            if palavras > tamanho_chunk:
+                # Bloco grande demais: janelas de palavras dentro do próprio bloco
+                for janela in janelas_de_palavras(texto, bloco_inicio, bloco_fim, tamanho_chunk, sobreposicao):
+                    intervalos.append((*janela, documento))
+                continue
+            if grupo_inicio is None:
+                grupo_inicio, palavras_grupo = bloco_inicio, 0
+            grupo_fim = bloco_fim
+            palavras_grupo += palavras
+        fechar_grupo()
+
+    return montar_armazem_chunks(texto, intervalos)
+
+def extrair_tabelas_do_md(texto_md):
+    """
+    Extrai tabelas do arquivo Markdown usando regex
+    """
+    try:
+        # Procurar por padrões de tabelas no arquivo Markdown
+        # Padrão para encontrar tabelas com dados numéricos
+        padrao_tabela = r'(\d+(?:\.\d+)?(?:\s+\d+(?:\.\d+)?)*)'
+
+        # Dividir o texto em seções para encontrar tabelas
+        secoes = texto_md.split('\n---')
+        ultimas_secoes = secoes[-5:] if len(secoes) > 5 else secoes
+
+        tabelas_encontradas = []
+
+        for secao in ultimas_secoes:
+            # Procurar por padrões de tabela
+            matches = re.findall(padrao_tabela, secao)
+            if matches:
+                # Criar conteúdo da tabela com os dados encontrados
+                conteudo_tabela = f"Dados numéricos encontrados: {', '.join(matches[:10])}"
+                tabelas_encontradas.append({
+                    'conteudo': conteudo_tabela,
+                    'secao': secao[:200] + '...' if len(secao) > 200 else secao,
+                    'dados_numericos': matches[:10]  # Limitar a 10 matches por tabela
+                })
+
+        return tabelas_encontradas
+    except Exception as e:
+        print(f"Erro ao extrair tabelas do Markdown: {e}")
+        return []
+
+class ContextosSecao(Sequence):
+    """
+    Trechos de contexto de uma seção, recortados do texto apenas quando acessados
+
+    Guarda só as posições (início, fim) de cada janela em um array compacto;
+    o texto de origem é compartilhado por todas as seções.
+    """
+
+    __slots__ = ('texto', 'posicoes')
+
+    def __init__(self, texto, posicoes):
+        self.texto = texto
+        self.posicoes = posicoes  # array('q') achatado: [inicio0, fim0, inicio1, fim1, ...]
+
+    def __len__(self):
+        return len(self.posicoes) // 2
+
+    def _recortar(self, i):
+        return self.texto[self.posicoes[2 * i]:self.posicoes[2 * i + 1]]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._recortar(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("índice de contexto fora do intervalo")
+        return self._recortar(item)
+
+    def __repr__(self):
+        return f"ContextosSecao({len(self)} trechos)"
+
+def _prefixos_literais(padrao):
+    """Retorna o trecho literal inicial de cada alternativa de um padrão de seção"""
+    alternativas = padrao.strip('()').split('|')
+    return [alternativa.split('.*')[0] for alternativa in alternativas]
+
+# Padrões compilados uma vez e expressão única com o início literal de todas as alternativas.
+# A busca de candidatos roda sobre o texto em minúsculas (bem mais rápida que
+# re.IGNORECASE com acentos); a confirmação usa os padrões originais.
+_PADROES_SECOES_COMPILADOS = {
+    nome: re.compile(padrao, re.IGNORECASE) for nome, padrao in PADROES_SECOES.items()
+}
+_ALTERNATIVAS_CANDIDATOS = '|'.join(sorted(
+    {re.escape(prefixo.lower()) for padrao in PADROES_SECOES.values() for prefixo in _prefixos_literais(padrao)},
+    key=len, reverse=True
+))
+_PADRAO_CANDIDATOS = re.compile(_ALTERNATIVAS_CANDIDATOS)
+_PADRAO_CANDIDATOS_IGNORECASE = re.compile(_ALTERNATIVAS_CANDIDATOS, re.IGNORECASE)
+# Seções cujo início literal pode ser a alternativa encontrada (ou um prefixo dela)
+_SECOES_POR_PREFIXO = {}
+for _nome, _padrao in PADROES_SECOES.items():
+    for _prefixo in _prefixos_literais(_padrao):
+        _SECOES_POR_PREFIXO.setdefault(_prefixo.lower(), []).append(_nome)
+_MAIOR_PREFIXO = max(
+    len(prefixo) for padrao in PADROES_SECOES.values() for prefixo in _prefixos_literais(padrao)
+)
+TAMANHO_BLOCO_BUSCA = 256 * 1024
+
+def _posicoes_candidatas(texto, tamanho_bloco=TAMANHO_BLOCO_BUSCA):
+    """
+    Gera, em ordem, (posição, alternativa encontrada) onde começa alguma alternativa de seção
+
+    O texto é convertido para minúsculas em blocos (com sobreposição do
+    tamanho da maior alternativa) para não duplicar o texto inteiro na memória.
+    Alternativas sobrepostas são todas encontradas.
+    """
+    for inicio_bloco in range(0, len(texto), tamanho_bloco):
+        trecho = texto[inicio_bloco:inicio_bloco + tamanho_bloco + _MAIOR_PREFIXO - 1]
+        # As posições em minúsculas só coincidem com as originais se o tamanho não mudar
+        trecho_busca, padrao = trecho.lower(), _PADRAO_CANDIDATOS
+        if len(trecho_busca) != len(trecho):
+            trecho_busca, padrao = trecho, _PADRAO_CANDIDATOS_IGNORECASE
+
+        candidato = padrao.search(trecho_busca)
+        while candidato is not None and candidato.start() < tamanho_bloco:
+            yield inicio_bloco + candidato.start(), candidato.group().lower()
+            # Reiniciar logo após o início para não perder alternativas sobrepostas
+            candidato = padrao.search(trecho_busca, candidato.start() + 1)
+
+def localizar_secoes(texto_md, limite_por_secao=LIMITE_CONTEXTOS_POR_SECAO):
+    """
+    Localiza as ocorrências de todas as seções em uma única passada pelo texto
+
+    Uma expressão com o início literal de todas as alternativas percorre o
+    texto uma vez; em cada posição candidata, apenas os padrões das seções são
+    testados ancorados ali. Para cada seção o resultado é o mesmo de um
+    re.finditer próprio (ocorrências sem sobreposição, da esquerda para a
+    direita), limitado às primeiras limite_por_secao ocorrências.
+
+    Args:
+        texto_md (str): Texto combinado dos documentos
+        limite_por_secao (int): Máximo de ocorrências por seção; None para não limitar
+
+    Returns:
+        dict: Nome da seção -> array('q') achatado com (início, fim) de cada janela de contexto
+    """
+    tamanho = len(texto_md)
+    posicoes = {nome: array('q') for nome in PADROES_SECOES}
+    # Próxima posição a partir da qual cada seção pode ter nova ocorrência
+    liberada_em = {nome: 0 for nome in PADROES_SECOES}
+    pendentes = dict(_PADROES_SECOES_COMPILADOS)
+
+    secoes_da_alternativa = {}
+
+    for inicio, alternativa in _posicoes_candidatas(texto_md):
+        if not pendentes:
+            break
+        # As alternativas são testadas da mais longa para a mais curta, então
+        # qualquer outra que comece aqui é prefixo da encontrada
+        secoes = secoes_da_alternativa.get(alternativa)
+        if secoes is None:
+            secoes = secoes_da_alternativa[alternativa] = list(dict.fromkeys(
+                nome for prefixo, nomes in _SECOES_POR_PREFIXO.items()
+                if alternativa.startswith(prefixo) for nome in nomes
+            ))
+        for nome in secoes:
+            padrao = pendentes.get(nome)
+            if padrao is None or inicio < liberada_em[nome]:
+                continue
+            ocorrencia = padrao.match(texto_md, inicio)
+            if ocorrencia is None:
+                continue
+            fim = ocorrencia.end()
+            liberada_em[nome] = fim
+            posicoes[nome].append(max(0, inicio - JANELA_CONTEXTO))
+            posicoes[nome].append(min(tamanho, fim + JANELA_CONTEXTO))
+            if limite_por_secao is not None and len(posicoes[nome]) // 2 >= limite_por_secao:
+                del pendentes[nome]
+
+    return {nome: pos for nome, pos in posicoes.items() if pos}
+
+def extrair_secoes_importantes(texto_md, limite_por_secao=LIMITE_CONTEXTOS_POR_SECAO):
+    """
+    Extrai seções importantes do arquivo Markdown como metodologia, indicadores, etc.
+
+    Returns:
+        dict: Nome da seção -> ContextosSecao (sequência de trechos de ~1.000 caracteres)
+    """
+    return {
+        nome: ContextosSecao(texto_md, pos)
+        for nome, pos in localizar_secoes(texto_md, limite_por_secao).items()
+    }
+
+def marcar_chunk(texto_chunk):
+    """
+    Calcula as marcas (MARCA_*) de um chunk a partir do seu texto
+
+    Args:
+        texto_chunk (str): Texto do chunk com espaços normalizados
+
+    Returns:
+        int: Combinação dos bits MARCA_* presentes no chunk
+    """
+    minusculo = texto_chunk.lower()
+    marcas = 0
+    if any(palavra in minusculo for palavra in PALAVRAS_HABILIDADE):
+        marcas |= MARCA_HABILIDADE
+    return marcas
+
+def criar_vetorizador(vetorizacao=VETORIZACAO_RAG):
+    """
+    Cria o vetorizador TF-IDF (ainda não ajustado) dos chunks
+
+    Args:
+        vetorizacao (str): 'vocabulario' (até TFIDF_MAX_TERMOS termos podados
+            por frequência nos chunks) ou 'hashing' (colunas fixas, sem
+            vocabulário em memória)
+
+    Returns:
+        Objeto com fit_transform/transform que produz vetores float32 normalizados
+    """
+    if vetorizacao == 'hashing':
+        return make_pipeline(
+            HashingVectorizer(
+                n_features=TERMOS_HASHING,
+                stop_words=list(STOPWORDS_PORTUGUES),
+                ngram_range=(1, 2),
+                alternate_sign=False,
+                norm=None,
+                dtype=np.float32
+            ),
+            TfidfTransformer()
+        )
+    if vetorizacao != 'vocabulario':
+        raise ValueError(f"Vetorização RAG desconhecida: {vetorizacao}")
+    return TfidfVectorizer(
+        stop_words=list(STOPWORDS_PORTUGUES),
+        ngram_range=(1, 2),
+        min_df=TFIDF_MIN_DF,
+        max_df=TFIDF_MAX_DF,
+        max_features=TFIDF_MAX_TERMOS,
+        dtype=np.float32
+    )
+
+def criar_indice_similaridade(chunks, vetorizacao=VETORIZACAO_RAG):
+    """
+    Cria um índice de similaridade usando TF-IDF para busca semântica
+
+    A matriz TF-IDF é guardada em float32 e formato CSC (uma lista de chunks
+    por termo), funcionando como índice invertido: a busca percorre só as
+    colunas dos termos da consulta. As marcas de habilidade de
+    cada chunk são calculadas na mesma passada do ajuste.
+    """
+    try:
+        if not chunks:
+            return None
+
+        marcas = np.zeros(len(chunks), dtype=np.uint8)
+
+        def textos_marcados():
+            # Montar os textos dos chunks um a um, marcando cada um
+            for i in range(len(chunks)):
+                texto_chunk = chunks.texto_do_chunk(i)
+                marcas[i] = marcar_chunk(texto_chunk)
+                yield texto_chunk
+
+        # Vetorizar textos
+        vectorizer = criar_vetorizador(vetorizacao)
+        tfidf_matrix = vectorizer.fit_transform(textos_marcados())
+
+        # Os termos podados só servem para inspeção e ocupariam o artefato
+        if hasattr(vectorizer, 'stop_words_'):
+            del vectorizer.stop_words_
+
+        return {
+            'vectorizer': vectorizer,
+            'tfidf_matrix': tfidf_matrix.astype(np.float32).tocsc(),
+            'marcas': marcas,
+            'chunks': chunks,
+            # Candidatos por combinação de filtros (ver candidatos_dos_filtros)
+            'candidatos_filtros': {}
+        }
+    except Exception as e:
+        print(f"Erro ao criar índice de similaridade: {e}")
+        return None
+
+# ==================== CÓDIGOS DE HABILIDADE ====================
+
+def normalizar_codigo_habilidade(codigo):
+    """
+    Forma canônica de um código de habilidade: '(EFO1MA21)' -> 'EF01MA21'
+
+    Códigos que não são da BNCC (ex.: descritores 'D12' do SPAECE) ficam
+    apenas em maiúsculas e sem espaços ou parênteses.
+    """
+    codigo = re.sub(r'[\s()]', '', str(codigo)).upper()
+    if codigo.startswith('EFO'):
+        codigo = 'EF0' + codigo[3:]
+    return codigo
+
+def indexar_codigos_habilidade(texto, limite_por_codigo=LIMITE_TRECHOS_POR_CODIGO):
+    """
+    Mapeia cada código de habilidade da BNCC aos trechos em que aparece
+
+    O trecho é a linha do código (nas tabelas, a linha da habilidade),
+    limitada a JANELA_CONTEXTO caracteres de cada lado. Como nas seções, só
+    as posições são guardadas.
+
+    Args:
+        texto (str): Texto combinado dos documentos
+        limite_por_codigo (int): Máximo de trechos distintos por código
+
+    Returns:
+        dict: Código normalizado -> array('q') achatado [inicio0, fim0, inicio1, fim1, ...]
+    """
+    indice = {}
+    for ocorrencia in codigos_habilidade(texto):
+        posicoes = indice.setdefault(normalizar_codigo_habilidade(ocorrencia.group(0)), array('q'))
+        if len(posicoes) >= 2 * limite_por_codigo:
+            continue
+
+        quebra = texto.rfind('\n', max(0, ocorrencia.start() - JANELA_CONTEXTO), ocorrencia.start())
+        inicio = quebra + 1 if quebra >= 0 else max(0, ocorrencia.start() - JANELA_CONTEXTO)
+        quebra = texto.find('\n', ocorrencia.end(), ocorrencia.end() + JANELA_CONTEXTO)
+        fim = quebra if quebra >= 0 else min(len(texto), ocorrencia.end() + JANELA_CONTEXTO)
+
+        # O mesmo código repetido na mesma linha não gera outro trecho
+        if posicoes and posicoes[-2] == inicio:
+            continue
+        posicoes.extend((inicio, fim))
+    return indice
+
+def documento_da_posicao(dados_rag, posicao):
+    """Nome do documento (ex.: 'DCRC') que contém a posição do texto combinado, ou None"""
+    for nome, inicio, fim in dados_rag.get('documentos') or []:
+        if inicio <= posicao < fim:
+            return nome
+    return None
+
+def trechos_codigo_habilidade(dados_rag, codigo):
+    """
+    Trechos do DCRC/BNCC em que o código aparece, por consulta direta ao índice de códigos
+
+    Returns:
+        ContextosSecao: Trechos (vazio se o código não aparece nos documentos)
+    """
+    posicoes = (dados_rag.get('codigos_habilidade') or {}).get(normalizar_codigo_habilidade(codigo))
+    return ContextosSecao(dados_rag['texto_completo'], posicoes if posicoes is not None else array('q'))
+
+def contexto_habilidade(dados_rag, codigo, descricao="", max_trechos=2, filtros=None):
+    """
+    Trechos dos documentos de referência para uma habilidade avaliada
+
+    Usa, nesta ordem: os trechos do próprio código (códigos da BNCC), os dos
+    códigos da BNCC citados na descrição e, para os descritores do SPAECE
+    sem correspondência, a busca pela descrição (guardada na memória de consultas).
+
+    Args:
+        dados_rag (dict): Dados RAG compartilhados
+        codigo (str): Código da habilidade (ex.: 'EF05MA08' ou 'D12')
+        descricao (str): Descrição da habilidade
+        max_trechos (int): Máximo de trechos retornados
+        filtros (dict): Filtros da busca pela descrição (ver selecionar_chunks)
+
+    Returns:
+        list: Dicionários {'texto', 'fonte', 'origem'} com origem 'codigo' ou 'busca'
+    """
+    if not dados_rag:
+        return []
+
+    codigos = [codigo] + [ocorrencia.group(0) for ocorrencia in codigos_habilidade(str(descricao or ''))]
+    trechos = []
+    for codigo_buscado in codigos:
+        contextos = trechos_codigo_habilidade(dados_rag, codigo_buscado)
+        for i in range(len(contextos)):
+            texto = ' '.join(contextos[i].split())
+            # O DCRC repete algumas tabelas; trechos iguais entram uma vez
+            if any(trecho['texto'] == texto for trecho in trechos):
+                continue
+            trechos.append({
+                'texto': texto,
+                'fonte': documento_da_posicao(dados_rag, contextos.posicoes[2 * i]),
+                'origem': 'codigo'
+            })
+            if len(trechos) >= max_trechos:
+                return trechos
+
+    if not trechos and descricao:
+        resultados = buscar_informacoes_relevantes(str(descricao), dados_rag, top_k=max_trechos, filtros=filtros)
+        if not resultados and filtros:
+            resultados = buscar_informacoes_relevantes(str(descricao), dados_rag, top_k=max_trechos)
+        for resultado in resultados:
+            trechos.append({'texto': resultado['texto'], 'fonte': resultado.get('fonte'), 'origem': 'busca'})
+    return trechos
+
+# ==================== BUSCA ====================
+
+def expandir_consulta(consulta):
+    """
+    Acrescenta à consulta termos relacionados ao seu tema
+    """
+    if 'habilidade' in consulta.lower() or 'competência' in consulta.lower():
+        return f"{consulta} habilidade competência capacidade componente relação entre componentes proximidade habilidades SPAECE DCRC BNCC avaliação proficiência competência geral competência específica habilidade essencial descrição da habilidade caracterização habilidade específica vinculação competência conexão componente relação dentro próprio componente competências específicas descrições habilidades relações habilidades objeto de conhecimento campo de experiência prática de linguagem percurso aprendizado progressão sequência dependência pré-requisito hierarquia metodologia estratégia ensino objetivo aprendizagem expectativa aprendizagem direito aprendizagem base nacional comum curricular documento curricular referencial"
+    elif 'proficiência' in consulta.lower() or 'desempenho' in consulta.lower():
+        return f"{consulta} proficiência desempenho rendimento SPAECE DCRC BNCC avaliação competência objetivo de aprendizagem competência específica"
+    elif 'participação' in consulta.lower():
+        return f"{consulta} participação frequência presença SPAECE DCRC BNCC educação básica"
+    return f"{consulta} educação avaliação SPAECE DCRC BNCC metodologia indicadores competência geral competência específica habilidade essencial descrição habilidade"
+
+def pontuar_chunks(consulta_vector, tfidf_matrix):
+    """
+    Similaridade de cosseno entre a consulta e cada chunk pelo índice invertido
+
+    Os vetores TF-IDF já são normalizados (norma L2), então o cosseno é o
+    produto escalar, acumulado apenas sobre os termos presentes na consulta.
+
+    Args:
+        consulta_vector: Matriz esparsa 1 x termos da consulta vetorizada
+        tfidf_matrix: Matriz esparsa CSC chunks x termos
+
+    Returns:
+        np.ndarray: Similaridade de cada chunk
+    """
+    termos = consulta_vector.indices
+    if len(termos) == 0:
+        return np.zeros(tfidf_matrix.shape[0], dtype=tfidf_matrix.dtype)
+    return np.asarray(tfidf_matrix[:, termos] @ consulta_vector.data).ravel()
+
+def maiores_indices(valores, k):
+    """
+    Índices dos k maiores valores, em ordem decrescente, sem ordenar o vetor inteiro
+    """
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    if k < len(valores):
+        candidatos = np.argpartition(-valores, k - 1)[:k]
+    else:
+        candidatos = np.arange(len(valores))
+    return candidatos[np.argsort(-valores[candidatos], kind='stable')]
+
+def sigla_componente(componente):
+    """
+    Sigla de COMPONENTES_CURRICULARES para uma sigla ou nome de componente
+
+    Aceita também os nomes usados no painel, como "Língua Portuguesa - Escrita e Leitura".
+
+    Returns:
+        str: Sigla (ex.: 'MA'), ou None se o componente não for reconhecido
+    """
+    if componente in COMPONENTES_CURRICULARES:
+        return componente
+    for sigla, nome in COMPONENTES_CURRICULARES.items():
+        if str(componente).startswith(nome):
+            return sigla
+    return None
+
+def filtros_da_selecao(disciplina=None, etapa=None):
+    """
+    Filtros de busca correspondentes à disciplina e à etapa selecionadas no painel
+
+    Args:
+        disciplina (str): Ex.: "Matemática"
+        etapa (str): Ex.: "5º Ano - Fundamental"
+
+    Returns:
+        dict: Filtros para buscar_informacoes_relevantes, ou None se nenhum se aplica
+    """
+    filtros = {}
+    sigla = sigla_componente(disciplina) if disciplina else None
+    if sigla:
+        filtros['componente'] = sigla
+    ano = re.search(r'([1-9])º', str(etapa or ''))
+    if ano and 'fundamental' in str(etapa).lower():
+        filtros['ano'] = int(ano.group(1))
+    return filtros or None
+
+def selecionar_chunks(chunks, filtros):
+    """
+    Máscara dos chunks que atendem aos filtros de metadados
+
+    Args:
+        chunks (ArmazemChunks): Chunks do índice
+        filtros (dict): Chaves opcionais 'documento' ('BNCC'/'DCRC'),
+            'componente' (sigla ou nome) e 'ano' (1 a 9)
+
+    Returns:
+        np.ndarray: Máscara booleana por chunk, ou None quando não há filtros
+    """
+    if not filtros:
+        return None
+
+    mascara = np.ones(len(chunks), dtype=bool)
+    documento = filtros.get('documento')
+    if documento:
+        if documento not in DOCUMENTOS_CHUNK:
+            return np.zeros(len(chunks), dtype=bool)
+        mascara &= np.frombuffer(chunks.documentos, dtype=np.uint8) == DOCUMENTOS_CHUNK.index(documento)
+    componente = filtros.get('componente')
+    if componente:
+        sigla = sigla_componente(componente)
+        if sigla is None:
+            return np.zeros(len(chunks), dtype=bool)
+        mascara &= (np.frombuffer(chunks.componentes, dtype=np.uint16) & _BITS_COMPONENTES[sigla]) != 0
+    ano = filtros.get('ano')
+    if ano:
+        mascara &= (np.frombuffer(chunks.anos, dtype=np.uint16) & (1 << int(ano))) != 0
+    return mascara
+
+def buscar_informacoes_relevantes(consulta, dados_rag, top_k=5, filtros=None):
+    """
+    Busca informações relevantes no PDF usando RAG
+
+    O resultado de cada (consulta, top_k, filtros) fica na memória de
+    consultas do índice (ver MemoConsultas), compartilhada por todas as
+    sessões; as consultas das análises do painel já vêm calculadas na construção.
+
+    Args:
+        filtros (dict): Restringe a busca aos chunks de um documento, componente
+            e/ou ano (ver selecionar_chunks)
+    """
+    if not dados_rag or not dados_rag.get('indice_similaridade'):
+        return []
+
+    memo = dados_rag.get('memo_consultas')
+    if memo is None:
+        return executar_busca(consulta, dados_rag, top_k, filtros)
+
+    chave = ('busca', consulta, top_k, tuple(sorted(filtros.items())) if filtros else None)
+    encontrados = memo.obter(chave)
+    if encontrados is None:
+        resultados = executar_busca(consulta, dados_rag, top_k, filtros)
+        # Guardar só índice, similaridade e fonte; o texto vem do armazém de chunks
+        memo.guardar(chave, tuple(
+            (r['chunk']['indice'], float(r['similaridade']), r.get('fonte')) for r in resultados
+        ))
+        return resultados
+
+    chunks = dados_rag['indice_similaridade']['chunks']
+    resultados = []
+    for indice_chunk, similaridade, fonte in encontrados:
+        chunk = chunks[indice_chunk]
+        resultados.append({'chunk': chunk, 'similaridade': similaridade, 'texto': chunk['texto'], 'fonte': fonte})
+    return resultados
+
+def candidatos_dos_filtros(indice, filtros):
+    """
+    Chunks candidatos e chunks marcados como habilidade para uma combinação de filtros
+
+    O resultado fica guardado no próprio índice, por combinação de filtros;
+    as combinações do painel já são calculadas na construção (ver
+    precalcular_consultas) e gravadas com o artefato.
+
+    Returns:
+        tuple: (índices dos chunks que atendem aos filtros, índices dos que
+                também têm a marca de habilidade)
+    """
+    memo = indice.setdefault('candidatos_filtros', {})
+    chave = tuple(sorted(filtros.items())) if filtros else None
+    encontrados = memo.get(chave)
+    if encontrados is None:
+        mascara = selecionar_chunks(indice['chunks'], filtros)
+        marcados = indice['marcas'] & MARCA_HABILIDADE != 0
+        if mascara is None:
+            encontrados = (np.arange(len(indice['chunks'])), np.flatnonzero(marcados))
+        else:
+            encontrados = (np.flatnonzero(mascara), np.flatnonzero(marcados & mascara))
+        memo[chave] = encontrados
+    return encontrados
+
+def executar_busca(consulta, dados_rag, top_k=5, filtros=None):
+    """
+    Executa a busca no índice TF-IDF, sem passar pela memória de consultas
+
+    Com filtros, a seleção dos melhores chunks e as buscas complementares
+    percorrem só os chunks que atendem aos metadados pedidos.
+    """
+    try:
+        if not dados_rag or not dados_rag.get('indice_similaridade'):
+            return []
+
+        indice = dados_rag['indice_similaridade']
+        vectorizer = indice['vectorizer']
+        tfidf_matrix = indice['tfidf_matrix']
+        chunks = indice['chunks']
+
+        # Expandir consulta com termos relacionados específicos
+        consulta_expandida = expandir_consulta(consulta)
+
+        # Vetorizar a consulta e calcular a similaridade pelo índice invertido.
+        # Todos os chunks são pontuados mesmo com filtros: com poucas centenas
+        # de linhas, selecionar as linhas da matriz esparsa custa mais que
+        # pontuar todas (ver benchmark_desempenho.py busca_rag)
+        consulta_vector = vectorizer.transform([consulta_expandida])
+        similaridades = pontuar_chunks(consulta_vector, tfidf_matrix)
+
+        # Restringir aos chunks dos metadados pedidos
+        candidatos, marcados = candidatos_dos_filtros(indice, filtros)
+
+        # Obter top-k resultados mais similares
+        resultados = []
+        for idx in candidatos[maiores_indices(similaridades[candidatos], top_k)]:
+            if similaridades[idx] > 0.05:  # Threshold mais baixo para capturar mais informações
+                chunk = chunks[idx]
+                resultados.append({
+                    'chunk': chunk,
+                    'similaridade': similaridades[idx],
+                    'texto': chunk['texto'],
+                    'fonte': chunk['documento']
+                })
+
+        # Busca específica para habilidades e relações com foco em BNCC e DCRC
+        if 'habilidade' in consulta.lower() or 'competência' in consulta.lower():
+            ja_incluidos = {r['chunk']['indice'] for r in resultados}
+            for i in marcados:
+                if i in ja_incluidos:
+                    continue
+                chunk = chunks[i]
+                resultados.append({
+                    'chunk': chunk,
+                    'similaridade': 0.4,  # Similaridade alta para habilidades
+                    'texto': chunk['texto'],
+                    'fonte': chunk['documento']
+                })
+                if len(resultados) >= top_k * 2:  # Mais resultados para habilidades
+                    break
+
+        # Se não encontrou resultados específicos, buscar por palavras-chave gerais
+        if not resultados:
+            palavras_chave = consulta.lower().split()
+            for i in candidatos:
+                texto_chunk = chunks.texto_do_chunk(i).lower()
+                if any(palavra in texto_chunk for palavra in palavras_chave):
+                    chunk = chunks[i]
+                    resultados.append({
+                        'chunk': chunk,
+                        'similaridade': 0.3,  # Similaridade artificial para palavras-chave
+                        'texto': chunk['texto'],
+                        'fonte': chunk['documento']
+                    })
+                    if len(resultados) >= top_k:
+                        break
+
+        return resultados
+    except Exception as e:
+        print(f"Erro na busca RAG: {e}")
+        return []
+
+# ==================== MEMÓRIA DE CONSULTAS ====================
+
+# Gráficos com o botão "Analisar Dados com IA": nome do gráfico -> contexto da análise
+CONTEXTOS_ANALISE_IA = {
+    "Taxa de Participação": "Análise da participação dos estudantes nas avaliações SPAECE. IMPORTANTE: O ideal é manter 100% de participação. Destaque como altas taxas de participação podem trazer recursos para o município, melhorar a estrutura da escola e servir de subsídio para implementar planos de cargos e carreiras e aumento de salário dos profissionais da educação, especialmente professores. Considere que participação alta é indicador de qualidade educacional e pode resultar em mais investimentos e melhorias estruturais.",
+    "Proficiência Média": "Análise dos níveis de proficiência dos estudantes nas avaliações SPAECE (escalas 500 e 1000)",
+    "Distribuição por Desempenho": "Análise da distribuição dos estudantes por padrões de desempenho ({termos_legenda})",
+    "Taxa de Acerto por Habilidade": "Análise das habilidades específicas dos estudantes nas avaliações SPAECE. IMPORTANTE: Considere que as habilidades têm hierarquia de pré-requisitos - algumas são mais básicas e fundamentais que outras. Foque sempre em fortalecer as habilidades mais basilares primeiro, pois elas são pré-requisito para o desenvolvimento das demais. Identifique quais habilidades básicas precisam de mais atenção e como elas impactam o desenvolvimento das habilidades mais avançadas.",
+    "Proficiência por Etnia": "Análise das diferenças de proficiência entre grupos étnicos nas avaliações SPAECE",
+    "Proficiência por NSE": "Análise das diferenças de proficiência entre níveis socioeconômicos nas avaliações SPAECE",
+    "Proficiência por Sexo": "Análise das diferenças de proficiência entre gêneros nas avaliações SPAECE"
+}
+
+# Legendas dos padrões de desempenho: 2º ano (alfabetização) e demais etapas
+LEGENDA_DESEMPENHO_ALFABETIZACAO = "Não Alfabetizado, Alfabetização Incompleta, Intermediário, Suficiente, Desejável"
+LEGENDA_DESEMPENHO_PADRAO = "Muito Crítico, Crítico, Intermediário, Adequado"
+
+# Tipos de entidade identificados por analisar_dataframe_com_groq
+TIPOS_ENTIDADE_ANALISE = ["Estado", "CREDE/Regional", "Município", "Escola", "Desconhecida"]
+
+# Disciplinas e etapas selecionáveis no painel (após aplicar_substituicoes)
+DISCIPLINAS_ANALISE_IA = ["Língua Portuguesa", "Matemática"]
+ETAPAS_ANALISE_IA = ["2º Ano - Fundamental", "5º Ano - Fundamental", "9º Ano - Fundamental"]
+
+# Consultas da análise de percursos de aprendizado (gráficos de habilidades)
+CONSULTAS_PERCURSO = [
+    "percurso aprendizado progressão sequência {nome_habilidade}",
+    "dependência pré-requisito hierarquia habilidade {nome_habilidade}",
+    "relação conexão vinculação habilidade componente {nome_habilidade}",
+    "competência específica objetivo aprendizagem {nome_habilidade}",
+    "metodologia estratégia ensino habilidade {nome_habilidade}"
+]
+
+class MemoConsultas:
+    """
+    Memória LRU limitada de resultados de consultas e blocos de contexto
+
+    Fica dentro dos dados RAG, então vale para o índice que a gerou e é
+    compartilhada por todas as sessões do processo; o acesso é protegido por
+    trava porque as sessões do Streamlit rodam em threads diferentes.
+    Entradas guardadas com fixando=True (as consultas pré-calculadas do painel)
+    vão para um dicionário à parte que nunca é descartado, para que consultas
+    avulsas (descrições de habilidades, chat) não as tirem da memória.
+    """
+
+    def __init__(self, limite=LIMITE_MEMO_CONSULTAS):
+        self.limite = limite
+        self.entradas = OrderedDict()
+        self.fixas = {}
+        self.fixando = False
+        self.acertos = 0
+        self.faltas = 0
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        """Retorna o valor guardado para a chave, ou None se ausente"""
+        with self._trava:
+            valor = self.fixas.get(chave)
+            if valor is not None:
+                self.acertos += 1
+                return valor
+            valor = self.entradas.get(chave)
+            if valor is None:
+                self.faltas += 1
+                return None
+            self.entradas.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        """Guarda o valor, descartando as entradas avulsas usadas há mais tempo acima do limite"""
+        with self._trava:
+            if self.fixando:
+                self.fixas[chave] = valor
+                self.entradas.pop(chave, None)
+                return
+            self.entradas[chave] = valor
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.limite:
+                self.entradas.popitem(last=False)
+
+    def obter_ou_calcular(self, chave, calcular):
+        """Retorna o valor guardado ou calcula, guarda e retorna o novo valor"""
+        valor = self.obter(chave)
+        if valor is None:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def __len__(self):
+        return len(self.fixas) + len(self.entradas)
+
+    def __getstate__(self):
+        # A trava não é serializável; só as entradas vão para o índice em disco
+        return {'limite': self.limite, 'entradas': self.entradas, 'fixas': self.fixas}
+
+    def __setstate__(self, estado):
+        self.__init__(estado['limite'])
+        self.entradas = estado['entradas']
+        self.fixas = estado['fixas']
+
+def memorizar(dados_rag, chave, calcular):
+    """
+    Retorna calcular() usando a memória de consultas dos dados RAG, quando existir
+
+    Args:
+        dados_rag (dict): Dados RAG compartilhados
+        chave (tuple): Identificação do valor (ex.: ('percursos', nome_grafico))
+        calcular (callable): Função sem argumentos que produz o valor
+    """
+    memo = (dados_rag or {}).get('memo_consultas')
+    if memo is None:
+        return calcular()
+    return memo.obter_ou_calcular(chave, calcular)
+
+def consultas_analise_ia():
+    """
+    Enumera as consultas feitas pelas análises com IA do painel
+
+    As consultas dos gráficos são feitas com os filtros de cada combinação de
+    disciplina e etapa do painel (e sem filtros, quando nada casa).
+
+    Returns:
+        list: Tuplas (consulta, top_k, filtros) no formato usado por
+            analisar_dataframe_com_groq e analisar_percursos_aprendizado
+    """
+    filtros_selecoes = [None] + [
+        filtros_da_selecao(disciplina, etapa)
+        for disciplina in DISCIPLINAS_ANALISE_IA
+        for etapa in ETAPAS_ANALISE_IA
+    ]
+    consultas = []
+    for nome_grafico, contexto in CONTEXTOS_ANALISE_IA.items():
+        contextos = {
+            contexto.format(termos_legenda=legenda)
+            for legenda in (LEGENDA_DESEMPENHO_ALFABETIZACAO, LEGENDA_DESEMPENHO_PADRAO)
+        }
+        for contexto_formatado in sorted(contextos):
+            for tipo_entidade in TIPOS_ENTIDADE_ANALISE:
+                for filtros in filtros_selecoes:
+                    consultas.append((f"{nome_grafico} {contexto_formatado} {tipo_entidade}", 3, filtros))
+        if 'habilidade' in nome_grafico.lower() or 'competência' in nome_grafico.lower():
+            for consulta in CONSULTAS_PERCURSO:
+                consultas.append((consulta.format(nome_habilidade=nome_grafico), 3, None))
+    return consultas
+
+def precalcular_consultas(dados_rag):
+    """
+    Cria a memória de consultas dos dados RAG já com as consultas do painel
+
+    As consultas pré-calculadas ficam fixas na memória (ver MemoConsultas).
+
+    Returns:
+        int: Quantidade de consultas pré-calculadas
+    """
+    memo = dados_rag['memo_consultas'] = MemoConsultas()
+    consultas = consultas_analise_ia()
+    memo.fixando = True
+    try:
+        for consulta, top_k, filtros in consultas:
+            buscar_informacoes_relevantes(consulta, dados_rag, top_k=top_k, filtros=filtros)
+    finally:
+        memo.fixando = False
+    return len(consultas)
+
+# ==================== ÍNDICE PERSISTIDO ====================
+
+def ler_documentos_referencia(arquivos=None):
+    """
+    Lê os documentos de referência e calcula o hash do conteúdo de cada um
+
+    Args:
+        arquivos (dict): Nome do documento -> caminho; padrão ARQUIVOS_REFERENCIA
+
+    Returns:
+        tuple: (dict nome -> texto, dict nome -> sha256), ou (None, None) se algum faltar
+    """
+    arquivos = arquivos or ARQUIVOS_REFERENCIA
+    textos, hashes = {}, {}
+    for nome, caminho in arquivos.items():
+        try:
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+        except OSError as e:
+            print(f"Erro ao ler documento de referência {caminho}: {e}")
+            return None, None
+        hashes[nome] = hashlib.sha256(conteudo).hexdigest()
+        textos[nome] = conteudo.decode('utf-8')
+    return textos, hashes
+
+def _manifesto_esperado(hashes):
+    """Campos do manifesto que precisam coincidir para o índice ser reaproveitado"""
+    return {
+        'versao_formato': VERSAO_FORMATO_INDICE,
+        'versao_sklearn': sklearn.__version__,
+        'tamanho_chunk': TAMANHO_CHUNK,
+        'sobreposicao_chunk': SOBREPOSICAO_CHUNK,
+        'vetorizacao': VETORIZACAO_RAG,
+        'termos_tfidf': TFIDF_MAX_TERMOS,
+        'termos_hashing': TERMOS_HASHING,
+        'hashes': hashes
+    }
+
+def salvar_indice(dados_rag, hashes, diretorio=DIRETORIO_INDICE):
+    """
+    Grava o índice RAG e o manifesto que identifica sua versão
+
+    O texto completo não é gravado: ele é remontado a partir dos documentos,
+    que precisam ser lidos de qualquer forma para conferir os hashes. Dos
+    chunks e das seções importantes são gravadas apenas as posições.
+
+    Args:
+        dados_rag (dict): Resultado de processar_md_com_rag
+        hashes (dict): Hash sha256 de cada documento indexado
+        diretorio (str): Diretório do artefato
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    conteudo = {chave: valor for chave, valor in dados_rag.items() if chave != 'texto_completo'}
+    conteudo['secoes_importantes'] = {
+        nome: contextos.posicoes for nome, contextos in dados_rag['secoes_importantes'].items()
+    }
+    chunks = dados_rag['chunks']
+    conteudo['chunks'] = chunks.estado()
+    if conteudo.get('indice_similaridade'):
+        # O índice referencia o mesmo armazém de chunks, religado na carga
+        conteudo['indice_similaridade'] = {
+            chave: valor for chave, valor in conteudo['indice_similaridade'].items() if chave != 'chunks'
+        }
+
+    # Grava em arquivos temporários e troca no final para nunca deixar um índice pela metade
+    caminho_dados = os.path.join(diretorio, ARQUIVO_DADOS)
+    with open(caminho_dados + '.tmp', 'wb') as arquivo:
+        pickle.dump(conteudo, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifesto = _manifesto_esperado(hashes)
+    manifesto['criado_em'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    manifesto['quantidade_chunks'] = len(dados_rag.get('chunks') or [])
+    caminho_manifesto = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    with open(caminho_manifesto + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+
+    os.replace(caminho_dados + '.tmp', caminho_dados)
+    os.replace(caminho_manifesto + '.tmp', caminho_manifesto)
+
+def carregar_indice(hashes, diretorio=DIRETORIO_INDICE):
+    """
+    Carrega o índice RAG gravado se ele corresponder aos documentos atuais
+
+    Args:
+        hashes (dict): Hash sha256 de cada documento de referência atual
+        diretorio (str): Diretório do artefato
+
+    Returns:
+        dict: Dados do índice (sem 'texto_completo' e com as seções apenas como
+              posições), ou None se ausente/desatualizado
+    """
+    caminho_manifesto = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    caminho_dados = os.path.join(diretorio, ARQUIVO_DADOS)
+    if not os.path.exists(caminho_manifesto) or not os.path.exists(caminho_dados):
+        return None
+
+    try:
+        with open(caminho_manifesto, 'r', encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+        esperado = _manifesto_esperado(hashes)
+        if any(manifesto.get(campo) != valor for campo, valor in esperado.items()):
+            print("Índice RAG desatualizado em relação aos documentos ou à versão do formato")
+            return None
+
+        with open(caminho_dados, 'rb') as arquivo:
+            return pickle.load(arquivo)
+    except (OSError, ValueError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+        print(f"Erro ao carregar índice RAG: {e}")
+        return None
+
+def _sem_progresso(etapa):
+    """Callback padrão de progresso: não informa nada"""
+
+def _construir_e_salvar(textos, hashes, diretorio, progresso=_sem_progresso):
+    """Processa os textos já lidos e grava o índice resultante"""
+    progresso("Construindo índice (chunks, seções e TF-IDF)")
+    dados_rag = processar_md_com_rag(montar_texto_combinado(textos), limites_documentos(textos))
+    if dados_rag is None:
+        return None
+    progresso("Pré-calculando consultas das análises")
+    precalcular_consultas(dados_rag)
+
+    progresso("Gravando índice em disco")
+    try:
+        salvar_indice(dados_rag, hashes, diretorio)
+    except OSError as e:
+        # Sem permissão de escrita o índice continua válido para este processo
+        print(f"Erro ao gravar índice RAG: {e}")
+    return dados_rag
+
+def construir_indice(diretorio=DIRETORIO_INDICE, arquivos=None):
+    """
+    Processa os documentos de referência e grava o índice em disco
+
+    Returns:
+        dict: Dados RAG completos, ou None em caso de falha
+    """
+    textos, hashes = ler_documentos_referencia(arquivos)
+    if textos is None:
+        return None
+    return _construir_e_salvar(textos, hashes, diretorio)
+
+def carregar_ou_construir_dados_rag(diretorio=DIRETORIO_INDICE, arquivos=None, progresso=_sem_progresso):
+    """
+    Retorna os dados RAG, carregando o índice pré-construído quando válido
+
+    Se o artefato não existir ou tiver sido gerado a partir de outra versão
+    dos documentos, o índice é reconstruído e gravado para as próximas
+    inicializações.
+
+    Args:
+        progresso: Função chamada com a descrição de cada etapa do carregamento
+
+    Returns:
+        dict: Dados RAG no formato de processar_md_com_rag, ou None em caso de falha
+    """
+    progresso("Lendo documentos DCRC e BNCC")
+    textos, hashes = ler_documentos_referencia(arquivos)
+    if textos is None:
+        return None
+
+    progresso("Carregando índice pré-construído")
+    dados_rag = carregar_indice(hashes, diretorio)
+    if dados_rag is None:
+        return _construir_e_salvar(textos, hashes, diretorio, progresso)
+
+    # Religar chunks e seções (gravados como posições) ao texto dos documentos
+    texto_completo = montar_texto_combinado(textos)
+    dados_rag['texto_completo'] = texto_completo
+    dados_rag['chunks'] = ArmazemChunks(texto_completo, *dados_rag['chunks'])
+    if dados_rag.get('indice_similaridade'):
+        dados_rag['indice_similaridade']['chunks'] = dados_rag['chunks']
+    dados_rag['secoes_importantes'] = {
+        nome: ContextosSecao(texto_completo, posicoes)
+        for nome, posicoes in dados_rag['secoes_importantes'].items()
+    }
+    return dados_rag
+
+# ==================== CARREGAMENTO EM SEGUNDO PLANO ====================
+
+class CarregadorRAG:
+    """
+    Carrega os dados RAG em uma thread, sem bloquear quem o consulta
+
+    Uma única instância por processo (o painel a guarda em cache_resource):
+    a primeira sessão que ativa a IA dispara o carregamento e as demais só
+    acompanham a situação. Depois de uma falha, o estado 'erro' permanece
+    até um pedido explícito de nova tentativa (reiniciar()).
+    """
+
+    def __init__(self, diretorio=DIRETORIO_INDICE, arquivos=None):
+        self.diretorio = diretorio
+        self.arquivos = arquivos
+        self._lock = threading.Lock()
+        self._thread = None
+        self._estado = 'inativo'  # inativo, carregando, pronto ou erro
+        self._etapa = ""
+        self._erro = None
+        self._inicio = None
+        self._duracao = None
+        self.dados_rag = None
+
+    def iniciar(self):
+        """Dispara o carregamento se ainda não começou; após uma falha, não tem efeito"""
+        with self._lock:
+            if self._estado != 'inativo':
+                return
+            self._disparar()
+
+    def reiniciar(self):
+        """Dispara o carregamento também depois de uma falha (nova tentativa pedida pelo usuário)"""
+        with self._lock:
+            if self._estado in ('carregando', 'pronto'):
+                return
+            self._disparar()
+
+    def _disparar(self):
+        # Chamado com self._lock já adquirida
+        self._estado = 'carregando'
+        self._etapa = ""
+        self._erro = None
+        self._inicio = time.perf_counter()
+        self._duracao = None
+        self._thread = threading.Thread(target=self._executar, name="carregador-rag", daemon=True)
+        self._thread.start()
+
+    def _registrar_etapa(self, etapa):
+        with self._lock:
+            self._etapa = etapa
+
+    def _executar(self):
+        try:
+            dados_rag = carregar_ou_construir_dados_rag(self.diretorio, self.arquivos, self._registrar_etapa)
+            erro = None if dados_rag is not None else "Não foi possível carregar os documentos DCRC e BNCC"
+        except Exception as e:
+            dados_rag, erro = None, str(e)
+
+        with self._lock:
+            self.dados_rag = dados_rag
+            self._estado = 'pronto' if erro is None else 'erro'
+            self._erro = erro
+            self._duracao = time.perf_counter() - self._inicio
+
+    @property
+    def pronto(self):
+        return self._estado == 'pronto'
+
+    def situacao(self):
+        """
+        Retrata o carregamento no momento da chamada
+
+        Returns:
+            dict: estado, etapa atual, mensagem de erro e segundos decorridos
+        """
+        with self._lock:
+            if self._inicio is None:
+                segundos = 0.0
+            elif self._duracao is not None:
+                segundos = self._duracao
+            else:
+                segundos = time.perf_counter() - self._inicio
+            return {
+                'estado': self._estado,
+                'etapa': self._etapa,
+                'erro': self._erro,
+                'segundos': segundos
+            }
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até o fim do carregamento em andamento (uso fora do painel)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.dados_rag
+
+# ==================== DIAGNÓSTICO ====================
+
+def _tamanho_profundo(objeto, vistos):
+    """Soma aproximada dos bytes de um objeto e do que ele referencia (sem contar duas vezes)"""
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+
+    if isinstance(objeto, type):
+        return 0  # classes referenciadas (ex.: dtype=np.float64 do vetorizador) não pertencem ao índice
+    if hasattr(objeto, 'nbytes') and not hasattr(objeto, 'indptr'):
+        return int(objeto.nbytes)  # arrays numpy
+    if hasattr(objeto, 'indptr'):
+        # Matriz esparsa: dados, índices e ponteiros de linha
+        return sum(int(getattr(objeto, campo).nbytes) for campo in ('data', 'indices', 'indptr'))
+
+    tamanho = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        for chave, valor in objeto.items():
+            tamanho += _tamanho_profundo(chave, vistos) + _tamanho_profundo(valor, vistos)
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        for item in objeto:
+            tamanho += _tamanho_profundo(item, vistos)
+    elif hasattr(objeto, '__dict__'):
+        tamanho += _tamanho_profundo(vars(objeto), vistos)
+    elif hasattr(type(objeto), '__slots__'):
+        for atributo in type(objeto).__slots__:
+            tamanho += _tamanho_profundo(getattr(objeto, atributo, None), vistos)
+    return tamanho
+
+def estimar_memoria_dados_rag(dados_rag):
+    """
+    Estima a memória ocupada por cada componente dos dados RAG
+
+    Objetos compartilhados entre componentes (ex.: o armazém de chunks, que
+    também é referenciada pelo índice de similaridade) são contados uma vez,
+    no primeiro componente em que aparecem; o texto completo é contado antes
+    das seções, que apenas o referenciam.
+
+    Args:
+        dados_rag (dict): Dados no formato de processar_md_com_rag
+
+    Returns:
+        dict: Componente -> bytes aproximados
+    """
+    vistos = set()
+    componentes = sorted((dados_rag or {}).items(), key=lambda item: item[0] != 'texto_completo')
+    return {
+        componente: _tamanho_profundo(valor, vistos)
+        for componente, valor in componentes
+    }
@@ -0,0 +1,146 @@
+"""
+Sessão HTTP compartilhada para as chamadas externas (API SPAECE e Groq)
+
+Todas as threads reutilizam o mesmo pool de conexões keep-alive, com
+compressão gzip/deflate e novas tentativas com espera exponencial em
+respostas 429/5xx. Contadores globais permitem verificar quantas
+requisições aproveitaram uma conexão já aberta.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from config_api import (
+    HTTP_FATOR_BACKOFF,
+    HTTP_STATUS_RETENTATIVA,
+    HTTP_TAMANHO_POOL,
+    HTTP_TENTATIVAS
+)
+
+_lock = threading.Lock()
+_local = threading.local()
+_adaptador = None
+_clientes_groq = {}
+_contadores = {
+    'requisicoes': 0,
+    'conexoes_novas': 0,
+    'requisicoes_groq_sdk': 0
+}
+
+
+def _contar(nome):
+    with _lock:
+        _contadores[nome] += 1
+
+
+class _PoolHTTPContador(HTTPConnectionPool):
+    def _new_conn(self):
+        _contar('conexoes_novas')
+        return super()._new_conn()
+
+
+class _PoolHTTPSContador(HTTPSConnectionPool):
+    def _new_conn(self):
+        _contar('conexoes_novas')
+        return super()._new_conn()
+
+
+class _AdaptadorContador(HTTPAdapter):
+    """HTTPAdapter que registra requisições e conexões abertas"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _PoolHTTPContador,
+            'https': _PoolHTTPSContador
+        }
+
+    def send(self, request, **kwargs):
+        _contar('requisicoes')
+        return super().send(request, **kwargs)
+
+
+def _obter_adaptador():
+    """Cria (uma única vez) o adaptador com o pool de conexões compartilhado"""
+    global _adaptador
+    with _lock:
+        if _adaptador is None:
+            retentativas = Retry(
+                total=HTTP_TENTATIVAS,
+                read=0,  # não repetir requisições que estouraram o tempo limite
+                backoff_factor=HTTP_FATOR_BACKOFF,
+                status_forcelist=HTTP_STATUS_RETENTATIVA,
+                allowed_methods=None,  # as consultas POST são apenas leitura
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            _adaptador = _AdaptadorContador(
+                pool_connections=HTTP_TAMANHO_POOL,
+                pool_maxsize=HTTP_TAMANHO_POOL,
+                max_retries=retentativas
+            )
+        return _adaptador
+
+
+def obter_sessao():
+    """
+    Retorna a sessão HTTP da thread atual
+
+    Cada thread tem sua própria requests.Session (cookies e cabeçalhos não
+    são compartilhados), mas todas montam o mesmo adaptador e, portanto,
+    o mesmo pool de conexões.
+    """
+    sessao = getattr(_local, 'sessao', None)
+    if sessao is None:
+        sessao = requests.Session()
+        adaptador = _obter_adaptador()
+        sessao.mount('https://', adaptador)
+        sessao.mount('http://', adaptador)
+        sessao.headers['Accept-Encoding'] = 'gzip, deflate'
+        _local.sessao = sessao
+    return sessao
+
+
+def obter_cliente_groq(api_key):
+    """
+    Retorna um cliente Groq reutilizável para a chave informada
+
+    O SDK mantém seu próprio pool de conexões (httpx); reaproveitar o cliente
+    evita um novo handshake TLS a cada análise.
+    """
+    from groq import Groq
+    import httpx
+
+    with _lock:
+        cliente = _clientes_groq.get(api_key)
+        if cliente is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=HTTP_TAMANHO_POOL,
+                    max_keepalive_connections=HTTP_TAMANHO_POOL
+                ),
+                event_hooks={'request': [lambda request: _contar('requisicoes_groq_sdk')]}
+            )
+            cliente = Groq(api_key=api_key, max_retries=HTTP_TENTATIVAS, http_client=http_client)
+            _clientes_groq[api_key] = cliente
+        return cliente
+
+
+def estatisticas_conexoes():
+    """
+    Retorna os contadores de uso do pool HTTP
+
+    Returns:
+        dict: requisicoes, conexoes_novas, conexoes_reaproveitadas e
+              requisicoes_groq_sdk (chamadas feitas pelo SDK da Groq)
+    """
+    with _lock:
+        estatisticas = dict(_contadores)
+    estatisticas['conexoes_reaproveitadas'] = max(
+        0, estatisticas['requisicoes'] - estatisticas['conexoes_novas']
+    )
+    return estatisticas
@@ -53,182 +53,85 @@ COR_LIGHT = PALETA_CORES[8]  # Verde água / turquesa
 COR_BRIGHT = PALETA_CORES[9]  # Amarelo vibrante
 
 import io
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-from config_api import API_URL, INDICADORES, HEADERS, criar_payload
+import threading
+import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config_api import (
+    CACHE_TTL_API_SEGUNDOS, CACHE_MAX_AGREGADOS_MEMORIA, GRUPOS_CARGA_INICIAL, SECOES_INDICADORES
+)
+from analise_ia import (
+    ajustar_prompt_ao_orcamento,
+    estatisticas_cache_analises,
+    gerar_analise,
+    gerar_analise_em_fluxo,
+    gerar_analises_em_paralelo,
+    json_compacto,
+    obter_limitador,
+    resumir_estatisticas,
+    resumo_orcamento
+)
+from cliente_spaece import requisitar_df_agregado, consultar_agregados_em_paralelo, estatisticas_voo_unico
+from entidades import MUNICIPIOS_MAP, ESCOLAS_MAP
+from processamento_dados import aplicar_esquema, concatenar_dataframes, converter_colunas_numericas
+from rag import (
+    CONSULTAS_PERCURSO,
+    CONTEXTOS_ANALISE_IA,
+    LEGENDA_DESEMPENHO_ALFABETIZACAO,
+    LEGENDA_DESEMPENHO_PADRAO,
+    CarregadorRAG,
+    buscar_informacoes_relevantes,
+    contexto_habilidade,
+    estimar_memoria_dados_rag,
+    filtros_da_selecao,
+    memorizar
+)
+from sessao_http import obter_sessao, obter_cliente_groq, estatisticas_conexoes
 
-# ==================== FUNÇÃO DE PROCESSAMENTO DE MARKDOWN COM RAG ====================
+# ==================== FUNÇÕES DE ANÁLISE COM RAG ====================
 
-def extrair_texto_md(caminho_arquivo):
+@st.cache_resource(show_spinner=False)
+def obter_carregador_rag():
     """
-    Extrai texto de um arquivo Markdown (.md)
-    """
-    try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
-            texto_completo = arquivo.read()
-        return texto_completo
-    except Exception as e:
-        st.error(f"Erro ao processar arquivo Markdown {caminho_arquivo}: {e}")
-        return None
+    Retorna o carregador do índice RAG do DCRC/BNCC, único por processo
 
-def processar_md_com_rag(texto_md):
+    O carregamento roda em segundo plano (ver CarregadorRAG), de modo que a
+    sessão que ativa a IA continua interativa enquanto o índice é lido.
     """
-    Processa o arquivo Markdown usando técnicas de RAG para extrair informações relevantes
-    """
-    try:
-        # Dividir o texto em chunks menores para melhor processamento
-        chunks = dividir_em_chunks(texto_md, tamanho_chunk=1000, sobreposicao=200)
-        
-        # Extrair tabelas do final do arquivo
-        tabelas = extrair_tabelas_do_md(texto_md)
-        
-        # Extrair seções importantes
-        secoes_importantes = extrair_secoes_importantes(texto_md)
-        
-        # Criar índice de similaridade
-        indice_similaridade = criar_indice_similaridade(chunks)
-        
-        return {
-            'chunks': chunks,
-            'tabelas': tabelas,
-            'secoes_importantes': secoes_importantes,
-            'indice_similaridade': indice_similaridade,
-            'texto_completo': texto_md
-        }
-    except Exception as e:
-        st.error(f"Erro ao processar arquivo Markdown: {e}")
-        return None
+    return CarregadorRAG()
 
-def dividir_em_chunks(texto, tamanho_chunk=1000, sobreposicao=200):
-    """
-    Divide o texto em chunks menores para processamento RAG
+def obter_dados_rag():
     """
-    palavras = texto.split()
-    chunks = []
-    
-    for i in range(0, len(palavras), tamanho_chunk - sobreposicao):
-        chunk = ' '.join(palavras[i:i + tamanho_chunk])
-        if chunk.strip():
-            chunks.append({
-                'texto': chunk,
-                'indice': len(chunks),
-                'posicao_inicial': i
-            })
-    
-    return chunks
+    Retorna o índice RAG já carregado, compartilhado por todas as sessões
 
-def extrair_tabelas_do_md(texto_md):
-    """
-    Extrai tabelas do arquivo Markdown usando regex
+    O objeto deve ser tratado como somente leitura; a sessão guarda apenas o
+    indicador documentos_carregados, que só fica verdadeiro com o índice pronto.
     """
-    try:
-        # Procurar por padrões de tabelas no arquivo Markdown
-        # Padrão para encontrar tabelas com dados numéricos
-        padrao_tabela = r'(\d+(?:\.\d+)?(?:\s+\d+(?:\.\d+)?)*)'
-        
-        # Dividir o texto em seções para encontrar tabelas
-        secoes = texto_md.split('\n---')
-        ultimas_secoes = secoes[-5:] if len(secoes) > 5 else secoes
-        
-        tabelas_encontradas = []
-        
-        for secao in ultimas_secoes:
-            # Procurar por padrões de tabela
-            matches = re.findall(padrao_tabela, secao)
-            if matches:
-                # Criar conteúdo da tabela com os dados encontrados
-                conteudo_tabela = f"Dados numéricos encontrados: {', '.join(matches[:10])}"
-                tabelas_encontradas.append({
-                    'conteudo': conteudo_tabela,
-                    'secao': secao[:200] + '...' if len(secao) > 200 else secao,
-                    'dados_numericos': matches[:10]  # Limitar a 10 matches por tabela
-                })
-        
-        return tabelas_encontradas
-    except Exception as e:
-        st.error(f"Erro ao extrair tabelas do Markdown: {e}")
-        return []
+    carregador = obter_carregador_rag()
+    if not carregador.pronto:
+        raise ValueError("O índice RAG dos documentos DCRC e BNCC ainda não foi carregado")
+    return carregador.dados_rag
 
-def extrair_secoes_importantes(texto_md):
-    """
-    Extrai seções importantes do arquivo Markdown como metodologia, indicadores, etc.
+def exibir_situacao_carregamento_rag():
     """
-    secoes = {}
-    
-    # Padrões para encontrar seções importantes
-    padroes_secoes = {
-        'metodologia': r'(metodologia|método|procedimento)',
-        'indicadores': r'(indicador|métrica|medida)',
-        'resultados': r'(resultado|conclusão|achado)',
-        'recomendacoes': r'(recomenda|sugestão|orientação)',
-        'tabelas': r'(tabela|quadro|dados)',
-        'graficos': r'(gráfico|figura|chart)',
-        'habilidades': r'(habilidade|competência|capacidade)',
-        'componentes': r'(componente|disciplina|área)',
-        'relacoes': r'(relação|relacionamento|conexão|vinculação)',
-        'proficiencia': r'(proficiência|desempenho|rendimento)',
-        'avaliacao': r'(avaliação|teste|exame)',
-        'curriculo': r'(currículo|conteúdo|programa)',
-        'bncc_competencias': r'(competência geral|competência específica|habilidade essencial)',
-        'bncc_campos': r'(campo de experiência|área de conhecimento)',
-        'bncc_objetivos': r'(objetivo de aprendizagem|expectativa de aprendizagem)',
-        'bncc_etapas': r'(educação infantil|ensino fundamental|ensino médio)',
-        'bncc_areas': r'(linguagens|matemática|ciências|humanas)',
-        'bncc_objetivos_gerais': r'(objetivo geral|finalidade|propósito)',
-        'bncc_principios': r'(princípio|fundamento|base)',
-        'bncc_organizacao': r'(organização|estrutura|distribuição)',
-        'bncc_avaliacao': r'(avaliação formativa|avaliação diagnóstica|avaliação somativa)',
-        'dcrc_competencias_especificas': r'(competência específica|habilidade específica|descrição da habilidade)',
-        'dcrc_descricoes_habilidades': r'(descrição|caracterização|definição.*habilidade)',
-        'dcrc_relacoes_habilidades': r'(relação.*habilidade|vinculação.*competência|conexão.*componente)'
-    }
-    
-    for nome_secao, padrao in padroes_secoes.items():
-        matches = re.finditer(padrao, texto_md, re.IGNORECASE)
-        for match in matches:
-            # Extrair contexto ao redor da palavra-chave
-            inicio = max(0, match.start() - 500)
-            fim = min(len(texto_md), match.end() + 500)
-            contexto = texto_md[inicio:fim]
-            
-            if nome_secao not in secoes:
-                secoes[nome_secao] = []
-            secoes[nome_secao].append(contexto)
-    
-    return secoes
+    Mostra o andamento do carregamento do índice RAG
 
-def criar_indice_similaridade(chunks):
+    Executado como fragmento com atualização periódica: só ele é reexecutado
+    enquanto o índice carrega, e ao terminar dispara uma nova execução do
+    painel para habilitar os botões de análise.
     """
-    Cria um índice de similaridade usando TF-IDF para busca semântica
-    """
-    try:
-        if not chunks:
-            return None
-        
-        # Extrair textos dos chunks
-        textos = [chunk['texto'] for chunk in chunks]
-        
-        # Criar vetorizador TF-IDF
-        vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words=None,  # Manter palavras em português
-            ngram_range=(1, 2)
-        )
-        
-        # Vetorizar textos
-        tfidf_matrix = vectorizer.fit_transform(textos)
-        
-        return {
-            'vectorizer': vectorizer,
-            'tfidf_matrix': tfidf_matrix,
-            'chunks': chunks
-        }
-    except Exception as e:
-        print(f"Erro ao criar índice de similaridade: {e}")
-        return None
+    situacao = obter_carregador_rag().situacao()
+    if situacao['estado'] != 'carregando':
+        st.rerun()
+    
+    etapa = situacao['etapa'] or "Iniciando"
+    st.info(f"🔄 **Carregando bases (DCRC e BNCC):** {etapa}... ({situacao['segundos']:.0f}s)")
+    st.caption("Os gráficos continuam disponíveis; as análises com IA são habilitadas ao fim do carregamento.")
+    if not hasattr(st, 'fragment'):
+        st.button("🔄 Atualizar situação", key="atualizar_carregamento_rag")
 
+# Versões do Streamlit sem fragmentos exibem a situação com um botão de atualizar
+if hasattr(st, 'fragment'):
+    exibir_situacao_carregamento_rag = st.fragment(run_every=1)(exibir_situacao_carregamento_rag)
 
 def comparar_habilidades_competencias(dados_rag, nome_habilidade=""):
     """
@@ -328,13 +231,7 @@ def analisar_percursos_aprendizado(dados_rag, nome_habilidade=""):
             return ""
         
         # Buscar informações específicas sobre percursos de aprendizado
-        consultas_percurso = [
-            f"percurso aprendizado progressão sequência {nome_habilidade}",
-            f"dependência pré-requisito hierarquia habilidade {nome_habilidade}",
-            f"relação conexão vinculação habilidade componente {nome_habilidade}",
-            f"competência específica objetivo aprendizagem {nome_habilidade}",
-            f"metodologia estratégia ensino habilidade {nome_habilidade}"
-        ]
+        consultas_percurso = [consulta.format(nome_habilidade=nome_habilidade) for consulta in CONSULTAS_PERCURSO]
         
         contexto_percursos = "\n\n===== ANÁLISE HIERÁRQUICA DE PERCURSOS DE APRENDIZADO =====\n"
         
@@ -417,6 +314,40 @@ def analisar_percursos_aprendizado(dados_rag, nome_habilidade=""):
         print(f"Erro na análise de percursos de aprendizado: {e}")
         return ""
 
+def montar_contexto_codigos_habilidade(dados_rag, df, filtros=None, limite_habilidades=8):
+    """
+    Trechos do DCRC/BNCC de cada habilidade avaliada, obtidos pelo código da habilidade
+
+    Consulta o índice de códigos em vez de pontuar o corpus inteiro; as
+    habilidades com menor taxa de acerto vêm primeiro. Descritores sem
+    código da BNCC são buscados pela descrição, com os filtros da seleção.
+    """
+    try:
+        colunas = ['Código Habilidade', 'Habilidade', 'Taxa de Acerto']
+        if not dados_rag or df is None or not all(col in df.columns for col in colunas):
+            return ""
+        
+        habilidades = (
+            df.groupby('Código Habilidade', observed=True)
+            .agg({'Habilidade': 'first', 'Taxa de Acerto': 'mean'})
+            .sort_values('Taxa de Acerto')
+            .head(limite_habilidades)
+        )
+        
+        contexto_codigos = "\n\n===== HABILIDADES AVALIADAS NOS DOCUMENTOS BNCC/DCRC (POR CÓDIGO) =====\n"
+        for codigo, linha in habilidades.iterrows():
+            contexto_codigos += f"\n🧩 {codigo} - {linha['Habilidade']} (acerto médio: {linha['Taxa de Acerto']:.1f}%)\n"
+            trechos = contexto_habilidade(dados_rag, codigo, linha['Habilidade'], filtros=filtros)
+            if not trechos:
+                contexto_codigos += "Sem trechos correspondentes nos documentos.\n"
+            for trecho in trechos:
+                contexto_codigos += f"[{trecho.get('fonte') or 'Documento'}] {trecho['texto'][:300]}...\n"
+        
+        return contexto_codigos
+    except Exception as e:
+        print(f"Erro ao montar contexto por código de habilidade: {e}")
+        return ""
+
 def gerar_analise_personalizada(dados_rag, df_info, nome_grafico, contexto_especifico=""):
     """
     Gera análise personalizada baseada nos dados específicos da entidade e gráfico
@@ -431,7 +362,6 @@ def gerar_analise_personalizada(dados_rag, df_info, nome_grafico, contexto_espec
         # Extrair dados específicos do DataFrame
         estatisticas = df_info.get('estatisticas', {})
         amostra_dados = df_info.get('amostra_dados', [])
-        debug_info = df_info.get('debug_info', {})
         
         # Identificar padrões específicos nos dados
         padroes_identificados = []
@@ -624,103 +554,14 @@ def gerar_acoes_escola_baseadas_pdfs(dados_rag, tipo_grafico, contexto_especific
         print(f"Erro na geração de ações para escola: {e}")
         return ""
 
-def buscar_informacoes_relevantes(consulta, dados_rag, top_k=5):
+def obter_acoes_escola(dados_rag, tipo_grafico, contexto_especifico=""):
     """
-    Busca informações relevantes no PDF usando RAG
+    Ações para a escola do gráfico, guardadas na memória de consultas do índice
     """
-    try:
-        if not dados_rag or not dados_rag.get('indice_similaridade'):
-            return []
-        
-        indice = dados_rag['indice_similaridade']
-        vectorizer = indice['vectorizer']
-        tfidf_matrix = indice['tfidf_matrix']
-        chunks = indice['chunks']
-        
-        # Expandir consulta com termos relacionados específicos
-        if 'habilidade' in consulta.lower() or 'competência' in consulta.lower():
-            consulta_expandida = f"{consulta} habilidade competência capacidade componente relação entre componentes proximidade habilidades SPAECE DCRC BNCC avaliação proficiência competência geral competência específica habilidade essencial descrição da habilidade caracterização habilidade específica vinculação competência conexão componente relação dentro próprio componente competências específicas descrições habilidades relações habilidades objeto de conhecimento campo de experiência prática de linguagem percurso aprendizado progressão sequência dependência pré-requisito hierarquia metodologia estratégia ensino objetivo aprendizagem expectativa aprendizagem direito aprendizagem base nacional comum curricular documento curricular referencial"
-        elif 'proficiência' in consulta.lower() or 'desempenho' in consulta.lower():
-            consulta_expandida = f"{consulta} proficiência desempenho rendimento SPAECE DCRC BNCC avaliação competência objetivo de aprendizagem competência específica"
-        elif 'participação' in consulta.lower():
-            consulta_expandida = f"{consulta} participação frequência presença SPAECE DCRC BNCC educação básica"
-        else:
-            consulta_expandida = f"{consulta} educação avaliação SPAECE DCRC BNCC metodologia indicadores competência geral competência específica habilidade essencial descrição habilidade"
-        
-        # Vetorizar a consulta
-        consulta_vector = vectorizer.transform([consulta_expandida])
-        
-        # Calcular similaridade
-        similaridades = cosine_similarity(consulta_vector, tfidf_matrix).flatten()
-        
-        # Obter top-k resultados mais similares
-        top_indices = np.argsort(similaridades)[::-1][:top_k]
-        
-        resultados = []
-        for idx in top_indices:
-            if similaridades[idx] > 0.05:  # Threshold mais baixo para capturar mais informações
-                chunk_texto = chunks[idx]['texto']
-                # Identificar se o chunk é do BNCC ou DCRC
-                if "BNCC" in chunk_texto or "Base Nacional Comum Curricular" in chunk_texto or "BNCC_20dez_site" in chunk_texto:
-                    fonte_documento = "BNCC"
-                elif "DCRC" in chunk_texto or "Documento Curricular Referencial" in chunk_texto or "dcrc" in chunk_texto.lower():
-                    fonte_documento = "DCRC"
-                else:
-                    # Se não conseguir identificar, usar contexto do texto combinado
-                    # Alternar entre BNCC e DCRC para dar equilíbrio
-                    fonte_documento = "BNCC" if idx % 2 == 0 else "DCRC"
-                
-                resultados.append({
-                    'chunk': chunks[idx],
-                    'similaridade': similaridades[idx],
-                    'texto': chunk_texto,
-                    'fonte': fonte_documento
-                })
-        
-        # Busca específica para habilidades e relações com foco em BNCC e DCRC
-        if 'habilidade' in consulta.lower() or 'competência' in consulta.lower():
-            palavras_habilidade = ['habilidade', 'competência', 'capacidade', 'componente', 'relação', 'vinculação', 'conexão', 'descrição', 'caracterização', 'específica', 'geral', 'essencial', 'dcrc', 'documento curricular', 'bncc', 'base nacional comum curricular']
-            for i, chunk in enumerate(chunks):
-                texto_chunk = chunk['texto'].lower()
-                if any(palavra in texto_chunk for palavra in palavras_habilidade):
-                    # Verificar se já não está nos resultados
-                    if not any(r['chunk']['indice'] == chunk['indice'] for r in resultados):
-                        # Identificar fonte para habilidades
-                        if "BNCC" in chunk['texto'] or "Base Nacional Comum Curricular" in chunk['texto']:
-                            fonte_habilidade = "BNCC"
-                        elif "DCRC" in chunk['texto'] or "Documento Curricular Referencial" in chunk['texto']:
-                            fonte_habilidade = "DCRC"
-                        else:
-                            # Alternar entre BNCC e DCRC para dar equilíbrio
-                            fonte_habilidade = "BNCC" if i % 2 == 0 else "DCRC"
-                        
-                        resultados.append({
-                            'chunk': chunk,
-                            'similaridade': 0.4,  # Similaridade alta para habilidades
-                            'texto': chunk['texto'],
-                            'fonte': fonte_habilidade
-                        })
-                        if len(resultados) >= top_k * 2:  # Mais resultados para habilidades
-                            break
-        
-        # Se não encontrou resultados específicos, buscar por palavras-chave gerais
-        if not resultados:
-            palavras_chave = consulta.lower().split()
-            for i, chunk in enumerate(chunks):
-                texto_chunk = chunk['texto'].lower()
-                if any(palavra in texto_chunk for palavra in palavras_chave):
-                    resultados.append({
-                        'chunk': chunk,
-                        'similaridade': 0.3,  # Similaridade artificial para palavras-chave
-                        'texto': chunk['texto']
-                    })
-                    if len(resultados) >= top_k:
-                        break
-        
-        return resultados
-    except Exception as e:
-        print(f"Erro na busca RAG: {e}")
-        return []
+    return memorizar(
+        dados_rag, ('acoes_escola', tipo_grafico, contexto_especifico),
+        lambda: gerar_acoes_escola_baseadas_pdfs(dados_rag, tipo_grafico, contexto_especifico)
+    )
 
 def analisar_pdf_com_rag_groq(dados_rag, contexto_analise="", consulta_especifica=""):
     """
@@ -811,7 +652,7 @@ def analisar_pdf_com_rag_groq(dados_rag, contexto_analise="", consulta_especific
             "temperature": 0.7
         }
         
-        response = requests.post(
+        response = obter_sessao().post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers=headers,
             json=data,
@@ -877,7 +718,7 @@ def analisar_pdf_com_groq(texto_pdf, contexto_analise=""):
             "temperature": 0.7
         }
         
-        response = requests.post(
+        response = obter_sessao().post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers=headers,
             json=data,
@@ -1115,11 +956,37 @@ def obter_contexto_banner(nome_grafico):
 
 # ==================== FUNÇÃO DE ANÁLISE COM GROQ ====================
 
-def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consultada="", df_concatenado=None):
+def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consultada="", df_concatenado=None, em_fluxo=False):
     """
     Analisa um DataFrame usando a API da Groq e retorna insights considerando a hierarquia educacional
     Usa df_concatenado para identificar corretamente a entidade e sua hierarquia
     Inclui contexto do PDF de referência quando disponível
+    Com em_fluxo=True retorna um iterador de pedaços do texto (ver exibir_analise_em_fluxo);
+    mensagens de erro e de configuração continuam vindo como texto
+    """
+    requisicao = preparar_analise_dataframe(df, nome_grafico, contexto, entidade_consultada, df_concatenado)
+    if isinstance(requisicao, str):
+        return requisicao
+    
+    try:
+        # Análises idênticas vêm do cache em disco; as demais respeitam o limite de tokens por minuto,
+        # passando à frente dos relatórios completos em andamento
+        gerar = gerar_analise_em_fluxo if em_fluxo else gerar_analise
+        return gerar(requisicao['cliente'], requisicao['mensagens'], rotulo=requisicao['rotulo'],
+                     limitador=obter_limitador(), prioritaria=True)
+    except Exception as e:
+        return f"❌ Erro na análise: {str(e)}"
+
+def preparar_analise_dataframe(df, nome_grafico, contexto="", entidade_consultada="", df_concatenado=None):
+    """
+    Monta a requisição de análise de um gráfico (prompt com dados, hierarquia e contexto RAG)
+
+    Separada da chamada ao modelo para que o relatório completo monte todos os
+    prompts na execução do script e envie as chamadas em paralelo.
+
+    Returns:
+        dict: cliente, mensagens e rotulo (código da entidade), ou str com a
+              mensagem de erro/configuração a exibir no lugar da análise
     """
     try:
         # Verificar se a API key está configurada
@@ -1130,11 +997,8 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
         if api_key == "gsk_your_groq_api_key_here":
             return "⚠️ Configure sua API key da Groq no arquivo secrets.toml"
         
-        # Importar groq apenas quando necessário
-        from groq import Groq
-        
-        # Inicializar cliente Groq
-        client = Groq(api_key=api_key)
+        # Cliente Groq reutilizado entre análises (importa groq apenas quando necessário)
+        client = obter_cliente_groq(api_key)
         
         # Determinar tipo de entidade e hierarquia
         tipo_entidade = "Desconhecida"
@@ -1250,28 +1114,24 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
             "colunas": df.columns.tolist(),
             "tipos_dados": df.dtypes.to_dict(),
             "amostra_dados": df_limpo.head(10).to_dict('records') if not df_limpo.empty else [],
-            "estatisticas": df_limpo.describe().to_dict() if not df_limpo.empty else {},
-            "debug_info": {
-                "entidade_consultada_original": entidade_consultada,
-                "entidade_consultada_str": str(entidade_consultada),
-                "cd_entidade_values": df_para_identificacao['CD_ENTIDADE'].unique().tolist()[:5] if 'CD_ENTIDADE' in df_para_identificacao.columns else "Coluna não encontrada",
-                "dc_tipo_entidade_values": df_para_identificacao['DC_TIPO_ENTIDADE'].unique().tolist()[:5] if 'DC_TIPO_ENTIDADE' in df_para_identificacao.columns else "Coluna não encontrada",
-                "nm_entidade_values": df_para_identificacao['NM_ENTIDADE'].unique().tolist()[:5] if 'NM_ENTIDADE' in df_para_identificacao.columns else "Coluna não encontrada",
-                "entidade_encontrada": not df_para_identificacao.empty and 'CD_ENTIDADE' in df_para_identificacao.columns and str(entidade_consultada) in df_para_identificacao['CD_ENTIDADE'].astype(str).values,
-                "dc_tipo_entidade_da_entidade": entidade_filtrada['DC_TIPO_ENTIDADE'].iloc[0] if not df_para_identificacao.empty and 'CD_ENTIDADE' in df_para_identificacao.columns and 'DC_TIPO_ENTIDADE' in df_para_identificacao.columns and not df_para_identificacao[df_para_identificacao['CD_ENTIDADE'].astype(str) == str(entidade_consultada)].empty else "Não encontrado",
-                "nm_entidade_da_entidade": entidade_filtrada['NM_ENTIDADE'].iloc[0] if not df_para_identificacao.empty and 'CD_ENTIDADE' in df_para_identificacao.columns and 'NM_ENTIDADE' in df_para_identificacao.columns and not df_para_identificacao[df_para_identificacao['CD_ENTIDADE'].astype(str) == str(entidade_consultada)].empty else "Não encontrado"
-            }
+            "estatisticas": df_limpo.describe().to_dict() if not df_limpo.empty else {}
         }
         
         # Criar prompt para análise
         # Adicionar contexto dos documentos usando RAG se disponível
-        contexto_documentos = ""
-        if st.session_state.get('documentos_carregados', False) and st.session_state.get('dados_rag'):
-            dados_rag = st.session_state['dados_rag']
+        componentes_documentos = []
+        if st.session_state.get('documentos_carregados', False):
+            dados_rag = obter_dados_rag()
             
             # Usar RAG para encontrar informações relevantes
             consulta_especifica = f"{nome_grafico} {contexto} {tipo_entidade}"
-            informacoes_relevantes = buscar_informacoes_relevantes(consulta_especifica, dados_rag, top_k=3)
+            # Priorizar trechos da disciplina e do ano selecionados, se houver algum
+            filtros = filtros_da_selecao(
+                st.session_state.get('disciplina_selecionada'), st.session_state.get('etapa_selecionada')
+            )
+            informacoes_relevantes = buscar_informacoes_relevantes(consulta_especifica, dados_rag, top_k=3, filtros=filtros)
+            if not informacoes_relevantes and filtros:
+                informacoes_relevantes = buscar_informacoes_relevantes(consulta_especifica, dados_rag, top_k=3)
             
             # Adicionar informações das tabelas se disponíveis
             tabelas_contexto = ""
@@ -1295,17 +1155,24 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
             
             # Contexto específico para habilidades
             contexto_habilidades = ""
+            contexto_codigos = comparacao_competencias = analise_percursos = ""
             if 'habilidade' in nome_grafico.lower() or 'competência' in nome_grafico.lower():
                 # Adicionar comparação específica com competências do BNCC/DCRC
-                comparacao_competencias = comparar_habilidades_competencias(dados_rag, nome_grafico)
+                comparacao_competencias = memorizar(
+                    dados_rag, ('comparacao_competencias', nome_grafico),
+                    lambda: comparar_habilidades_competencias(dados_rag, nome_grafico)
+                )
                 
                 # Adicionar análise de percursos de aprendizado
-                analise_percursos = analisar_percursos_aprendizado(dados_rag, nome_grafico)
+                analise_percursos = memorizar(
+                    dados_rag, ('percursos', nome_grafico),
+                    lambda: analisar_percursos_aprendizado(dados_rag, nome_grafico)
+                )
                 
-                # Adicionar ações específicas para escola
-                acoes_escola = gerar_acoes_escola_baseadas_pdfs(dados_rag, nome_grafico, contexto)
+                # Trechos dos documentos de cada habilidade avaliada, pelo código
+                contexto_codigos = montar_contexto_codigos_habilidade(dados_rag, df, filtros)
                 
-                contexto_habilidades = f"""
+                contexto_habilidades = """
 
         ===== ANÁLISE HIERÁRQUICA DE HABILIDADES: RELAÇÕES, DEPENDÊNCIAS E PERCURSOS POR NÍVEL EDUCACIONAL =====
         
@@ -1360,21 +1227,12 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
            - SEJA ESPECÍFICO: evite generalizações, foque nos dados específicos da entidade
            - **CITE OBRIGATORIAMENTE BNCC E DCRC**: Sempre que possível, referencie tanto a BNCC quanto o DCRC como fontes principais das metodologias, competências e diretrizes curriculares
            - **PERSPECTIVA HIERÁRQUICA**: Considere como a entidade se posiciona em relação aos níveis superiores e inferiores
-        
-        {comparacao_competencias}
-        
-        {analise_percursos}
-        
-        {acoes_escola}
         """
             
             # Contexto específico para proficiência
             contexto_proficiencia = ""
             if 'proficiência' in nome_grafico.lower() or 'desempenho' in nome_grafico.lower():
-                # Adicionar ações específicas para escola
-                acoes_escola_prof = gerar_acoes_escola_baseadas_pdfs(dados_rag, nome_grafico, contexto)
-                
-                contexto_proficiencia = f"""
+                contexto_proficiencia = """
 
         ===== CONTEXTO ESPECÍFICO PARA ANÁLISE DE PROFICIÊNCIA (DCRC + BNCC) =====
         
@@ -1391,37 +1249,26 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
         - Sugerir intervenções alinhadas com competências específicas
         - Relacionar proficiência com campos de experiência
         - Considerar princípios e fundamentos da BNCC
-        
-        {acoes_escola_prof}
         """
             
             # Adicionar análise personalizada baseada nos dados específicos
             analise_personalizada = gerar_analise_personalizada(dados_rag, df_info, nome_grafico, contexto)
             
             # Adicionar ações específicas para escola baseadas no tipo de gráfico
-            acoes_escola_geral = gerar_acoes_escola_baseadas_pdfs(dados_rag, nome_grafico, contexto)
+            acoes_escola_geral = obter_acoes_escola(dados_rag, nome_grafico, contexto)
             
             if informacoes_relevantes:
                 contexto_rag = "\n\n".join([info['texto'] for info in informacoes_relevantes])
-                contexto_documentos = f"""
-
+                versoes_trechos = [
+                    f"""
         ===== CONTEXTO DOS DOCUMENTOS DCRC + BNCC (INFORMAÇÕES RELEVANTES) =====
         
         INFORMAÇÕES ESPECÍFICAS ENCONTRADAS:
-        {contexto_rag[:2000]}
-        
-        {tabelas_contexto}
-        
-        {secoes_contexto}
-        
-        {contexto_habilidades}
-        
-        {contexto_proficiencia}
-        
-        {analise_personalizada}
-        
-        {acoes_escola_geral}
-        
+        {contexto_rag[:limite]}
+        """
+                    for limite in (2000, 1000)
+                ]
+                instrucao_documentos = """
         INSTRUÇÃO CRÍTICA - ANÁLISE CIRÚRGICA FUNDAMENTADA NOS DOCUMENTOS BNCC E DCRC:
         
         **ANÁLISE HIERÁRQUICA OBRIGATÓRIA - PERSPECTIVA POR NÍVEL EDUCACIONAL:**
@@ -1462,28 +1309,35 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
         """
             else:
                 # Fallback para contexto geral se RAG não encontrar informações específicas
-                contexto_documentos = f"""
-
+                versoes_trechos = [
+                    f"""
         ===== CONTEXTO DOS DOCUMENTOS DCRC + BNCC (GERAL) =====
         
-        {st.session_state['documentos_referencia'][:3000]}
-        
-        {tabelas_contexto}
-        
-        {secoes_contexto}
-        
-        {contexto_habilidades}
-        
-        {contexto_proficiencia}
-        
-        {analise_personalizada}
-        
-        {acoes_escola_geral}
-        
+        {dados_rag['texto_completo'][:limite]}
+        """
+                    for limite in (3000, 1000)
+                ] + [""]
+                instrucao_documentos = """
         INSTRUÇÃO CRÍTICA: Use OBRIGATORIAMENTE estas informações do DCRC e BNCC para contextualizar suas análises e descrever ações específicas para a escola. PERSONALIZE baseando-se nos dados específicos da entidade. REFERENCIE explicitamente os PDFs nas análises.
         """
+            
+            # Componentes do prompt vindos dos documentos: (nome, versões da completa à
+            # mais reduzida, prioridade); maior prioridade é reduzida primeiro
+            componentes_documentos = [
+                ('trechos_documentos', versoes_trechos, 1),
+                ('tabelas_dcrc', [tabelas_contexto, ""], 4),
+                ('secoes_dcrc', [secoes_contexto, ""], 4),
+                ('instrucoes_habilidades', [contexto_habilidades], 0),
+                ('codigos_habilidade', [contexto_codigos], 0),
+                ('comparacao_competencias', [comparacao_competencias, ""], 2),
+                ('percursos', [analise_percursos, ""], 2),
+                ('instrucoes_proficiencia', [contexto_proficiencia], 0),
+                ('analise_personalizada', [analise_personalizada, ""], 3),
+                ('acoes_escola', [acoes_escola_geral, ""], 2),
+                ('instrucao_documentos', [instrucao_documentos], 0)
+            ]
 
-        prompt = f"""
+        cabecalho = f"""
         **ANÁLISE HIERÁRQUICA** dos dados educacionais do SPAECE (Sistema Permanente de Avaliação da Educação Básica do Ceará) considerando a HIERARQUIA EDUCACIONAL.
 
         **CONTEXTO HIERÁRQUICO ESPECÍFICO:**
@@ -1521,23 +1375,28 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
         - **FOQUE** na comparação entre os níveis hierárquicos do Ceará
         - **EVITE** palavras como "benchmarks" ou "padrões nacionais"
         - **CONCENTRE-SE** na análise comparativa entre os níveis do estado do Ceará
-
-        {obter_contexto_banner(nome_grafico)}
-
-        {obter_contexto_seduc_spaece()}
-
+        """
+        
+        versoes_amostra = [
+            f"""
         **OBSERVAÇÃO IMPORTANTE:** Valores faltantes (NaN) foram tratados inteligentemente na análise. Quando possível, foram removidos completamente. Quando isso resultaria em dados insuficientes, foram mantidas linhas com pelo menos 50% ou 25% das colunas válidas, pois valores faltantes indicam que aquela coluna não possui registro para aquela linha específica na estrutura do DataFrame.
 
         DADOS DE AMOSTRA (após limpeza):
-        {json.dumps(df_info['amostra_dados'], indent=2, default=str)}
-
+        {json_compacto(df_info['amostra_dados'][:linhas])}
+        """
+            for linhas in (10, 5)
+        ]
+        
+        # Versão reduzida: só contagem, média e extremos de cada coluna
+        versoes_estatisticas = [
+            f"""
         ESTATÍSTICAS DESCRITIVAS (após limpeza):
-        {json.dumps(df_info['estatisticas'], indent=2, default=str)}
-
-        INFORMAÇÕES DE DEBUG:
-        {json.dumps(df_info['debug_info'], indent=2, default=str)}
-        {contexto_documentos}
-
+        {json_compacto(resumir_estatisticas(df_info['estatisticas'], medidas))}
+        """
+            for medidas in (None, ('count', 'mean', 'min', 'max'))
+        ]
+        
+        instrucoes = f"""
         INSTRUÇÕES ESPECÍFICAS PARA ANÁLISE PROFUNDA E DETALHADA:
         
         **ANÁLISE ESTATÍSTICA AVANÇADA:**
@@ -1666,24 +1525,128 @@ def analisar_dataframe_com_groq(df, nome_grafico, contexto="", entidade_consulta
         Responda em português brasileiro.
         """
         
-        # Fazer chamada para a API
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
+        # Montar o prompt dentro do orçamento de tokens, reduzindo primeiro o contexto de menor valor
+        prompt, relatorio_prompt = ajustar_prompt_ao_orcamento([
+            ('cabecalho', [cabecalho], 0),
+            ('contexto_grafico', [obter_contexto_banner(nome_grafico)], 0),
+            ('contexto_seduc', [obter_contexto_seduc_spaece(), ""], 3),
+            ('amostra_dados', versoes_amostra, 1),
+            ('estatisticas', versoes_estatisticas, 2),
+            *componentes_documentos,
+            ('instrucoes', [instrucoes], 0)
+        ])
+        print(f"Prompt da análise '{nome_grafico}': {resumo_orcamento(relatorio_prompt)}")
+        
+        return {
+            'cliente': client,
+            'mensagens': [
                 {"role": "system", "content": f"Você é um consultor educacional especializado em análise de dados do SPAECE com mais de 15 anos de experiência. Seu papel é aconselhar especificamente o gestor da entidade consultada ({nome_entidade_consultada}) sobre ações práticas e viáveis dentro de sua esfera de influência. Considere que este gestor tem poder apenas sobre seu nível hierárquico ({nivel_hierarquico}) e não pode influenciar outros níveis da hierarquia educacional. Forneça análises PROFUNDAS, DETALHADAS e ESTRATÉGICAS com evidências quantitativas e qualitativas."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=3000,
-            temperature=0.2
-        )
-        
-        return response.choices[0].message.content
+            'rotulo': str(entidade_consultada)
+        }
         
     except ImportError:
         return "⚠️ Biblioteca groq não instalada. Execute: pip install groq"
     except Exception as e:
         return f"❌ Erro na análise: {str(e)}"
 
+# Intervalo mínimo entre atualizações do texto exibido durante o fluxo
+INTERVALO_ATUALIZACAO_FLUXO = 0.05
+
+def exibir_analise_em_fluxo(analise):
+    """
+    Exibe a análise à medida que os pedaços chegam do modelo
+
+    Aceita também o texto pronto (análise em cache já vem em um pedaço;
+    mensagens de erro vêm como texto). Uma falha no meio do fluxo mantém o
+    texto recebido e acrescenta a mensagem de erro.
+
+    Returns:
+        str: Texto completo exibido
+    """
+    if isinstance(analise, str):
+        st.markdown(analise)
+        return analise
+    
+    espaco = st.empty()
+    partes = []
+    ultima_atualizacao = 0.0
+    try:
+        for parte in analise:
+            partes.append(parte)
+            agora = time.monotonic()
+            if agora - ultima_atualizacao >= INTERVALO_ATUALIZACAO_FLUXO:
+                espaco.markdown(''.join(partes) + "▌")
+                ultima_atualizacao = agora
+    except Exception as e:
+        partes.append(f"\n\n❌ Erro na análise: {str(e)}")
+    
+    texto = ''.join(partes)
+    espaco.markdown(texto)
+    return texto
+
+# ==================== RELATÓRIO COMPLETO COM IA ====================
+
+def exibir_analise_do_relatorio(key_analise, df, nome_grafico, contexto, df_concatenado):
+    """
+    Parte de uma seção no relatório completo com IA
+
+    Se o relatório foi pedido nesta execução, monta o prompt da seção e
+    reserva o espaço onde a análise aparecerá quando ficar pronta (ver
+    concluir_relatorio_completo); senão, exibe a análise gerada no último
+    relatório da entidade, se houver.
+    """
+    lote = st.session_state.get('lote_analises')
+    if lote is None:
+        analise = st.session_state.get('analises_relatorio', {}).get((st.session_state.agregado_consultado, key_analise))
+        if analise:
+            st.markdown(analise)
+        return
+    
+    requisicao = preparar_analise_dataframe(
+        df, nome_grafico, contexto, st.session_state.agregado_consultado, df_concatenado
+    )
+    espaco = st.empty()
+    if isinstance(requisicao, str):
+        espaco.markdown(requisicao)
+        return
+    espaco.info("⏳ Análise na fila do relatório completo...")
+    lote['requisicoes'][key_analise] = requisicao
+    lote['espacos'][key_analise] = espaco
+
+def concluir_relatorio_completo():
+    """
+    Envia as análises montadas pelas seções e preenche cada uma ao ficar pronta
+
+    Chamada ao fim do script, quando todas as seções já registraram seus
+    prompts. As chamadas correm em paralelo, limitadas pelos tokens por
+    minuto da Groq; análises já geradas antes vêm do cache em disco.
+    """
+    lote = st.session_state.pop('lote_analises', None)
+    if lote is None:
+        return
+    
+    situacao = lote['situacao']
+    total = len(lote['requisicoes'])
+    if total == 0:
+        situacao.warning("⚠️ Nenhum gráfico com dados para analisar nesta seleção")
+        return
+    
+    analises = st.session_state.setdefault('analises_relatorio', {})
+    agregado = st.session_state.agregado_consultado
+    situacao.info(f"🤖 Gerando {total} análises com IA...")
+    concluidas = 0
+    for key_analise, analise, erro in gerar_analises_em_paralelo(lote['requisicoes']):
+        if erro is None:
+            analises[(agregado, key_analise)] = analise
+        else:
+            analise = f"❌ Erro na análise: {str(erro)}"
+        lote['espacos'][key_analise].markdown(analise)
+        concluidas += 1
+        situacao.info(f"🤖 {concluidas}/{total} análises concluídas")
+    situacao.success(f"✅ Relatório completo: {total} análises prontas nos painéis \"🤖 Análise Inteligente\"")
+
 # Sistema de Autenticação - Carregar do secrets.toml
 try:
     # Combinar todas as credenciais em um único dicionário
@@ -1702,98 +1665,14 @@ try:
     # Carregar usuários municipais
     if "xmunicipios" in st.secrets:
         PASSWORDS.update(st.secrets["xmunicipios"])
-        # Mapear códigos municipais para nomes
-        municipios_map = {
-            "2301000": "AQUIRAZ",
-            "2303709": "CAUCAIA", 
-            "2304285": "EUSEBIO",
-            "2304954": "GUAIUBA",
-            "2306256": "ITAITINGA",
-            "2307650": "MARACANAU",
-            "2307700": "MARANGUAPE",
-            "2309706": "PACATUBA"
-        }
         for codigo in st.secrets["xmunicipios"].keys():
-            ENTITY_NAMES[codigo] = municipios_map.get(codigo, f"Município {codigo}")
+            ENTITY_NAMES[codigo] = MUNICIPIOS_MAP.get(codigo, f"Município {codigo}")
     
     # Carregar usuários de escolas
     if "xescolas" in st.secrets:
         PASSWORDS.update(st.secrets["xescolas"])
-        # Mapear códigos de escolas para nomes (usando comentários do secrets.toml)
-        escolas_map = {
-            # AQUIRAZ
-            "23061197": "ALOISIO BERNARDO DE CASTRO EMEF",
-            "23061723": "ANTONIO DE BRITO LIMA EMEF",
-            "23060956": "BATOQUE EMEF",
-            "23564385": "CENTRO DE EDUCACAO E CIDADANIA MANUEL ASSUNCAO PIRES",
-            "23061251": "CENTRO DE EDUCACAO E CIDADANIA MARIA DE CASTRO BERNARDO",
-            "23061634": "CLARENCIO CRISOSTOMO DE FREITAS EMEF",
-            "23061014": "CORREGO DA MINHOCA EMEF",
-            "23061758": "DIONISIA GUERRA EMEF",
-            "23061022": "ERNESTO GURGEL VALENTE EMEF",
-            "23061618": "ESCOLA MUNICIPAL DE ENSINO FUNDAMENTAL TIA ALZIRA",
-            "23262672": "FERDINANDO TANSI CENTRO EDUCACIONAL MUNICIPAL",
-            "23061049": "FRANCISCA MONTEIRO DA SILVA EMEF",
-            "23061057": "FRANCISCO DA SILVA SAMPAIO EMEF",
-            "23061650": "FRANCISCO GOMES FARIAS EMEF CEL",
-            "23061073": "GUILHERME JANJA EMEF",
-            "23061081": "HENRIQUE GONCALVES DA JUSTA FILHO EMEF",
-            "23061774": "ISIDORO DE SOUSA ASSUNCAO EMEF",
-            "23061090": "JARBAS PASSARINHO MIN EMEF",
-            "23061790": "JOAO JAIME GADELHA EMEF",
-            "23061804": "JOAO PIRES CARDOSO EMEF",
-            "23061111": "JOAQUIM DE SOUSA TAVARES EMEF",
-            "23204150": "JOSE ALMIR DA SILVA EMEF",
-            "23061413": "JOSE CAMARA DE ALMEIDA EMEF",
-            "23061146": "JOSE FERREIRA DA COSTA EMEF",
-            "23204141": "JOSE ISAAC SARAIVA DA CUNHA EMEF",
-            "23061820": "JOSE RAIMUNDO DA COSTA EMEF",
-            "23060999": "JOSE RODRIGUES MONTEIRO EMEF",
-            "23061162": "JUSCELINO KUBITSCHEK EMEF",
-            "23061847": "JUVENAL PEREIRA FACANHA EMEF",
-            "23061189": "LAGOA DE CIMA EMEF",
-            "23061855": "LAGOA DO MATO DE SERPA EMEF",
-            "23248750": "LAIS SIDRIM TARGINO EMEF",
-            "23176423": "LEOLINA BATISTA RAMOS EMEF",
-            "23204125": "LUIZ EDUARDO STUDART GOMES EMEF",
-            "23061278": "MARIA FACANHA DE SA EMEF",
-            "23061294": "MARIA MARGARIDA RAMOS COELHO EMEF",
-            "23061685": "MARIA SOARES DE FREITAS EMEF",
-            "23061430": "PLACIDO CASTELO EMEF",
-            "23060905": "RAIMUNDA DE FREITAS FACANHA CEI",
-            "23061626": "RAIMUNDA FERREIRA DA SILVA EMEF",
-            "23061480": "RAIMUNDO RAMOS DA COSTA EMEF",
-            "23061448": "RITA PAULA DE BRITO EMEF",
-            "23061596": "VILA PAGA EMEF",
-            "23061910": "VINDINA ASSUNCAO DE AQUINO EMEF",
-            # PACATUBA - Exemplo de algumas escolas
-            "23264292": "JOAO PAULO SAMPAIO DE MENEZES EEIEF",
-            "23083417": "ANA ALBUQUERQUE CAMPOS EEIEF",
-            "23083433": "ANGELA COSTA CAMPOS EEF",
-            "23083735": "CLOVIS DE CASTRO PEREIRA EEF",
-            "23083492": "CRISPIANA DE ALBUQUERQUE EEF",
-            "23083450": "DR CARLOS ALBERTO DE ALMEIDA PONTE EEF",
-            "23083751": "FIRMINO DE ABREU LIMA EEIEF",
-            "23182342": "GELIA DA SILVA CORREIA EEIEF",
-            "23083778": "JARDIM BOM RETIRO EREIEF",
-            "23326662": "JOANA VASCONCELOS DE OLIVEIRA EMTI",
-            "23264020": "JOSE BATISTA DE OLIVEIRA EEIEF",
-            "23083697": "MAJOR MANOEL ASSIS NEPOMUCENO EEIEF",
-            "23267259": "MANOEL ROSENDO FREIRE EEF",
-            "23083611": "MANUEL PONTES DE MEDEIROS EEIEF",
-            "23083700": "MARIA DE SA RORIZ EEIEF",
-            "23083808": "MARIA GUIOMAR BASTOS CAVALCANTE PROFESSORA EEIEF",
-            "23083638": "MARIA MIRTES HOLANDA DO VALE PROF EEF",
-            "23083719": "MARIA MOCINHA ROCHA SA EEIEF",
-            "23083824": "NELLY DE LIMA E MELO EEIEF",
-            "23083760": "OS HEROIS DO TIMBO EEIEF",
-            "23083832": "PEDRO DE SA RORIZ EEIEF",
-            "23083506": "RAIMUNDA DA CRUZ ALEXANDRE EREIEF",
-            "23083689": "VICENTE FERRER DE LIMA EEIEF",
-            "23190906": "WALNEY DO CARMO LOPES EEIEF"
-        }
         for codigo in st.secrets["xescolas"].keys():
-            ENTITY_NAMES[codigo] = escolas_map.get(codigo, f"Escola {codigo}")
+            ENTITY_NAMES[codigo] = ESCOLAS_MAP.get(codigo, f"Escola {codigo}")
     
     if not PASSWORDS:
         st.error("❌ Nenhuma credencial encontrada no secrets.toml!")
@@ -2340,122 +2219,187 @@ CODIGOS_ENTIDADE = {
 
 # ==================== FUNÇÕES DE API ====================
 
-def consultar_api(agregado):
-    """Consulta a API SPAECE com tratamento de erros aprimorado"""
-    try:
-        # Validar entrada
-        if not agregado or not str(agregado).strip():
-            st.error("❌ Código da Entidade não pode estar vazio")
-            return None
-            
-        payload = criar_payload(
-            indicadores=INDICADORES,
-            agregado=str(agregado).strip(),
-            filtros=[],
-            nivel_abaixo="0"
-        )
-        
-        response = requests.post(
-            API_URL, 
-            json=payload, 
-            headers=HEADERS, 
-            timeout=30
-        )
-        response.raise_for_status()
-        
-        # Verificar se a resposta contém dados válidos
-        data = response.json()
-        if not data:
-            st.warning(f"⚠️ Nenhum dado retornado para o agregado {agregado}")
-            return None
-            
-        return data
-        
-    except requests.exceptions.Timeout:
-        st.error(f"⏱️ Timeout ao consultar agregado {agregado}. Tente novamente.")
-        return None
-    except requests.exceptions.ConnectionError:
-        st.error(f"🌐 Erro de conexão. Verifique sua internet.")
-        return None
-    except requests.exceptions.HTTPError as e:
-        st.error(f"❌ Erro HTTP {e.response.status_code}: {e.response.reason}")
-        return None
-    except requests.exceptions.RequestException as e:
-        st.error(f"❌ Erro na requisição: {str(e)}")
-        return None
-    except json.JSONDecodeError:
-        st.error("❌ Erro ao decodificar resposta da API")
+@st.cache_resource(ttl=CACHE_TTL_API_SEGUNDOS, max_entries=CACHE_MAX_AGREGADOS_MEMORIA, show_spinner=False)
+def obter_df_agregado(agregado, grupos=GRUPOS_CARGA_INICIAL):
+    """
+    Retorna o DataFrame processado de um agregado, compartilhado por todas as sessões
+
+    O objeto devolvido é o mesmo para todos os usuários e deve ser tratado
+    como somente leitura. Falhas geram exceção para não ficarem em cache.
+    """
+    # Resposta lida em pedaços diretamente para colunas (sem lista de dicionários)
+    df = requisitar_df_agregado(agregado, grupos=grupos)
+    if df is None:
+        raise ValueError(f"Nenhum dado retornado para o agregado {agregado}")
+    
+    # Cópia rasa: o DataFrame lido pode ter sido compartilhado com consultas simultâneas
+    df = df.copy(deep=False)
+    
+    # Adicionar coluna identificadora do agregado
+    df['AGREGADO_ORIGEM'] = agregado
+    
+    # Tipos declarados aplicados uma única vez, após as substituições de texto
+    return aplicar_esquema(aplicar_substituicoes(df))
+
+def carregar_df_agregado(agregado, grupos=GRUPOS_CARGA_INICIAL):
+    """Obtém o DataFrame compartilhado de um agregado com tratamento de erros aprimorado"""
+    # Validar entrada
+    if not agregado or not str(agregado).strip():
+        st.error("❌ Código da Entidade não pode estar vazio")
         return None
+    
+    try:
+        return obter_df_agregado(str(agregado).strip(), tuple(grupos))
     except Exception as e:
-        st.error(f"❌ Erro inesperado: {str(e)}")
+        exibir_erro_consulta(agregado, e)
         return None
 
-# ==================== FUNÇÕES DE PROCESSAMENTO ====================
+def carregar_agregados_em_paralelo(agregados, grupos=GRUPOS_CARGA_INICIAL):
+    """Carrega no cache compartilhado vários agregados em paralelo e retorna os resultados na ordem original"""
+    contexto_script = get_script_run_ctx()
+    grupos = tuple(grupos)
+    return consultar_agregados_em_paralelo(
+        agregados,
+        funcao_consulta=lambda ag: obter_df_agregado(ag, grupos),
+        inicializador=lambda: add_script_run_ctx(threading.current_thread(), contexto_script)
+    )
+
+def compor_df_concatenado(agregados, grupos=GRUPOS_CARGA_INICIAL):
+    """
+    Monta o DataFrame da sessão a partir das partes compartilhadas de cada agregado
 
-def processar_dados(data):
-    """Processa dados da API e retorna DataFrame"""
-    if not data:
-        st.warning("⚠️ Nenhum dado fornecido para processamento")
+    A concatenação não fica em cache: guardá-la por combinação de agregados
+    duplicaria as linhas do estado e da CREDE para cada escola. Cada agregado
+    é obtido uma única vez; as falhas são registradas no log e as partes
+    disponíveis são concatenadas (o erro já é exibido por quem consultou o
+    agregado: carregar_df_agregado ou carregar_agregados_em_paralelo).
+    """
+    grupos = tuple(grupos)
+    partes = []
+    for agregado in agregados:
+        try:
+            partes.append(obter_df_agregado(agregado, grupos))
+        except Exception as e:
+            print(f"Erro ao compor o agregado {agregado} (grupos {', '.join(grupos)}): {e}")
+    if not partes:
         return None
-        
+    return concatenar_dataframes(partes)
+
+def obter_df_secao(secao):
+    """
+    Retorna o DataFrame da sessão com os indicadores de uma seção carregada sob demanda
+
+    Na primeira vez, os agregados da sessão são consultados em paralelo; o
+    resultado recebe o filtro de entidade e os filtros da barra lateral.
+    """
+    grupos = SECOES_INDICADORES[secao]
+    agregados = st.session_state.agregados_sessao
+    carregados = st.session_state.setdefault('grupos_carregados', set())
+    
+    if grupos not in carregados:
+        with st.spinner("🔄 Carregando indicadores da seção..."):
+            for resultado in carregar_agregados_em_paralelo(agregados, grupos):
+                if resultado['erro'] is not None:
+                    exibir_erro_consulta(resultado['agregado'], resultado['erro'])
+        carregados.add(grupos)
+    
+    df_secao = compor_df_concatenado(agregados, grupos)
+    if df_secao is None:
+        return pd.DataFrame()
+    return aplicar_filtros_sessao(df_secao)
+
+def aplicar_filtros_sessao(df):
+    """Aplica o filtro de entidade estadual e os filtros selecionados na barra lateral"""
+    agregado_original = st.session_state.get('agregado_consultado')
+    if agregado_original and len(agregado_original) == 2 and 'CD_ENTIDADE' in df.columns:
+        df = df[df['CD_ENTIDADE'] == agregado_original]
+    
+    filtros = [
+        ('VL_FILTRO_ETAPA', 'etapa_selecionada'),
+        ('VL_FILTRO_DISCIPLINA', 'disciplina_selecionada'),
+        ('VL_FILTRO_REDE', 'rede_selecionada')
+    ]
+    for coluna, chave in filtros:
+        valor = st.session_state.get(chave)
+        if valor and coluna in df.columns:
+            df = df[df[coluna] == valor]
+    return df.copy()
+
+def exibir_diagnostico_memoria_rag():
+    """
+    Mostra a memória ocupada pelo índice RAG compartilhado e pelo processo
+
+    O corpo do expander roda a cada execução do script; a estimativa por
+    componente percorre todo o índice, então só é calculada ao pedir pelo
+    botão e fica guardada na sessão (para o índice em que foi medida).
+    """
+    dados_rag = obter_dados_rag()
+    st.caption("Índice RAG (uma cópia por processo, compartilhada por todas as sessões)")
+    medicao = st.session_state.get('memoria_indice_rag')
+    if st.button("📏 Medir memória do índice", key="medir_memoria_rag"):
+        medicao = {'indice': id(dados_rag), 'memoria': estimar_memoria_dados_rag(dados_rag)}
+        st.session_state.memoria_indice_rag = medicao
+    
+    if medicao is not None and medicao['indice'] == id(dados_rag):
+        memoria = medicao['memoria']
+        st.dataframe(
+            pd.DataFrame({
+                'Componente': list(memoria.keys()),
+                'MB': [round(b / 1024 / 1024, 1) for b in memoria.values()]
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(f"Total do índice: {sum(memoria.values()) / 1024 / 1024:.1f} MB")
+    
+    memo = dados_rag.get('memo_consultas')
+    if memo is not None:
+        st.caption(f"Memória de consultas: {len(memo.fixas)} fixas (pré-calculadas) e "
+                   f"{len(memo.entradas)}/{memo.limite} avulsas, "
+                   f"{memo.acertos} acertos e {memo.faltas} faltas")
+    
+    analises = estatisticas_cache_analises()
+    st.caption(f"Cache de análises com IA: {analises['acertos']} devolvidas do cache e "
+               f"{analises['faltas']} geradas pelo modelo neste processo")
+    
     try:
-        if isinstance(data, dict):
-            if 'result' in data and data['result']:
-                df = pd.DataFrame(data['result'])
-            elif 'data' in data and data['data']:
-                df = pd.DataFrame(data['data'])
-            elif 'results' in data and data['results']:
-                df = pd.DataFrame(data['results'])
-            else:
-                # Tentar normalizar dados aninhados
-                df = pd.json_normalize(data)
-        elif isinstance(data, list) and data:
-            df = pd.DataFrame(data)
-        else:
-            st.warning("⚠️ Formato de dados não suportado")
-            return None
-            
-        if df.empty:
-            st.warning("⚠️ DataFrame vazio após processamento")
-            return None
-            
-        return df
-        
-    except pd.errors.EmptyDataError:
-        st.warning("⚠️ Dados vazios recebidos da API")
-        return None
-    except pd.errors.ParserError as e:
-        st.error(f"❌ Erro ao processar dados: {str(e)}")
-        return None
-    except Exception as e:
-        st.error(f"❌ Erro inesperado ao processar dados: {str(e)}")
-        return None
+        import resource
+        pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+        st.caption(f"Pico de memória do processo: {pico_mb:.0f} MB")
+    except ImportError:
+        pass
+
+def exibir_erro_consulta(agregado, erro):
+    """Exibe a mensagem adequada para uma falha na consulta à API"""
+    if isinstance(erro, requests.exceptions.Timeout):
+        st.error(f"⏱️ Timeout ao consultar agregado {agregado}. Tente novamente.")
+    elif isinstance(erro, requests.exceptions.ConnectionError):
+        st.error(f"🌐 Erro de conexão. Verifique sua internet.")
+    elif isinstance(erro, requests.exceptions.HTTPError):
+        st.error(f"❌ Erro HTTP {erro.response.status_code}: {erro.response.reason}")
+    elif isinstance(erro, requests.exceptions.RequestException):
+        st.error(f"❌ Erro na requisição: {str(erro)}")
+    elif isinstance(erro, json.JSONDecodeError):
+        st.error("❌ Erro ao decodificar resposta da API")
+    elif isinstance(erro, ValueError):
+        st.warning(f"⚠️ {str(erro)}")
+    else:
+        st.error(f"❌ Erro inesperado: {str(erro)}")
+
+# ==================== FUNÇÕES DE PROCESSAMENTO ====================
 
 def converter_para_numerico(df, colunas):
     """Converte colunas para formato numérico com tratamento robusto"""
     if df is None or df.empty:
         return df
-        
-    for col in colunas:
-        if col in df.columns:
-            try:
-                # Substituir valores inválidos por NaN
-                df[col] = df[col].replace(['-', 'N/A', 'n/a', '', 'NULL', 'null', 'None'], pd.NA)
-                
-                # Limpar strings se for coluna de texto
-                if df[col].dtype == 'object':
-                    df[col] = df[col].astype(str).str.strip()
-                    # Substituir strings vazias por NaN
-                    df[col] = df[col].replace('', pd.NA)
-                
-                # Converter para numérico
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-            except Exception as e:
-                st.warning(f"⚠️ Erro ao converter coluna '{col}': {str(e)}")
-                continue
-                
-    return df
+    
+    # Conversão com caminho rápido por coluna (marcadores de ausência e
+    # decimais com vírgula tratados em processamento_dados)
+    try:
+        return converter_colunas_numericas(df, colunas)
+    except Exception as e:
+        st.warning(f"⚠️ Erro ao converter colunas {', '.join(map(str, colunas))}: {str(e)}")
+        return df
 
 def extrair_agregados_hierarquia(df):
     """Extrai códigos de agregados da coluna DC_HIERARQUIA"""
@@ -2770,8 +2714,8 @@ def criar_gauge_participacao(df, titulo, codigo_tipo, key_suffix):
 
 # ==================== INICIALIZAÇÃO DO SESSION STATE ====================
 
-if 'df_concatenado' not in st.session_state:
-    st.session_state.df_concatenado = None
+if 'agregados_sessao' not in st.session_state:
+    st.session_state.agregados_sessao = []
 if 'agregado_consultado' not in st.session_state:
     st.session_state.agregado_consultado = None
 
@@ -2862,7 +2806,7 @@ else:
             st.session_state.authenticated = False
             st.session_state.user_code = None
             st.session_state.agregado_consultado = None
-            st.session_state.df_concatenado = None
+            st.session_state.agregados_sessao = []
             st.rerun()
     
     # Consulta automática usando o código do login
@@ -2871,70 +2815,79 @@ else:
     # Fazer consulta automaticamente
     if st.session_state.agregado_consultado != agregado:
         with st.spinner(f"🔄 Consultando dados da entidade {agregado}..."):
-            # Lista para armazenar todos os dataframes
-            lista_dfs = []
+            st.session_state.latencias_consulta = {}
             
             # Consulta inicial
-            data = consultar_api(agregado)
-            if data:
-                df = processar_dados(data)
-                if df is not None:
-                    # Adicionar coluna identificadora do agregado
-                    df['AGREGADO_ORIGEM'] = agregado
-                    lista_dfs.append(df)
-                    
-                    # Extrair agregados da hierarquia (sem exibir)
-                    agregados_hierarquia = []
-                    if len(agregado) > 2:
-                        agregados_hierarquia = extrair_agregados_hierarquia(df)
-                        agregados_hierarquia = [ag for ag in agregados_hierarquia if ag != agregado]
-                    
-                    # Consultar agregados da hierarquia silenciosamente
-                    if agregados_hierarquia:
-                        for ag_hierarquia in agregados_hierarquia:
-                            data_hierarquia = consultar_api(ag_hierarquia)
-                            if data_hierarquia:
-                                df_hierarquia = processar_dados(data_hierarquia)
-                                if df_hierarquia is not None:
-                                    df_hierarquia['AGREGADO_ORIGEM'] = ag_hierarquia
-                                    lista_dfs.append(df_hierarquia)
-                    
-                    # Criar dataframe concatenado (sem exibir)
-                    if len(lista_dfs) == 1:
-                        df_unico = lista_dfs[0].copy()
-                        df_unico = aplicar_substituicoes(df_unico)
-                        st.session_state.df_concatenado = df_unico
-                        st.session_state.agregado_consultado = agregado
-                    elif len(lista_dfs) > 1:
-                        df_concatenado = pd.concat(lista_dfs, ignore_index=True)
-                        df_concatenado = aplicar_substituicoes(df_concatenado)
-                        st.session_state.df_concatenado = df_concatenado
-                        st.session_state.agregado_consultado = agregado
-                    
-                    # Calcular total de registros
-                    total_registros = sum(len(df) for df in lista_dfs)
-                    st.success(f"✅ Dados carregados: {total_registros} registros (incluindo hierarquia)")
-                    
-                    # Opção de download do df_concatenado para usuários com senha mestra
-                    if st.session_state.get('master_access', False):
-                        st.info("🔑 **Acesso Administrativo:** Você pode baixar o dataset completo")
-                        csv_data = st.session_state.df_concatenado.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Baixar Dataset Completo (df_concatenado)",
-                            data=csv_data,
-                            file_name=f"spaece_dataset_completo_{codigo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            key="download_dataset_completo"
-                        )
-                else:
-                    st.error("❌ Erro ao processar dados")
+            df = carregar_df_agregado(agregado)
+            if df is not None:
+                agregados_sessao = [agregado]
+                
+                # Extrair agregados da hierarquia (sem exibir)
+                agregados_hierarquia = []
+                if len(agregado) > 2:
+                    agregados_hierarquia = extrair_agregados_hierarquia(df)
+                    agregados_hierarquia = [ag for ag in agregados_hierarquia if ag != agregado]
+                
+                # Consultar agregados da hierarquia em paralelo (resultados na ordem original)
+                if agregados_hierarquia:
+                    resultados_hierarquia = carregar_agregados_em_paralelo(agregados_hierarquia)
+                    st.session_state.latencias_consulta = {
+                        r['agregado']: r['latencia'] for r in resultados_hierarquia
+                    }
+                    for resultado in resultados_hierarquia:
+                        if resultado['erro'] is not None:
+                            exibir_erro_consulta(resultado['agregado'], resultado['erro'])
+                            continue
+                        agregados_sessao.append(resultado['agregado'])
+                
+                # A sessão guarda apenas os códigos; os DataFrames ficam no cache compartilhado
+                st.session_state.agregados_sessao = agregados_sessao
+                st.session_state.grupos_carregados = {tuple(GRUPOS_CARGA_INICIAL)}
+                st.session_state.agregado_consultado = agregado
+                df_concatenado = compor_df_concatenado(agregados_sessao)
+                
+                # Calcular total de registros
+                total_registros = len(df_concatenado) if df_concatenado is not None else 0
+                st.success(f"✅ Dados carregados: {total_registros} registros (incluindo hierarquia)")
+                
+                # Opção de download do df_concatenado para usuários com senha mestra
+                if st.session_state.get('master_access', False) and df_concatenado is not None:
+                    latencias = st.session_state.get('latencias_consulta', {})
+                    if latencias:
+                        st.caption("⏱️ Latência por agregado da hierarquia: " + ", ".join(
+                            f"{ag}: {seg:.2f}s" for ag, seg in latencias.items()
+                        ))
+                    conexoes = estatisticas_conexoes()
+                    voo_unico = estatisticas_voo_unico()
+                    st.caption(
+                        f"🔌 Pool HTTP: {conexoes['requisicoes']} requisições, "
+                        f"{conexoes['conexoes_novas']} conexões novas, "
+                        f"{conexoes['conexoes_reaproveitadas']} reaproveitadas; "
+                        f"{voo_unico['consultas_compartilhadas']} consultas aguardaram outra idêntica em andamento"
+                    )
+                    st.info("🔑 **Acesso Administrativo:** Você pode baixar o dataset completo")
+                    # O dataset completo inclui os grupos carregados sob demanda
+                    df_habilidades = compor_df_concatenado(agregados_sessao, SECOES_INDICADORES['habilidades'])
+                    st.session_state.grupos_carregados.add(SECOES_INDICADORES['habilidades'])
+                    df_completo = pd.concat([df_concatenado, df_habilidades], ignore_index=True)
+                    csv_data = df_completo.to_csv(index=False)
+                    st.download_button(
+                        label="📥 Baixar Dataset Completo (df_concatenado)",
+                        data=csv_data,
+                        file_name=f"spaece_dataset_completo_{codigo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv",
+                        key="download_dataset_completo"
+                    )
             else:
                 st.warning("⚠️ Nenhum dado retornado pela API")
     
+    # Montar o DataFrame da sessão a partir das partes compartilhadas
+    df_concatenado = compor_df_concatenado(st.session_state.agregados_sessao)
+    
     # Verificar se há dados para exibir
-    if st.session_state.df_concatenado is not None:
+    if df_concatenado is not None:
         # ==================== SEÇÃO DE ANÁLISE ====================
-        df_concat = st.session_state.df_concatenado.copy()
+        df_concat = df_concatenado.copy()
         
         
         # Header estilo relatório formal para análise dos dados
@@ -3202,7 +3155,7 @@ else:
             <h4 style="color: #007bff; margin: 0 0 1rem 0;">🤖 Análise Inteligente com IA</h4>
             <p style="margin: 0 0 1rem 0; color: #6c757d;">
                 Ative as análises inteligentes com IA para obter insights avançados dos dados. 
-                <strong>Este processo carregará as bases de dados (DCRC e BNCC) e pode demorar alguns minutos</strong>.
+                <strong>As bases de dados (DCRC e BNCC) são carregadas em segundo plano</strong>; os gráficos seguem disponíveis enquanto isso.
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -3210,6 +3163,20 @@ else:
         # Inicializar estado da IA se não existir (começar desligada)
         if 'ia_ativa' not in st.session_state:
             st.session_state.ia_ativa = False
+        # Um relatório completo pedido em execução interrompida não é retomado
+        st.session_state.pop('lote_analises', None)
+        
+        # Situação do índice RAG compartilhado pelo processo (carregado em segundo plano)
+        carregador_rag = obter_carregador_rag()
+        situacao_rag = carregador_rag.situacao()
+        if st.session_state.ia_ativa and situacao_rag['estado'] == 'inativo':
+            # Retoma após reinício do processo; uma falha só é repetida pelo botão de ativar
+            carregador_rag.iniciar()
+            situacao_rag = carregador_rag.situacao()
+        st.session_state.documentos_carregados = situacao_rag['estado'] == 'pronto'
+        if st.session_state.ia_ativa and situacao_rag['estado'] == 'erro':
+            st.error(f"❌ {situacao_rag['erro']}. Verifique se os arquivos estão corretos.")
+            st.session_state.ia_ativa = False
         
         col1, col2, col3 = st.columns([0.5, 3, 0.5])
         with col2:
@@ -3221,42 +3188,16 @@ else:
             else:
                 if st.button("🤖 Ativar Análise IA", type="primary", use_container_width=True,
                             help="Clique para ativar as análises inteligentes com IA"):
-                    # Carregar arquivos Markdown quando ativar a IA
-                    try:
-                        with st.spinner("🔄 Carregando bases de dados..."):
-                            # Carregar DCRC
-                            with st.spinner("🔄 Carregando DCRC..."):
-                                texto_dcrc = extrair_texto_md("dcrc.md")
-                            
-                            # Carregar BNCC
-                            with st.spinner("🔄 Carregando BNCC..."):
-                                texto_bncc = extrair_texto_md("bncc.md")
-                            
-                            if texto_dcrc and texto_bncc:
-                                with st.spinner("🤖 Processando documentos com RAG..."):
-                                    # Combinar textos dos dois arquivos Markdown
-                                    texto_combinado = f"DCRC:\n{texto_dcrc}\n\nBNCC:\n{texto_bncc}"
-                                    dados_rag = processar_md_com_rag(texto_combinado)
-                                
-                                if dados_rag:
-                                    st.session_state.documentos_referencia = texto_combinado
-                                    st.session_state.dados_rag = dados_rag
-                                    st.session_state.documentos_carregados = True
-                                    st.session_state.ia_ativa = True
-                                    st.success("✅ IA ativada com sucesso! Bases carregadas e análises inteligentes habilitadas.")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Erro ao processar os documentos. Tente novamente.")
-                            else:
-                                st.error("❌ Erro ao extrair texto dos PDFs. Verifique se os arquivos estão corretos.")
-                                
-                    except FileNotFoundError as e:
-                        st.error(f"❌ Arquivo não encontrado: {e}")
-                    except Exception as e:
-                        st.error(f"❌ Erro ao carregar PDFs: {e}")
+                    # Dispara o carregamento do índice RAG, tentando de novo após uma falha
+                    # (sem efeito se já estiver pronto ou em andamento)
+                    carregador_rag.reiniciar()
+                    st.session_state.ia_ativa = True
+                    st.rerun()
         
         # Mostrar status atual da IA
-        if st.session_state.ia_ativa:
+        if st.session_state.ia_ativa and not st.session_state.documentos_carregados:
+            exibir_situacao_carregamento_rag()
+        elif st.session_state.ia_ativa:
             st.markdown("""
             <div style="
                 background: #e8f5e8;
@@ -3268,6 +3209,11 @@ else:
                 <strong>✅ IA Ativa:</strong> Bases carregadas e análises inteligentes habilitadas
             </div>
             """, unsafe_allow_html=True)
+            
+            # Relatório completo: as seções registram seus prompts e as análises são geradas ao fim do script
+            if st.button("🧾 Gerar Todas as Análises", use_container_width=True,
+                        help="Gera de uma vez as análises com IA de todos os gráficos do relatório"):
+                st.session_state.lote_analises = {'requisicoes': {}, 'espacos': {}, 'situacao': st.empty()}
         else:
             st.markdown("""
             <div style="
@@ -3280,6 +3226,11 @@ else:
                 <strong>⏸️ IA Inativa:</strong> Análises inteligentes desabilitadas
             </div>
             """, unsafe_allow_html=True)
+        
+        # Diagnóstico do índice RAG compartilhado (apenas senha mestra)
+        if st.session_state.get('master_access', False) and st.session_state.get('documentos_carregados', False):
+            with st.expander("🩺 Diagnóstico de memória", expanded=False):
+                exibir_diagnostico_memoria_rag()
     
     # ==================== TAXA DE PARTICIPAÇÃO ====================
     colunas_participacao = ['TP_ENTIDADE','NM_ENTIDADE','QT_ALUNO_PREVISTO','QT_ALUNO_EFETIVO', 
@@ -3366,13 +3317,16 @@ else:
                             analise = analisar_dataframe_com_groq(
                                 df_participacao, 
                                 "Taxa de Participação", 
-                                "Análise da participação dos estudantes nas avaliações SPAECE. IMPORTANTE: O ideal é manter 100% de participação. Destaque como altas taxas de participação podem trazer recursos para o município, melhorar a estrutura da escola e servir de subsídio para implementar planos de cargos e carreiras e aumento de salário dos profissionais da educação, especialmente professores. Considere que participação alta é indicador de qualidade educacional e pode resultar em mais investimentos e melhorias estruturais.",
+                                CONTEXTOS_ANALISE_IA["Taxa de Participação"],
                                 st.session_state.agregado_consultado,
-                                st.session_state.df_concatenado
+                                df_concatenado,
+                                em_fluxo=True
                             )
-                            st.markdown(analise)
+                        exibir_analise_em_fluxo(analise)
+                    else:
+                        exibir_analise_do_relatorio(key_analise, df_participacao, "Taxa de Participação", CONTEXTOS_ANALISE_IA["Taxa de Participação"], df_concatenado)
                 elif not st.session_state.get('documentos_carregados', False):
-                    st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                    st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
                 else:
                     st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
         else:
@@ -3496,13 +3450,16 @@ else:
                         analise = analisar_dataframe_com_groq(
                             df_proficiencia_display, 
                             "Proficiência Média", 
-                            "Análise dos níveis de proficiência dos estudantes nas avaliações SPAECE (escalas 500 e 1000)",
+                            CONTEXTOS_ANALISE_IA["Proficiência Média"],
                             st.session_state.agregado_consultado,
-                            st.session_state.df_concatenado
+                            df_concatenado,
+                            em_fluxo=True
                         )
-                        st.markdown(analise)
+                    exibir_analise_em_fluxo(analise)
+                else:
+                    exibir_analise_do_relatorio(key_analise, df_proficiencia_display, "Proficiência Média", CONTEXTOS_ANALISE_IA["Proficiência Média"], df_concatenado)
             elif not st.session_state.get('documentos_carregados', False):
-                st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
             else:
                 st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
     else:
@@ -3775,29 +3732,28 @@ else:
                     disciplina_filtro = st.session_state.get('disciplina_selecionada', 'Todas')
                     key_analise = f"analise_desempenho_{etapa_filtro}_{disciplina_filtro}"
                     
+                    # Determinar os termos da legenda baseado na etapa
+                    etapa_atual = df_desempenho['Etapa'].iloc[0] if 'Etapa' in df_desempenho.columns and len(df_desempenho) > 0 else None
+                    if etapa_atual and '2º Ano' in etapa_atual:
+                        termos_legenda = LEGENDA_DESEMPENHO_ALFABETIZACAO
+                    else:
+                        termos_legenda = LEGENDA_DESEMPENHO_PADRAO
+                    
                     if st.button("🔍 Analisar Dados com IA", key=key_analise):
                         with st.spinner("🤖 Analisando dados com IA..."):
-                            # Determinar os termos da legenda baseado na etapa
-                            etapa_atual = df_desempenho['Etapa'].iloc[0] if 'Etapa' in df_desempenho.columns and len(df_desempenho) > 0 else None
-                            if etapa_atual and '2º Ano' in etapa_atual:
-                                termos_legenda = "Não Alfabetizado, Alfabetização Incompleta, Intermediário, Suficiente, Desejável"
-                            elif etapa_atual and '5º Ano' in etapa_atual:
-                                termos_legenda = "Muito Crítico, Crítico, Intermediário, Adequado"
-                            elif etapa_atual and '9º Ano' in etapa_atual:
-                                termos_legenda = "Muito Crítico, Crítico, Intermediário, Adequado"
-                            else:
-                                termos_legenda = "Muito Crítico, Crítico, Intermediário, Adequado"
-                            
                             analise = analisar_dataframe_com_groq(
                                 df_desempenho, 
                                 "Distribuição por Desempenho", 
-                                f"Análise da distribuição dos estudantes por padrões de desempenho ({termos_legenda})",
+                                CONTEXTOS_ANALISE_IA["Distribuição por Desempenho"].format(termos_legenda=termos_legenda),
                                 st.session_state.agregado_consultado,
-                                st.session_state.df_concatenado
+                                df_concatenado,
+                                em_fluxo=True
                             )
-                            st.markdown(analise)
+                        exibir_analise_em_fluxo(analise)
+                    else:
+                        exibir_analise_do_relatorio(key_analise, df_desempenho, "Distribuição por Desempenho", CONTEXTOS_ANALISE_IA["Distribuição por Desempenho"].format(termos_legenda=termos_legenda), df_concatenado)
                 elif not st.session_state.get('documentos_carregados', False):
-                    st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                    st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
                 else:
                     st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
     else:
@@ -3807,7 +3763,10 @@ else:
     colunas_habilidade = ['TP_ENTIDADE','DC_TIPO_ENTIDADE','NM_ENTIDADE','VL_FILTRO_DISCIPLINA','VL_FILTRO_ETAPA',
                          'TX_ACERTO','DC_HABILIDADE','CD_HABILIDADE_MODELO_02']
     
-    if not df_concat.empty and all(col in df_concat.columns for col in colunas_habilidade):
+    # Indicadores de habilidades são consultados apenas quando a seção é alcançada
+    df_concat_habilidades = obter_df_secao('habilidades')
+    
+    if not df_concat_habilidades.empty and all(col in df_concat_habilidades.columns for col in colunas_habilidade):
         # Quebra de página antes da seção de habilidades (só se houver dados)
         st.markdown("""
         <div style="page-break-before: always; break-before: page;">
@@ -3851,7 +3810,7 @@ else:
             - **Tipo de Entidade:** Ceará, CREDE, Município ou Escola
             """)
         
-        df_habilidade = df_concat[colunas_habilidade].copy()
+        df_habilidade = df_concat_habilidades[colunas_habilidade].copy()
         
         df_habilidade.columns = ['Tipo de Entidade Código', 'Tipo de Entidade', 'Entidade', 'Componente Curricular', 'Etapa', 
                                 'Taxa de Acerto', 'Habilidade', 'Código Habilidade']
@@ -3890,7 +3849,7 @@ else:
                     )
                 
                 # Agrupar por tipo de entidade e código de habilidade, calculando a média
-                df_agrupado = df_habilidade_grafico.groupby(['Tipo Simplificado', 'Código Habilidade', 'Habilidade']).agg({
+                df_agrupado = df_habilidade_grafico.groupby(['Tipo Simplificado', 'Código Habilidade', 'Habilidade'], observed=True).agg({
                     'Taxa de Acerto': 'mean'
                 }).reset_index()
                 
@@ -3994,13 +3953,16 @@ else:
                         analise = analisar_dataframe_com_groq(
                             df_habilidade, 
                             "Taxa de Acerto por Habilidade", 
-                            "Análise das habilidades específicas dos estudantes nas avaliações SPAECE. IMPORTANTE: Considere que as habilidades têm hierarquia de pré-requisitos - algumas são mais básicas e fundamentais que outras. Foque sempre em fortalecer as habilidades mais basilares primeiro, pois elas são pré-requisito para o desenvolvimento das demais. Identifique quais habilidades básicas precisam de mais atenção e como elas impactam o desenvolvimento das habilidades mais avançadas.",
+                            CONTEXTOS_ANALISE_IA["Taxa de Acerto por Habilidade"],
                             st.session_state.agregado_consultado,
-                            st.session_state.df_concatenado
+                            df_concatenado,
+                            em_fluxo=True
                         )
-                        st.markdown(analise)
+                    exibir_analise_em_fluxo(analise)
+                else:
+                    exibir_analise_do_relatorio(key_analise, df_habilidade, "Taxa de Acerto por Habilidade", CONTEXTOS_ANALISE_IA["Taxa de Acerto por Habilidade"], df_concatenado)
             elif not st.session_state.get('documentos_carregados', False):
-                st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
             else:
                 st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
     else:
@@ -4146,7 +4108,7 @@ else:
                 
                 # Agrupar por tipo de entidade e calcular a média
                 todas_colunas = colunas_taxa_etnia + colunas_prof_etnia + colunas_numero_etnia
-                df_plot = df_plot.groupby('Tipo Simplificado')[todas_colunas].mean().reset_index()
+                df_plot = df_plot.groupby('Tipo Simplificado', observed=True)[todas_colunas].mean().reset_index()
                 
                 # Criar lista de dados para o gráfico
                 dados_grafico = []
@@ -4334,13 +4296,16 @@ else:
                             analise = analisar_dataframe_com_groq(
                                 df_etnia, 
                                 "Proficiência por Etnia", 
-                            "Análise das diferenças de proficiência entre grupos étnicos nas avaliações SPAECE",
-                            st.session_state.agregado_consultado,
-                            st.session_state.df_concatenado
-                        )
-                        st.markdown(analise)
+                                CONTEXTOS_ANALISE_IA["Proficiência por Etnia"],
+                                st.session_state.agregado_consultado,
+                                df_concatenado,
+                                em_fluxo=True
+                            )
+                        exibir_analise_em_fluxo(analise)
+                    else:
+                        exibir_analise_do_relatorio(key_analise, df_etnia, "Proficiência por Etnia", CONTEXTOS_ANALISE_IA["Proficiência por Etnia"], df_concatenado)
                 elif not st.session_state.get('documentos_carregados', False):
-                    st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                    st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
                 else:
                     st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
         else:
@@ -4479,7 +4444,7 @@ else:
                 colunas_numero_nse = [col for col in ['Número NSE 1', 'Número NSE 2', 
                                                     'Número NSE 3', 'Número NSE 4'] if col in df_plot_nse.columns]
                 todas_colunas_nse = colunas_taxa_nse + colunas_prof_nse + colunas_numero_nse
-                df_plot_nse = df_plot_nse.groupby('Tipo Simplificado')[todas_colunas_nse].mean().reset_index()
+                df_plot_nse = df_plot_nse.groupby('Tipo Simplificado', observed=True)[todas_colunas_nse].mean().reset_index()
                 
                 # Criar lista de dados para o gráfico
                 dados_grafico_nse = []
@@ -4655,13 +4620,16 @@ else:
                             analise = analisar_dataframe_com_groq(
                                 df_nse, 
                                 "Proficiência por NSE", 
-                            "Análise das diferenças de proficiência entre níveis socioeconômicos nas avaliações SPAECE",
-                            st.session_state.agregado_consultado,
-                            st.session_state.df_concatenado
-                        )
-                        st.markdown(analise)
+                                CONTEXTOS_ANALISE_IA["Proficiência por NSE"],
+                                st.session_state.agregado_consultado,
+                                df_concatenado,
+                                em_fluxo=True
+                            )
+                        exibir_analise_em_fluxo(analise)
+                    else:
+                        exibir_analise_do_relatorio(key_analise, df_nse, "Proficiência por NSE", CONTEXTOS_ANALISE_IA["Proficiência por NSE"], df_concatenado)
                 elif not st.session_state.get('documentos_carregados', False):
-                    st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                    st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
                 else:
                     st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
     
@@ -4777,7 +4745,7 @@ else:
                 # Agrupar por tipo de entidade e calcular a média
                 colunas_numero_sexo = [col for col in ['Número Feminino', 'Número Masculino'] if col in df_plot_sexo.columns]
                 todas_colunas_sexo = colunas_taxa_sexo + colunas_prof_sexo + colunas_numero_sexo
-                df_plot_sexo = df_plot_sexo.groupby('Tipo Simplificado')[todas_colunas_sexo].mean().reset_index()
+                df_plot_sexo = df_plot_sexo.groupby('Tipo Simplificado', observed=True)[todas_colunas_sexo].mean().reset_index()
                 
                 # Criar lista de dados para o gráfico
                 dados_grafico_sexo = []
@@ -4951,13 +4919,16 @@ else:
                             analise = analisar_dataframe_com_groq(
                                 df_sexo, 
                                 "Proficiência por Sexo", 
-                            "Análise das diferenças de proficiência entre gêneros nas avaliações SPAECE",
-                            st.session_state.agregado_consultado,
-                            st.session_state.df_concatenado
-                        )
-                        st.markdown(analise)
+                                CONTEXTOS_ANALISE_IA["Proficiência por Sexo"],
+                                st.session_state.agregado_consultado,
+                                df_concatenado,
+                                em_fluxo=True
+                            )
+                        exibir_analise_em_fluxo(analise)
+                    else:
+                        exibir_analise_do_relatorio(key_analise, df_sexo, "Proficiência por Sexo", CONTEXTOS_ANALISE_IA["Proficiência por Sexo"], df_concatenado)
                 elif not st.session_state.get('documentos_carregados', False):
-                    st.warning("⚠️ **Análise IA indisponível:** Carregue as bases de dados (DCRC e BNCC) para ativar as análises inteligentes.")
+                    st.warning("⚠️ **Análise IA indisponível:** Ative a IA no painel lateral e aguarde o carregamento das bases de dados (DCRC e BNCC).")
                 else:
                     st.warning("⚠️ **Análise IA desativada:** Use o botão no painel lateral para ativar as análises inteligentes.")
         else:
@@ -4993,7 +4964,7 @@ else:
     """.format(
         pd.Timestamp.now().strftime("%d/%m/%Y às %H:%M"),
         st.session_state.agregado_consultado if st.session_state.agregado_consultado else "N/A",
-        f"{len(st.session_state.df_concatenado):,}".replace(',', '.') if st.session_state.df_concatenado is not None else 0
+        f"{len(df_concatenado):,}".replace(',', '.') if df_concatenado is not None else 0
     ), unsafe_allow_html=True)
     
     # Instruções de impressão
@@ -5027,3 +4998,6 @@ else:
 
     st.markdown("<div style='text-align: center;'>Relatório SPAECE - CREDE 1 - Maracanaú</div>", unsafe_allow_html=True)
     st.markdown("<div style='text-align: center;'>Equipe Cecom 1</div>", unsafe_allow_html=True)
+    
+    # Análises do relatório completo (se pedido nesta execução), após todas as seções
+    concluir_relatorio_completo()